@@ -0,0 +1,106 @@
+"""
+Benchmark of chaotic point sampling: per-point cost of the previous approach
+(shapely buffers, their intersection and rejection sampling within its bounding box)
+against the closed-form sampler used by `User.get_chaotic_point` and `User.get_chaotic_points`.
+
+Run from the repository root: `python benchmarks/bench_chaotic_point.py`
+"""
+
+import argparse
+import random
+import timeit
+
+import numpy as np
+from shapely.geometry import LineString, Point
+
+from gps_synth.user.user_employed_walk import User_employed_walk
+
+USER_CONFIG = {
+    "DATE_BEGGINING": "2022-07-18",
+    "DATE_END": "2022-07-18",
+    "RADIUS_BUFFER_H_W": 1000,
+    "RADIUS_BUFFER_H_R": 1000,
+    "MEAN_MOVE_SPEED_MS": 1.1,
+    "PROXIMITY_TO_ROAD": 2,
+}
+
+
+def get_chaotic_point_rejection(
+    point_start: Point,
+    point_end: Point,
+    radius_of_buffer: float,
+    proximity_to_road: float,
+) -> Point:
+    """
+    The previous implementation of User.get_chaotic_point, kept here as a baseline
+
+    Args:
+        point_start (Point): A start point of a segment
+        point_end (Point): An end point of a segment
+        radius_of_buffer (float): A radius to define a potential space for a chaotic point
+        proximity_to_road (float): A distance to define how a chaotic point should be from a path
+
+    Returns:
+        Point: A chaotic point
+    """
+    points_intersection = point_start.buffer(radius_of_buffer).intersection(
+        point_end.buffer(radius_of_buffer)
+    )
+    path_between_points = LineString([point_start, point_end])
+    final_intersection = points_intersection.intersection(
+        path_between_points.buffer(proximity_to_road)
+    )
+    min_x, min_y, max_x, max_y = final_intersection.bounds
+    while True:
+        chaotic_point = Point(
+            [random.uniform(min_x, max_x), random.uniform(min_y, max_y)]
+        )
+        if chaotic_point.within(final_intersection):
+            return chaotic_point
+
+
+def main(number_of_points: int, repeat: int) -> None:
+    # pylint: disable=missing-function-docstring
+    user = User_employed_walk("benchmark", USER_CONFIG)
+    radius_of_buffer = USER_CONFIG["MEAN_MOVE_SPEED_MS"] * 10
+    proximity_to_road = USER_CONFIG["PROXIMITY_TO_ROAD"]
+
+    # segments of a random direction and of a length typical for get_moving_points:
+    # a path of length L is split into ceil(L / radius) - 1 equal segments
+    rng = np.random.default_rng(0)
+    angle = rng.uniform(0, 2 * np.pi, number_of_points)
+    path_length = rng.uniform(2, 200, number_of_points) * radius_of_buffer
+    length = path_length / (np.ceil(path_length / radius_of_buffer) - 1)
+    points_start = rng.uniform(0, 1000, (number_of_points, 2))
+    points_end = points_start + length[:, None] * np.column_stack(
+        (np.cos(angle), np.sin(angle))
+    )
+    shapely_start = [Point(xy) for xy in points_start]
+    shapely_end = [Point(xy) for xy in points_end]
+
+    cases = {
+        "rejection sampling (previous)": lambda: [
+            get_chaotic_point_rejection(a, b, radius_of_buffer, proximity_to_road)
+            for a, b in zip(shapely_start, shapely_end)
+        ],
+        "get_chaotic_point": lambda: [
+            user.get_chaotic_point(a, b, radius_of_buffer, proximity_to_road)
+            for a, b in zip(shapely_start, shapely_end)
+        ],
+        "get_chaotic_points": lambda: user.get_chaotic_points(
+            points_start, points_end, radius_of_buffer, proximity_to_road
+        ),
+    }
+
+    print(f"{'method':<32}{'us per point':>14}")
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        print(f"{name:<32}{best / number_of_points * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.points, args.repeat)
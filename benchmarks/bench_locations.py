@@ -0,0 +1,105 @@
+"""
+Benchmark of per-day location resolution (`User.get_info_about_loc`): nearest node and centroid
+of home, work and event locations looked up with `DataFrame.iloc` (as before `Locations` kept
+them in NumPy arrays) and with array indexing of `Locations`.
+
+Run from the repository root: `python benchmarks/bench_locations.py`
+"""
+
+import argparse
+import time
+from typing import List, Union
+
+import geopandas as gpd
+import numpy as np
+from geopandas import GeoDataFrame
+
+from gps_synth.network.locations import Locations
+
+
+def create_locations(number_of_locations: int, seed: int = 0) -> GeoDataFrame:
+    """
+    Create random projected locations with the columns of `Network.gdf_hw` used by users
+
+    Args:
+        number_of_locations (int): Number of locations
+        seed (int): Seed of coordinates and nearest nodes
+
+    Returns:
+        GeoDataFrame: Locations with osmid, nearest_node_id and point geometry
+    """
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(0, 10_000, (number_of_locations, 2))
+
+    return gpd.GeoDataFrame(
+        {
+            "osmid": np.arange(number_of_locations) + 10**6,
+            "nearest_node_id": rng.integers(0, 10**9, number_of_locations),
+        },
+        geometry=gpd.points_from_xy(coords[:, 0], coords[:, 1]),
+        crs="EPSG:32635",
+    )
+
+
+def get_info_about_loc_iloc(
+    df_loc: GeoDataFrame, list_of_ids: List[int]
+) -> List[List[Union[int, float]]]:
+    # pylint: disable=missing-function-docstring
+    return [
+        [
+            df_loc.iloc[loc_id]["nearest_node_id"],
+            df_loc.iloc[loc_id]["geometry"].x,
+            df_loc.iloc[loc_id]["geometry"].y,
+        ]
+        for loc_id in list_of_ids
+    ]
+
+
+def get_info_about_loc_arrays(
+    locations: Locations, list_of_ids: List[int]
+) -> List[List[Union[int, float]]]:
+    # pylint: disable=missing-function-docstring
+    return [
+        [node_id, x, y]
+        for node_id, x, y in zip(
+            locations.node_id[list_of_ids].tolist(),
+            locations.x[list_of_ids].tolist(),
+            locations.y[list_of_ids].tolist(),
+        )
+    ]
+
+
+def main(number_of_locations: int, number_of_days: int) -> None:
+    # pylint: disable=missing-function-docstring
+    gdf_locations = create_locations(number_of_locations)
+    locations = Locations(gdf_locations)
+
+    # a day is home, work and up to 3 events, as in User.create_list_of_locations
+    rng = np.random.default_rng(1)
+    days = [
+        rng.integers(0, number_of_locations, rng.integers(2, 6)).tolist()
+        for _ in range(number_of_days)
+    ]
+
+    print(f"{number_of_locations} locations, {number_of_days} days")
+    print(f"{'lookup':<10}{'us per day':>12}")
+
+    results = {}
+    for name, get_info, source in (
+        ("iloc", get_info_about_loc_iloc, gdf_locations),
+        ("arrays", get_info_about_loc_arrays, locations),
+    ):
+        start = time.perf_counter()
+        results[name] = [get_info(source, list_of_ids) for list_of_ids in days]
+        per_day = (time.perf_counter() - start) / number_of_days * 1e6
+        print(f"{name:<10}{per_day:>12.1f}")
+
+    assert results["iloc"] == results["arrays"], "lookups differ"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--locations", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=5_000)
+    args = parser.parse_args()
+    main(args.locations, args.days)
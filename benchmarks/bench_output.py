@@ -0,0 +1,174 @@
+"""
+Benchmark of GPS output: write time and size of a fragment and time to scan one user's data back
+for a table built from pandas objects (as before `TrajectoryBuffer`), an Arrow table with a dictionary user_id column
+written with pyarrow defaults and an Arrow table written as by `GPS_Generator.write_gps_batch` (string user_id column
+with dictionary pages, zstd, row groups of `ROW_GROUP_SIZE` rows). Records of a fragment are sorted by (user_id, timestamp),
+so row group statistics let a per-user scan skip almost all row groups (statistics of dictionary columns are not used).
+
+Run from the repository root: `python benchmarks/bench_output.py`
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from gps_synth.common.columns import ColNames
+from gps_synth.common.functions import write_df_to_parquet, write_table_to_parquet
+from gps_synth.common.trajectory import TrajectoryBuffer
+from gps_synth.gps_generator.gps_generator import (
+    DEFAULT_GPS_COMPRESSION,
+    DEFAULT_GPS_ROW_GROUP_SIZE,
+)
+
+
+def create_trajectories(
+    number_of_users: int, points_per_user: int, seed: int = 0
+) -> TrajectoryBuffer:
+    """
+    Create random walks of users around Tartu with 2-10 seconds between points
+
+    Args:
+        number_of_users (int): Number of users
+        points_per_user (int): Number of points of each user
+        seed (int): Seed of walks and user ids
+
+    Returns:
+        TrajectoryBuffer: Sorted records of all users
+    """
+    rng = np.random.default_rng(seed)
+    gps_data = TrajectoryBuffer(number_of_users * points_per_user)
+    for _ in range(number_of_users):
+        gps_data.append(
+            rng.bytes(16).hex(),
+            1_658_102_400 + np.cumsum(rng.integers(2, 11, points_per_user)),
+            26.72 + np.cumsum(rng.normal(0, 1e-4, points_per_user)),
+            58.38 + np.cumsum(rng.normal(0, 1e-4, points_per_user)),
+        )
+    gps_data.sort()
+
+    return gps_data
+
+
+def to_pandas_objects(gps_data: TrajectoryBuffer) -> pd.DataFrame:
+    # pylint: disable=missing-function-docstring
+    return pd.DataFrame(
+        {
+            ColNames.user_id: np.array(gps_data.user_ids, dtype=object)[
+                gps_data.user_code
+            ],
+            ColNames.timestamp: pd.to_datetime(gps_data.timestamp, unit="s")
+            .to_series()
+            .astype(object)
+            .to_numpy(),
+            ColNames.lon: gps_data.lon,
+            ColNames.lat: gps_data.lat,
+            ColNames.profile_name: "benchmark",
+        }
+    )
+
+
+def to_arrow(gps_data: TrajectoryBuffer, dictionary_user_id: bool) -> pa.Table:
+    # pylint: disable=missing-function-docstring
+    table = gps_data.to_arrow(dictionary_user_id)
+
+    return table.append_column(
+        ColNames.profile_name, pa.repeat("benchmark", table.num_rows)
+    )
+
+
+def get_directory_size(directory: str) -> int:
+    # pylint: disable=missing-function-docstring
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, file_names in os.walk(directory)
+        for file_name in file_names
+    )
+
+
+def main(
+    number_of_users: int,
+    points_per_user: int,
+    number_of_scans: int,
+    compression: str,
+    row_group_size: int,
+) -> None:
+    # pylint: disable=missing-function-docstring
+    gps_data = create_trajectories(number_of_users, points_per_user)
+    user_ids = np.random.default_rng(1).choice(gps_data.user_ids, number_of_scans)
+
+    tuned_options: Dict[str, Any] = {
+        "compression": compression,
+        "use_dictionary": [ColNames.user_id],
+        "write_statistics": True,
+    }
+    cases = (
+        (
+            "pandas objects",
+            lambda path: write_df_to_parquet(to_pandas_objects(gps_data), path),
+        ),
+        (
+            "arrow, defaults",
+            lambda path: write_table_to_parquet(to_arrow(gps_data, True), path),
+        ),
+        (
+            f"arrow, {compression}",
+            lambda path: write_table_to_parquet(
+                to_arrow(gps_data, False),
+                path,
+                file_options=tuned_options,
+                row_group_size=row_group_size,
+            ),
+        ),
+    )
+
+    print(
+        f"{number_of_users} users, {len(gps_data)} records, row groups of {row_group_size} rows"
+    )
+    print(f"{'output':<18}{'write s':>10}{'MB':>10}{'ms per user scan':>18}")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for case_index, (name, write) in enumerate(cases):
+            path = os.path.join(output_dir, str(case_index))
+            start = time.perf_counter()
+            write(path)
+            write_seconds = time.perf_counter() - start
+
+            dataset = ds.dataset(path, format="parquet", partitioning="hive")
+            scanned = 0
+            start = time.perf_counter()
+            for user_id in user_ids:
+                scanned += dataset.to_table(
+                    filter=ds.field(ColNames.user_id) == user_id
+                ).num_rows
+            scan_ms = (time.perf_counter() - start) / number_of_scans * 1000
+            assert scanned == number_of_scans * points_per_user, "scans differ"
+
+            print(
+                f"{name:<18}{write_seconds:>10.2f}{get_directory_size(path) / 2**20:>10.2f}{scan_ms:>18.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--points-per-user", type=int, default=10_000)
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--compression", default=DEFAULT_GPS_COMPRESSION)
+    parser.add_argument(
+        "--row-group-size", type=int, default=DEFAULT_GPS_ROW_GROUP_SIZE
+    )
+    args = parser.parse_args()
+    main(
+        args.users,
+        args.points_per_user,
+        args.scans,
+        args.compression,
+        args.row_group_size,
+    )
@@ -0,0 +1,154 @@
+"""
+Benchmark of replaying GPS output as one stream of records in time order: a batch of users is written by
+`GPS_Generator.write_gps_batch` both as parquet (OUTPUTS.GPS) and as compact trajectory files (OUTPUTS.TRAJECTORIES),
+then records of all users are iterated as (timestamp, user_id, lon, lat) tuples
+
+- from parquet: the dataset is read, sorted by (timestamp, user_id) and iterated
+- from trajectory files: files are memory-mapped and users' blocks are merged lazily (merge_records)
+
+Every case runs in its own forked process, reported are time to the first record, total time, records per second
+and the growth of the peak RSS of a process while replaying.
+
+Run from the repository root: `python benchmarks/bench_replay.py`
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, Tuple
+
+import pyarrow.dataset as ds
+from bench_output import create_trajectories
+
+from gps_synth.common.columns import ColNames
+from gps_synth.common.metrics import RunMetrics, use_metrics
+from gps_synth.common.trajectory_file import (
+    Record,
+    merge_records,
+    open_trajectory_files,
+)
+from gps_synth.gps_generator.gps_generator import GPS_Generator
+from gps_synth.gps_generator.users_chunk import UsersChunk
+
+
+def replay_parquet(path: str) -> Iterator[Record]:
+    # pylint: disable=missing-function-docstring
+    df = (
+        ds.dataset(path, format="parquet", partitioning="hive")
+        .to_table(
+            columns=[ColNames.timestamp, ColNames.user_id, ColNames.lon, ColNames.lat]
+        )
+        .to_pandas()
+        .sort_values([ColNames.timestamp, ColNames.user_id], kind="stable")
+    )
+
+    return zip(
+        df[ColNames.timestamp].astype("int64").tolist(),
+        df[ColNames.user_id].astype(str).tolist(),
+        df[ColNames.lon].tolist(),
+        df[ColNames.lat].tolist(),
+    )
+
+
+def replay_trajectories(path: str) -> Iterator[Record]:
+    # pylint: disable=missing-function-docstring
+    return merge_records(open_trajectory_files(path))
+
+
+REPLAYS: Dict[str, Callable[[str], Iterator[Record]]] = {
+    "gps": replay_parquet,
+    "trajectories": replay_trajectories,
+}
+
+
+def run_replay(name: str, path: str, results: mp.Queue) -> None:
+    # pylint: disable=missing-function-docstring
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    records = REPLAYS[name](path)
+    first_seconds = None
+    number_of_records = 0
+    for _ in records:
+        if first_seconds is None:
+            first_seconds = time.perf_counter() - start
+        number_of_records += 1
+    total_seconds = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+    results.put((number_of_records, first_seconds, total_seconds, peak_rss))
+
+
+def measure(name: str, path: str) -> Tuple[int, float, float, int]:
+    # pylint: disable=missing-function-docstring
+    context = mp.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=run_replay, args=(name, path, results))
+    process.start()
+    result = results.get()
+    process.join()
+
+    return result
+
+
+def get_size(path: str) -> int:
+    # pylint: disable=missing-function-docstring
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, file_names in os.walk(path)
+        for file_name in file_names
+    )
+
+
+def main(number_of_users: int, points_per_user: int) -> None:
+    # pylint: disable=missing-function-docstring
+    with tempfile.TemporaryDirectory() as output_dir:
+        gps_generator = GPS_Generator(
+            {
+                "DO_CLEAR_OUTPUT": False,
+                "PROFILES": {},
+                "EXECUTION": {"WRITE_QUEUE_SIZE": 0},
+                "OUTPUTS": {
+                    output: {"PATH": output.lower()}
+                    for output in ("GPS", "NETWORK_TABLES", "METADATA", "TRAJECTORIES")
+                },
+            },
+            output_dir,
+        )
+        users_chunk = UsersChunk(0)
+        users_chunk.gps_data = create_trajectories(number_of_users, points_per_user)
+        with use_metrics(RunMetrics()) as metrics:
+            gps_generator.write_gps_batch(
+                [users_chunk],
+                "benchmark",
+                os.path.join(output_dir, "gps"),
+            )
+            gps_generator.writer.close()
+        del users_chunk
+
+        print(f"{number_of_users} users, {number_of_users * points_per_user} records")
+        print(
+            f"{'output':<14}{'size MB':>10}{'write s':>10}{'first record s':>16}"
+            f"{'total s':>10}{'records/s':>12}{'peak RSS +MB':>14}"
+        )
+        for name in REPLAYS:
+            path = os.path.join(output_dir, name)
+            number_of_records, first_seconds, total_seconds, peak_rss = measure(
+                name, path
+            )
+            print(
+                f"{name:<14}{get_size(path) / 2**20:>10.1f}"
+                f"{metrics.timers[f'write_{name}'][1]:>10.2f}"
+                f"{first_seconds:>16.3f}{total_seconds:>10.2f}"
+                f"{number_of_records / total_seconds:>12,.0f}"
+                f"{peak_rss / 2**10:>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--points-per-user", type=int, default=10_000)
+    args = parser.parse_args()
+    main(args.users, args.points_per_user)
@@ -0,0 +1,108 @@
+"""
+Benchmark of routing engines (`gps_synth/network/routing.py`) against `ox.distance.shortest_path`
+on a synthetic grid graph: single routes between random nodes and local routes (to a node within a radius,
+as trips between a user's home and events) computed on demand, and routes between anchors of a user
+computed at once (as with ROUTING.PRECOMPUTE). Mean length of found routes is printed
+to check that all engines find equally short routes.
+
+Run from the repository root: `python benchmarks/bench_routing.py`
+"""
+
+import argparse
+import time
+
+import numpy as np
+import osmnx as ox
+from synthetic import create_grid_graph
+
+from gps_synth.network.cache import graph_to_arrays
+from gps_synth.network.routing import ROUTING_ENGINES, Router
+
+
+def get_route_length(route_coords: np.ndarray) -> float:
+    # pylint: disable=missing-function-docstring
+    return float(np.hypot(*np.diff(route_coords, axis=0).T).sum())
+
+
+def main(
+    size: int, number_of_routes: int, number_of_anchors: int, radius: float
+) -> None:
+    # pylint: disable=missing-function-docstring
+    graph = create_grid_graph(size)
+    graph_arrays = graph_to_arrays(graph)
+    nodes = ox.graph_to_gdfs(graph, nodes=True, edges=False)
+
+    rng = np.random.default_rng(1)
+    node_ids = np.array(graph.nodes)
+    pairs = rng.choice(node_ids, (number_of_routes, 2)).tolist()
+    local_pairs = []
+    for start_node in rng.choice(node_ids, number_of_routes).tolist():
+        is_local = (
+            np.hypot(
+                graph_arrays["node_x"] - graph.nodes[start_node]["x"],
+                graph_arrays["node_y"] - graph.nodes[start_node]["y"],
+            )
+            <= radius
+        )
+        local_pairs.append([start_node, int(rng.choice(node_ids[is_local]))])
+    anchors = rng.choice(node_ids, number_of_anchors, replace=False).tolist()
+
+    print(
+        f"grid {size}x{size}: {len(graph)} nodes, {graph.number_of_edges()} edges, "
+        f"{number_of_routes} routes, local routes within {radius:.0f} m, {number_of_anchors} anchors"
+    )
+    print(
+        f"{'engine':<14}{'ms per route':>14}{'ms per local route':>20}{'ms per anchors':>16}{'mean length':>14}"
+    )
+
+    start = time.perf_counter()
+    lengths = [
+        get_route_length(
+            nodes.loc[
+                ox.distance.shortest_path(graph, u, v, weight="length"), ["x", "y"]
+            ]
+            .to_numpy()
+            .reshape(-1, 2),
+        )
+        for u, v in pairs
+    ]
+    per_route = (time.perf_counter() - start) / number_of_routes * 1e3
+    print(
+        f"{'networkx':<14}{per_route:>14.2f}{'-':>20}{'-':>16}{np.mean(lengths):>14.1f}"
+    )
+
+    for engine_name, engine_class in ROUTING_ENGINES.items():
+        start = time.perf_counter()
+        router = Router(graph_arrays, engine_class)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lengths = [get_route_length(router.get_route_coords(u, v)) for u, v in pairs]
+        per_route = (time.perf_counter() - start) / number_of_routes * 1e3
+
+        router = Router(graph_arrays, engine_class)
+        start = time.perf_counter()
+        for u, v in local_pairs:
+            router.get_route_coords(u, v)
+        per_local_route = (time.perf_counter() - start) / number_of_routes * 1e3
+
+        router = Router(graph_arrays, engine_class)
+        start = time.perf_counter()
+        router.precompute_routes(anchors)
+        per_anchors = (time.perf_counter() - start) * 1e3
+
+        print(
+            f"{engine_name:<14}{per_route:>14.2f}{per_local_route:>20.2f}{per_anchors:>16.2f}"
+            f"{np.mean(lengths):>14.1f}"
+            f"   (built in {build * 1e3:.0f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=150)
+    parser.add_argument("--routes", type=int, default=100)
+    parser.add_argument("--anchors", type=int, default=8)
+    parser.add_argument("--radius", type=float, default=1000.0)
+    args = parser.parse_args()
+    main(args.size, args.routes, args.anchors, args.radius)
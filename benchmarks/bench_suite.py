@@ -0,0 +1,368 @@
+"""
+Benchmark suite of the hot paths of GPS generation on a synthetic offline network (`benchmarks/synthetic.py`).
+
+For each combination of a number of users and a number of days it generates users end to end
+(`assign_meaningful_locations` and `generate_users_chunk`, as `GPS_Generator` does) and writes them
+(`output_gps`, `output_metadata`), timing every stage: calls of `get_static_points`, `get_moving_points`,
+`get_chaotic_points`, `Router.get_route_coords` and `Router.precompute_routes` during generation are timed
+in place (times of nested stages are included in their callers). Single `get_chaotic_point` calls and cold
+routing are timed separately. Each case runs in a forked process, so its peak RSS is reported on its own.
+
+Run from the repository root: `python benchmarks/bench_suite.py --users 10 100 --days 1 7`
+"""
+
+import argparse
+import functools
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from shapely.geometry import Point
+from synthetic import create_synthetic_network
+
+from gps_synth.common.abs_user import User
+from gps_synth.gps_generator.gps_generator import GPS_Generator
+from gps_synth.gps_generator.users_chunk import (
+    generate_users_chunk,
+    set_network_attributes,
+)
+from gps_synth.network.routing import Router
+from gps_synth.user.user_employed_walk import User_employed_walk
+
+DATE_BEGINNING = "2022-07-18"
+USER_CONFIG = {
+    "USER_MODULE_PATH": "gps_synth.user.user_employed_walk",
+    "USER_CLASS": "User_employed_walk",
+    "RADIUS_BUFFER_H_W": 1000,
+    "RADIUS_BUFFER_H_R": 1000,
+    "MEAN_MOVE_SPEED_MS": 1.1,
+    "PROXIMITY_TO_ROAD": 2,
+}
+
+# stage name -> [calls, seconds, points]
+Stats = Dict[str, List[float]]
+
+# network cases are run on, forked processes inherit it instead of receiving a pickled copy
+benchmark_network = {}
+
+
+def add_stat(
+    stats: Stats, stage: str, seconds: float, calls: int = 1, points: int = 0
+) -> None:
+    # pylint: disable=missing-function-docstring
+    stat = stats.setdefault(stage, [0, 0.0, 0])
+    stat[0] += calls
+    stat[1] += seconds
+    stat[2] += points
+
+
+def time_method(
+    cls: type,
+    name: str,
+    stats: Stats,
+    count_points: Optional[Callable[[Any, Any, int], int]] = None,
+) -> None:
+    """
+    Replace a method of a class with a wrapper adding its calls and time (and produced points) to stats
+
+    Args:
+        cls (type): Class of a method
+        name (str): Name of a method
+        stats (Stats): Stats to add to
+        count_points (Optional[Callable[[Any, Any, int], int]] = None): Number of points produced by a call
+                                                                        from an instance, a result and a number of points before the call
+    """
+    method = getattr(cls, name)
+
+    @functools.wraps(method)
+    def timed(self, *method_args, **method_kwargs):
+        points_before = len(self.data_array) if isinstance(self, User) else 0
+        start = time.perf_counter()
+        result = method(self, *method_args, **method_kwargs)
+        seconds = time.perf_counter() - start
+        points = (
+            0 if count_points is None else count_points(self, result, points_before)
+        )
+        add_stat(stats, name, seconds, points=points)
+        return result
+
+    setattr(cls, name, timed)
+
+
+def count_user_points(user: User, _, points_before: int) -> int:
+    # pylint: disable=missing-function-docstring
+    return len(user.data_array) - points_before
+
+
+def count_result_points(_, result: Any, __) -> int:
+    # pylint: disable=missing-function-docstring
+    return len(result)
+
+
+def create_user_config(number_of_users: int, number_of_days: int) -> Dict[str, Any]:
+    # pylint: disable=missing-function-docstring
+    return {
+        **USER_CONFIG,
+        "NUM_USERS": number_of_users,
+        "DATE_BEGGINING": DATE_BEGINNING,
+        "DATE_END": str(
+            (
+                pd.Timestamp(DATE_BEGINNING) + pd.Timedelta(days=number_of_days - 1)
+            ).date()
+        ),
+    }
+
+
+def run_case(
+    number_of_users: int,
+    number_of_days: int,
+    number_of_chaotic_points: int,
+    number_of_routes: int,
+) -> Tuple[Stats, float, int, Dict[str, int]]:
+    """
+    Generate and write users on the benchmark network, timing every stage (meant to be run in a forked process)
+
+    Args:
+        number_of_users (int): Number of users
+        number_of_days (int): Number of days of each user
+        number_of_chaotic_points (int): Number of single get_chaotic_point calls
+        number_of_routes (int): Number of routes computed with a cold cache
+
+    Returns:
+        Tuple[Stats, float, int, Dict[str, int]]: Stats of stages, seconds of generation, peak RSS in KB
+        and sizes of written outputs in bytes
+    """
+    network = benchmark_network["network"]
+    stats: Stats = {}
+    profile_user_config = create_user_config(number_of_users, number_of_days)
+    seed_sequence = np.random.SeedSequence(0)
+
+    rng = np.random.default_rng(seed_sequence.spawn(1)[0])
+    start = time.perf_counter()
+    meaningful_locations = User_employed_walk.assign_meaningful_locations(
+        profile_user_config,
+        network.hw_locations,
+        network.event_locations,
+        number_of_users,
+        rng,
+    )
+    add_stat(stats, "assign_meaningful_locations", time.perf_counter() - start)
+
+    for cls, name, count_points in (
+        (User, "get_static_points", count_user_points),
+        (User, "get_moving_points", count_user_points),
+        (User, "get_chaotic_points", count_result_points),
+        (Router, "get_route_coords", count_result_points),
+        (Router, "precompute_routes", None),
+    ):
+        time_method(cls, name, stats, count_points)
+
+    set_network_attributes(
+        network.hw_locations,
+        network.event_locations,
+        network.router,
+        network.projection,
+    )
+    number_of_users = len(meaningful_locations)
+    start = time.perf_counter()
+    users_chunk = generate_users_chunk(
+        profile_user_config,
+        [f"user_{user_index}" for user_index in range(number_of_users)],
+        seed_sequence.spawn(number_of_users),
+        meaningful_locations,
+    )
+    generation_seconds = time.perf_counter() - start
+    add_stat(
+        stats,
+        "generate_users_chunk",
+        generation_seconds,
+        points=len(users_chunk.gps_data),
+    )
+
+    written_bytes = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        gps_generator = GPS_Generator(
+            {
+                "DO_CLEAR_OUTPUT": False,
+                "PROFILES": {},
+                "OUTPUTS": {
+                    output: {"PATH": output.lower()}
+                    for output in ("GPS", "NETWORK_TABLES", "METADATA")
+                },
+            },
+            output_dir,
+        )
+        gps_path = gps_generator.config["OUTPUTS"]["GPS"]["PATH"]
+        metadata_path = gps_generator.config["OUTPUTS"]["METADATA"]["PATH"]
+
+        start = time.perf_counter()
+        gps_generator.output_gps({"benchmark": [users_chunk]}, gps_path)
+        add_stat(
+            stats,
+            "output_gps",
+            time.perf_counter() - start,
+            points=len(users_chunk.gps_data),
+        )
+
+        start = time.perf_counter()
+        gps_generator.output_metadata(
+            {"benchmark": [users_chunk]},
+            {network.network_name: network},
+            {"benchmark": network.network_name},
+            metadata_path,
+        )
+        add_stat(stats, "output_metadata", time.perf_counter() - start)
+
+        written_bytes["gps"] = get_directory_size(gps_path)
+        written_bytes["metadata"] = get_directory_size(metadata_path)
+
+    # single chaotic points of segments of typical length (see get_moving_points)
+    rng = np.random.default_rng(0)
+    radius_of_buffer = USER_CONFIG["MEAN_MOVE_SPEED_MS"] * 10
+    points_start = rng.uniform(0, 1000, (number_of_chaotic_points, 2))
+    angle = rng.uniform(0, 2 * np.pi, number_of_chaotic_points)
+    points_end = points_start + radius_of_buffer * np.column_stack(
+        (np.cos(angle), np.sin(angle))
+    )
+    user = User_employed_walk("benchmark", profile_user_config, rng)
+    for point_start, point_end in zip(points_start, points_end):
+        point_start, point_end = Point(point_start), Point(point_end)
+        start = time.perf_counter()
+        user.get_chaotic_point(
+            point_start,
+            point_end,
+            radius_of_buffer,
+            USER_CONFIG["PROXIMITY_TO_ROAD"],
+        )
+        add_stat(stats, "get_chaotic_point", time.perf_counter() - start, points=1)
+
+    # routes between random nodes with an empty cache
+    router = Router(network.graph_arrays, type(network.router.engine))
+    node_ids = network.graph_arrays["node_id"]
+    for start_node, end_node in rng.choice(node_ids, (number_of_routes, 2)).tolist():
+        start = time.perf_counter()
+        router.get_route_coords(start_node, end_node)
+        add_stat(stats, "cold route", time.perf_counter() - start)
+
+    return (
+        stats,
+        generation_seconds,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        written_bytes,
+    )
+
+
+def get_directory_size(directory: str) -> int:
+    # pylint: disable=missing-function-docstring
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, file_names in os.walk(directory)
+        for file_name in file_names
+    )
+
+
+def print_case(
+    number_of_users: int,
+    number_of_days: int,
+    stats: Stats,
+    generation_seconds: float,
+    peak_rss_kb: int,
+    written_bytes: Dict[str, int],
+) -> None:
+    # pylint: disable=missing-function-docstring
+    points = stats["generate_users_chunk"][2]
+    print(
+        f"\nusers={number_of_users} days={number_of_days}: {points} points, "
+        f"{generation_seconds:.2f} s generation, {points / generation_seconds:,.0f} points/s, "
+        f"peak RSS {peak_rss_kb / 1024:.0f} MB"
+    )
+    print(f"{'stage':<32}{'calls':>9}{'total s':>10}{'ms/call':>10}{'points/s':>12}")
+    for stage, (calls, seconds, stage_points) in stats.items():
+        points_per_second = (
+            f"{stage_points / seconds:,.0f}" if stage_points and seconds else "-"
+        )
+        print(
+            f"{stage:<32}{calls:>9}{seconds:>10.3f}{seconds / calls * 1e3:>10.3f}"
+            f"{points_per_second:>12}"
+        )
+    print(
+        f"written: GPS {written_bytes['gps'] / 2**20:.2f} MB, "
+        f"metadata {written_bytes['metadata'] / 2**20:.2f} MB"
+    )
+
+
+def main(
+    layout: str,
+    size: int,
+    number_of_hw: int,
+    number_of_event: int,
+    users: List[int],
+    days: List[int],
+    number_of_chaotic_points: int,
+    number_of_routes: int,
+) -> None:
+    # pylint: disable=missing-function-docstring
+    start = time.perf_counter()
+    network = benchmark_network["network"] = create_synthetic_network(
+        layout,
+        size,
+        number_of_hw,
+        number_of_event,
+        routing_config={"CACHE_SIZE": 100_000, "PRECOMPUTE": True},
+    )
+    print(
+        f"{layout} network: {len(network.graph_arrays['node_id'])} nodes, {len(network.hw_locations)} home/work "
+        f"and {len(network.event_locations)} event locations, built in {time.perf_counter() - start:.2f} s"
+    )
+
+    for number_of_users in users:
+        for number_of_days in days:
+            # a forked process starts with a cold route cache and reports its own peak RSS
+            with mp.get_context("fork").Pool(1) as pool:
+                stats, generation_seconds, peak_rss_kb, written_bytes = pool.apply(
+                    run_case,
+                    (
+                        number_of_users,
+                        number_of_days,
+                        number_of_chaotic_points,
+                        number_of_routes,
+                    ),
+                )
+            print_case(
+                number_of_users,
+                number_of_days,
+                stats,
+                generation_seconds,
+                peak_rss_kb,
+                written_bytes,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--layout", choices=["grid", "random_geometric"], default="grid"
+    )
+    parser.add_argument("--size", type=int, default=60)
+    parser.add_argument("--hw-locations", type=int, default=5000)
+    parser.add_argument("--event-locations", type=int, default=1000)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7])
+    parser.add_argument("--chaotic-points", type=int, default=2000)
+    parser.add_argument("--routes", type=int, default=100)
+    args = parser.parse_args()
+    main(
+        args.layout,
+        args.size,
+        args.hw_locations,
+        args.event_locations,
+        args.users,
+        args.days,
+        args.chaotic_points,
+        args.routes,
+    )
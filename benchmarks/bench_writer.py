@@ -0,0 +1,101 @@
+"""
+Benchmark of background writing of GPS output: batches of users are "generated" and handed to
+`GPS_Generator.write_gps_batch` as in a streamed run, with writes executed synchronously (`WRITE_QUEUE_SIZE` 0)
+and by the background writer with queues of several sizes. Generation of a batch is emulated by pure Python work
+holding the GIL (as generation of users mostly does) for a given time, so the time a run spends on top of generation
+is the part of writing left on its critical path: building Arrow tables and waiting for a full queue (`write_wait`).
+
+Run from the repository root: `python benchmarks/bench_writer.py`
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+from bench_output import create_trajectories
+
+from gps_synth.common.metrics import RunMetrics, use_metrics
+from gps_synth.gps_generator.gps_generator import GPS_Generator
+from gps_synth.gps_generator.users_chunk import UsersChunk
+
+
+def generate(seconds: float) -> None:
+    # pylint: disable=missing-function-docstring
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def main(
+    number_of_batches: int,
+    users_per_batch: int,
+    points_per_user: int,
+    generation_seconds: float,
+    queue_sizes: List[int],
+) -> None:
+    # pylint: disable=missing-function-docstring
+    users_chunks = []
+    for batch_index in range(number_of_batches):
+        users_chunk = UsersChunk(batch_index)
+        users_chunk.gps_data = create_trajectories(
+            users_per_batch, points_per_user, batch_index
+        )
+        users_chunks.append(users_chunk)
+
+    print(
+        f"{number_of_batches} batches of {users_per_batch * points_per_user} records, "
+        f"{generation_seconds:.2f} s of generation per batch"
+    )
+    print(
+        f"{'queue size':<12}{'run s':>10}{'on top of generation s':>24}{'write s':>10}{'write_wait s':>14}"
+    )
+
+    for queue_size in queue_sizes:
+        with tempfile.TemporaryDirectory() as output_dir:
+            gps_generator = GPS_Generator(
+                {
+                    "DO_CLEAR_OUTPUT": False,
+                    "PROFILES": {},
+                    "EXECUTION": {"WRITE_QUEUE_SIZE": queue_size},
+                    "OUTPUTS": {
+                        output: {"PATH": output.lower()}
+                        for output in ("GPS", "NETWORK_TABLES", "METADATA")
+                    },
+                },
+                output_dir,
+            )
+            gps_path = os.path.join(output_dir, "gps")
+
+            with use_metrics(RunMetrics()) as metrics:
+                start = time.perf_counter()
+                for users_chunk in users_chunks:
+                    generate(generation_seconds)
+                    gps_generator.write_gps_batch([users_chunk], "benchmark", gps_path)
+                gps_generator.writer.close()
+                run_seconds = time.perf_counter() - start
+
+        print(
+            f"{queue_size:<12}{run_seconds:>10.2f}"
+            f"{run_seconds - number_of_batches * generation_seconds:>24.2f}"
+            f"{metrics.timers['write_gps'][1]:>10.2f}"
+            f"{metrics.timers.get('write_wait', [0, 0.0])[1]:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--users-per-batch", type=int, default=20)
+    parser.add_argument("--points-per-user", type=int, default=10_000)
+    parser.add_argument("--generation-seconds", type=float, default=0.3)
+    parser.add_argument("--queue-sizes", type=int, nargs="+", default=[0, 1, 2])
+    args = parser.parse_args()
+    main(
+        args.batches,
+        args.users_per_batch,
+        args.points_per_user,
+        args.generation_seconds,
+        args.queue_sizes,
+    )
@@ -0,0 +1,243 @@
+"""
+Synthetic street networks and locations for benchmarks, built entirely offline.
+
+`SyntheticNetwork` is a `Network` whose `load_graph` and `load_features` return a generated graph
+(a grid or a random geometric graph in a projected CRS) and random home/work and event locations around it,
+so everything else (centroids, nearest nodes, graph arrays, locations index, router) runs as for OSM data.
+Its size is set with optional network params:
+
+- `SYNTHETIC_LAYOUT`: "grid" (default) or "random_geometric"
+- `SYNTHETIC_SIZE`: number of nodes along a side of a grid (default 60), a random geometric graph has as many nodes as a grid of this size
+- `SYNTHETIC_HW_LOCATIONS`, `SYNTHETIC_EVENT_LOCATIONS`: number of home/work and event locations (default 5000 and 1000)
+
+It can also be used in a config: NETWORK_MODULE_PATH: "synthetic" with benchmarks/ on PYTHONPATH, NETWORK_CLASS: "SyntheticNetwork".
+"""
+
+from typing import Any, List
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy.spatial import cKDTree
+
+from gps_synth.network.network import Network
+
+SYNTHETIC_CRS = "EPSG:32635"
+GRID_STEP = 80.0
+# origin of synthetic networks, somewhere in Estonia in UTM zone 35N
+ORIGIN_X, ORIGIN_Y = 659_000.0, 6_470_000.0
+# number of nearest nodes each node of a random geometric graph is connected to
+RANDOM_GEOMETRIC_NEIGHBOURS = 4
+
+
+def add_street(graph: nx.MultiDiGraph, u: int, v: int, length: float) -> None:
+    # pylint: disable=missing-function-docstring
+    graph.add_edge(u, v, length=length)
+    graph.add_edge(v, u, length=length)
+
+
+def create_grid_graph(size: int, seed: int = 0) -> nx.MultiDiGraph:
+    """
+    Create a projected grid graph with edge lengths slightly longer than straight lines (as streets are)
+
+    Args:
+        size (int): Number of nodes along a side of a grid
+        seed (int): Seed of edge lengths
+
+    Returns:
+        nx.MultiDiGraph: Grid graph with x, y node attributes and length edge attribute
+    """
+    rng = np.random.default_rng(seed)
+    graph = nx.MultiDiGraph(crs=SYNTHETIC_CRS)
+    for i in range(size):
+        for j in range(size):
+            graph.add_node(
+                i * size + j,
+                x=ORIGIN_X + j * GRID_STEP,
+                y=ORIGIN_Y + i * GRID_STEP,
+                street_count=4,
+            )
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < size and j + dj < size:
+                    add_street(
+                        graph,
+                        i * size + j,
+                        (i + di) * size + j + dj,
+                        GRID_STEP * rng.uniform(1.0, 1.3),
+                    )
+
+    return graph
+
+
+def create_random_geometric_graph(size: int, seed: int = 0) -> nx.MultiDiGraph:
+    """
+    Create a projected graph of size x size random nodes, each connected to its nearest nodes,
+    covering the same area as a grid graph of the same size (only its largest connected component is kept)
+
+    Args:
+        size (int): Number of nodes along a side of a grid with the same number of nodes
+        seed (int): Seed of node coordinates
+
+    Returns:
+        nx.MultiDiGraph: Graph with x, y node attributes and length edge attribute
+    """
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(0, GRID_STEP * (size - 1), (size * size, 2)) + (
+        ORIGIN_X,
+        ORIGIN_Y,
+    )
+    distances, neighbours = cKDTree(coords).query(
+        coords, RANDOM_GEOMETRIC_NEIGHBOURS + 1
+    )
+
+    graph = nx.MultiDiGraph(crs=SYNTHETIC_CRS)
+    for node, (x, y) in enumerate(coords.tolist()):
+        graph.add_node(node, x=x, y=y, street_count=RANDOM_GEOMETRIC_NEIGHBOURS)
+    for node in range(len(coords)):
+        # the first neighbour is a node itself
+        for neighbour, distance in zip(neighbours[node, 1:], distances[node, 1:]):
+            if not graph.has_edge(node, int(neighbour)):
+                add_street(graph, node, int(neighbour), float(distance))
+
+    largest_component = max(nx.weakly_connected_components(graph), key=len)
+
+    return graph.subgraph(largest_component).copy()
+
+
+def create_locations(
+    graph: nx.MultiDiGraph,
+    number_of_hw: int,
+    number_of_event: int,
+    osm_tags_for_hw: List[str],
+    osm_tags_for_event: List[str],
+    seed: int = 0,
+) -> gpd.GeoDataFrame:
+    """
+    Create random point locations within a bounding box of a graph in the form of OSM features
+
+    Args:
+        graph (nx.MultiDiGraph): Projected graph
+        number_of_hw (int): Number of locations with a home/work tag
+        number_of_event (int): Number of locations with an event tag
+        osm_tags_for_hw (List[str]): OSM tags of home/work locations, the first one is set
+        osm_tags_for_event (List[str]): OSM tags of event locations, the first one is set
+        seed (int): Seed of coordinates
+
+    Returns:
+        gpd.GeoDataFrame: Locations indexed by element type and OSM id, with name and tag columns
+    """
+    rng = np.random.default_rng(seed)
+    node_x = np.array([data["x"] for _, data in graph.nodes(data=True)])
+    node_y = np.array([data["y"] for _, data in graph.nodes(data=True)])
+    number_of_locations = number_of_hw + number_of_event
+
+    gdf_locations = gpd.GeoDataFrame(
+        {"name": None},
+        geometry=gpd.points_from_xy(
+            rng.uniform(node_x.min(), node_x.max(), number_of_locations),
+            rng.uniform(node_y.min(), node_y.max(), number_of_locations),
+        ),
+        crs=graph.graph["crs"],
+        index=pd.MultiIndex.from_arrays(
+            [
+                ["way"] * number_of_locations,
+                np.arange(number_of_locations) + 10**6,
+            ],
+            names=["element_type", "osmid"],
+        ),
+    )
+    for osm_tag in osm_tags_for_hw + osm_tags_for_event:
+        gdf_locations[osm_tag] = None
+    gdf_locations.iloc[
+        :number_of_hw, gdf_locations.columns.get_loc(osm_tags_for_hw[0])
+    ] = "yes"
+    gdf_locations.iloc[
+        number_of_hw:, gdf_locations.columns.get_loc(osm_tags_for_event[0])
+    ] = "yes"
+
+    return gdf_locations
+
+
+class SyntheticNetwork(Network):
+    def __init__(self, profile_network_config, network_cache=None, routing_config=None):
+        super().__init__(profile_network_config, network_cache, routing_config)
+        self.synthetic_layout = profile_network_config.get("SYNTHETIC_LAYOUT", "grid")
+        self.synthetic_size = profile_network_config.get("SYNTHETIC_SIZE", 60)
+        self.synthetic_hw_locations = profile_network_config.get(
+            "SYNTHETIC_HW_LOCATIONS", 5000
+        )
+        self.synthetic_event_locations = profile_network_config.get(
+            "SYNTHETIC_EVENT_LOCATIONS", 1000
+        )
+        self.synthetic_graph = None
+
+    def get_source_description(self) -> List[Any]:
+        # pylint: disable=missing-function-docstring
+        return [
+            "synthetic",
+            self.synthetic_layout,
+            self.synthetic_size,
+            self.synthetic_hw_locations,
+            self.synthetic_event_locations,
+        ]
+
+    def load_graph(self, place_name: str, network_type: str) -> nx.MultiDiGraph:
+        # pylint: disable=missing-function-docstring
+        if self.synthetic_layout == "random_geometric":
+            self.synthetic_graph = create_random_geometric_graph(self.synthetic_size)
+        else:
+            self.synthetic_graph = create_grid_graph(self.synthetic_size)
+
+        return self.synthetic_graph
+
+    def load_features(self, place_name: str, osm_tags: List[str]) -> DataFrame:
+        # pylint: disable=missing-function-docstring
+        return create_locations(
+            self.synthetic_graph,
+            self.synthetic_hw_locations,
+            self.synthetic_event_locations,
+            self.osm_tags_for_hw,
+            self.osm_tags_for_event,
+        )
+
+
+def create_synthetic_network(
+    layout: str = "grid",
+    size: int = 60,
+    number_of_hw: int = 5000,
+    number_of_event: int = 1000,
+    routing_config=None,
+) -> SyntheticNetwork:
+    """
+    Build a synthetic network ready for user generation (with completed run method)
+
+    Args:
+        layout (str): "grid" or "random_geometric"
+        size (int): Number of nodes along a side of a grid
+        number_of_hw (int): Number of home/work locations
+        number_of_event (int): Number of event locations
+        routing_config (Optional[Dict[str, Any]] = None): ROUTING config section
+
+    Returns:
+        SyntheticNetwork: Built network
+    """
+    network = SyntheticNetwork(
+        {
+            "NETWORK_NAME": f"synthetic_{layout}_{size}",
+            "NETWORK_TYPE": "walk",
+            "OSM_TAGS_FOR_HOME_AND_WORK": ["building"],
+            "OSM_TAGS_FOR_EVENT": ["amenity"],
+            "SYNTHETIC_LAYOUT": layout,
+            "SYNTHETIC_SIZE": size,
+            "SYNTHETIC_HW_LOCATIONS": number_of_hw,
+            "SYNTHETIC_EVENT_LOCATIONS": number_of_event,
+        },
+        routing_config=routing_config,
+    )
+    network.run()
+
+    return network
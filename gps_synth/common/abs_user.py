@@ -8,24 +8,34 @@ User class has a combination of concrete and abstract methods:
 """
 
 import math
-import random
 from abc import ABC, abstractmethod
 from datetime import timedelta
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
-import osmnx as ox
 import pandas as pd
 import shapely
-from geopandas import GeoDataFrame
-from networkx import MultiDiGraph
-from pandas import DataFrame, Timestamp
-from pyproj import Geod, Transformer
+from pandas import Timestamp
 from shapely.geometry import LineString, Point
 
+from gps_synth.common.meaningful_locations import (
+    MeaningfulLocations,
+    assign_meaningful_locations,
+)
+from gps_synth.common.metrics import get_metrics, timed
+from gps_synth.common.trajectory import TrajectoryBuffer
+from gps_synth.network.locations import Locations
+from gps_synth.network.projection import ProjectionContext
+from gps_synth.network.routing import Router
+
 
 class User(ABC):
-    def __init__(self, user_id: int, profile_user_config):
+    def __init__(
+        self,
+        user_id: int,
+        profile_user_config,
+        rng: Optional[np.random.Generator] = None,
+    ):
         self.user_id = user_id
         self.date_range = pd.date_range(
             profile_user_config["DATE_BEGGINING"],
@@ -41,103 +51,80 @@ class User(ABC):
         self.work_id = None
         self.regular_loc_array = None
 
-        self.data_array = []
-
-    def get_random_id_within_buffer(
-        self, center_point: Point, radius_buffer: int, gdf_locations: GeoDataFrame
-    ) -> Union[int, None]:
+        self.data_array = TrajectoryBuffer()
+        # generator of all random choices of a user, in a run it is derived from the run seed and the user's index
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    @classmethod
+    def assign_meaningful_locations(
+        cls,
+        profile_user_config,
+        hw_locations: Locations,
+        event_locations: Locations,
+        number_of_users: int,
+        rng: np.random.Generator,
+    ) -> MeaningfulLocations:
         """
-        Find a random id of a location which is within a buffer, created around center point with specified distance.
-        A center point should be surronded with some amount of needed locations, otherwise None
+        Create meaningful locations for all users of a profile at once: one home, one work, several regular events
+        within distances from home defined in the config, with at most MAX_ANCHOR_ATTEMPTS (user config param, 100 by default) rounds of retries
 
         Args:
-            center_point (Point): A point around which create a buffer
-            radius_buffer (int): A radius of a buffer
-            gdf_locations (GeoDataFrame): Locations to filter with condition "within a buffer"
+            profile_user_config (Any): YAML object with config params regarding users
+            hw_locations (Locations): Spatial index of locations of a network to choose from for home and work anchors
+            event_locations (Locations): Spatial index of locations of a network to choose from for regular event anchors
+            number_of_users (int): Number of users to create meaningful locations for
+            rng (np.random.Generator): Generator to draw all random choices
 
         Returns:
-            int: Random id among filtered loctions or None if home anchor is too near to border of a place
+            MeaningfulLocations: Anchors of users who got them and the number of users who failed to get them
         """
+        return assign_meaningful_locations(
+            hw_locations,
+            event_locations,
+            number_of_users,
+            profile_user_config["RADIUS_BUFFER_H_W"],
+            profile_user_config["RADIUS_BUFFER_H_R"],
+            rng,
+            profile_user_config.get("MAX_ANCHOR_ATTEMPTS", 100),
+        )
 
-        buffer = shapely.buffer(center_point, distance=radius_buffer)
-        index_list = gdf_locations[gdf_locations.within(buffer)].index
-        # TODO: 20 is arbitary threshold, e.g. there could be just a case that a place does not have
-        # some types of locations in many quantaties, think about how logically define this value
-        # and make it as another positional argument
-        if len(index_list) >= 20:
-            random_id = random.choice(gdf_locations[gdf_locations.within(buffer)].index)
-            return random_id
-
-        return None
-
-    def get_meaningful_locations(
-        self,
-        gdf_hw: GeoDataFrame,
-        gdf_event: GeoDataFrame,
+    def set_meaningful_locations(
+        self, home_id: int, work_id: int, regular_loc_array: List[int]
     ) -> None:
         """
-        Create meaningful locations for a user: one home, one work, several regular events,
-        the radius between home and work and home and regular locations are defined in the config
-        The distribution of meaningful locations should follow some distance conditions.
-        Store computed anchors in correponding instance attributes
+        Store meaningful locations created for a user in bulk in correponding instance attributes
 
         Args:
-            gdf_hw (GeoDataFrame): Set of locations of a network to choose from for home and work anchors
-            gdf_event (GeoDataFrame): Set of locations of a network to choose from for regular event anchors
+            home_id (int): Id of home anchor
+            work_id (int): Id of work anchor
+            regular_loc_array (List[int]): List of regular event locations' ids
         """
-        # radius_buffer_h_w (int): Radius to create a buffer around home anchor to search for work anchor
-        radius_buffer_h_w = self.radius_buffer_h_w
-        # radius_buffer_h_w (int): Radius to create a buffer around home anchor to search for regular event anchors
-        radius_buffer_h_r = self.radius_buffer_h_r
-
-        home_id = random.randint(0, len(gdf_hw) - 1)
-        home_geometry = gdf_hw.iloc[home_id]["geometry"]
-        # TODO: too conditionally nested think about a better approach
-        while True:
-
-            work_id = self.get_random_id_within_buffer(
-                home_geometry, radius_buffer_h_w, gdf_hw
-            )
-            # if there are not many possible work anchor locations around
-            if work_id is None:
-                # change home id
-                home_id = random.randint(0, len(gdf_hw) - 1)
-                home_geometry = gdf_hw.iloc[home_id]["geometry"]
-            # if the same just choose another work id, but don't change home anchor
-            elif home_id == work_id:
-                continue
+        self.home_id = home_id
+        self.work_id = work_id
+        self.regular_loc_array = regular_loc_array
 
-            else:
-                regular_locations_ids = []
-                number_of_regular_locations = random.randint(3, 5)
-                i = 0
-                while i <= number_of_regular_locations:
-                    regular_id = self.get_random_id_within_buffer(
-                        home_geometry, radius_buffer_h_r, gdf_event
-                    )
-
-                    # if there are not many possible regular event anchors around increase search radius
-                    if regular_id is None:
-                        radius_buffer_h_r += 100
-                    # if id is already used, chooses another one
-                    elif (
-                        regular_id in regular_locations_ids
-                        or regular_id == home_id
-                        or regular_id == work_id
-                    ):
-                        continue
-                    else:
-                        regular_locations_ids.append(regular_id)
-                        i += 1
-
-                self.home_id = home_id
-                self.work_id = work_id
-                self.regular_loc_array = regular_locations_ids
-                break
+    def get_anchor_nodes(
+        self, hw_locations: Locations, event_locations: Locations
+    ) -> List[int]:
+        """
+        Get nearest nodes of user's meaningful locations (home, work, regular events),
+        e.g. to precompute routes between them
+
+        Args:
+            hw_locations (Locations): Locations of a network used for home and work anchors
+            event_locations (Locations): Locations of a network used for regular event anchors
+
+        Returns:
+            List[int]: Ids of nearest nodes of home, work and regular event anchors
+        """
+        return (
+            hw_locations.node_id[[self.home_id, self.work_id]].tolist()
+            + event_locations.node_id[self.regular_loc_array].tolist()
+        )
 
     def get_regular_or_random_loc(
         self,
-        gdf_event: GeoDataFrame,
+        event_locations: Locations,
         regular_location_ids: List[int],
         number_of_events: int,
     ) -> List[int]:
@@ -145,7 +132,7 @@ class User(ABC):
         Randomly create a list with specified number of event ids, which could be either from regular event locations or completely accidental
 
         Args:
-            gdf_event (GeoDataFrame): Set of locations of a network to choose from for regular event anchors
+            event_locations (Locations): Locations of a network to choose random events from
             regular_location_ids (List[int]): List of regular event locations' ids
             number_of_events (int): A number of event ids tom create
 
@@ -153,52 +140,50 @@ class User(ABC):
             List[int]: List of event ids for a userto visit within a day
         """
         event_id_list = []
+        number_of_draws = 0
         while len(event_id_list) < number_of_events:
-            choose_reg_or_random = random.choices(
-                ["reg", "random"], weights=[0.6, 0.4], k=1
-            )[0]
+            number_of_draws += 1
+            choose_reg_or_random = self.rng.choice(["reg", "random"], p=[0.6, 0.4])
             if choose_reg_or_random == "reg":
-                event_id = random.choice(regular_location_ids)
+                event_id = int(self.rng.choice(regular_location_ids))
             else:
-                event_id = random.randint(0, len(gdf_event) - 1)
+                event_id = int(self.rng.integers(0, len(event_locations)))
 
             if event_id not in event_id_list:
                 event_id_list.append(event_id)
             else:
                 continue
 
+        get_metrics().count("event_draws", number_of_draws)
+
         return event_id_list
 
     def get_info_about_loc(
-        self, df_loc: DataFrame, list_of_ids: List[int]
+        self, locations: Locations, list_of_ids: List[int]
     ) -> List[List[Union[int, float]]]:
         """
         Based on id of a location find some information about it and store in a list
 
         Args:
-            df_loc (DataFrame): Set of locations of a network and their features to search in based on id
+            locations (Locations): Locations of a network to search in based on id (position)
             list_of_ids (List[int]): List of locations' ids to derive some information about
 
         Returns:
-            List[List[Union[int, float]]]: List of lists, each element has three items: nearest node id and lat and lon coordinates of location's centroid
+            List[List[Union[int, float]]]: List of lists, each element has three items: nearest node id and x and y coordinates of location's centroid
         """
-
-        list_of_info = []
-        for loc_id in list_of_ids:
-            list_of_info.append(
-                [
-                    df_loc.iloc[loc_id]["nearest_node_id"],
-                    df_loc.iloc[loc_id]["geometry"].x,
-                    df_loc.iloc[loc_id]["geometry"].y,
-                ]
+        return [
+            [node_id, x, y]
+            for node_id, x, y in zip(
+                locations.node_id[list_of_ids].tolist(),
+                locations.x[list_of_ids].tolist(),
+                locations.y[list_of_ids].tolist(),
             )
-
-        return list_of_info
+        ]
 
     def create_list_of_locations(
         self,
-        gdf_hw: GeoDataFrame,
-        gdf_event: GeoDataFrame,
+        hw_locations: Locations,
+        event_locations: Locations,
         home_id: int,
         work_id: int,
         regular_location_ids: List[int],
@@ -209,8 +194,8 @@ class User(ABC):
         and derive information about them
 
         Args:
-            gdf_hw (GeoDataFrame): Set of locations (and their features) of a network to use from for home and work anchors
-            gdf_event (GeoDataFrame): Set of locations (and their features) of a network to use for regular and random event anchors
+            hw_locations (Locations): Locations of a network to use for home and work anchors
+            event_locations (Locations): Locations of a network to use for regular and random event anchors
             home_id (int): Id of home anchor
             work_id (int): Id of work anchor
             regular_location_ids (List[int]): List of regular event locations' ids
@@ -221,43 +206,48 @@ class User(ABC):
 
         """
         if day_of_week < 6:
-            number_of_events = random.choices(
-                [0, 1, 2, 3], weights=[0.6, 0.25, 0.1, 0.05], k=1
-            )[0]
+            number_of_events = int(
+                self.rng.choice([0, 1, 2, 3], p=[0.6, 0.25, 0.1, 0.05])
+            )
             list_of_ids = [home_id, work_id]
         else:
-            number_of_events = random.choices(
-                [0, 1, 2, 3, 4], weights=[0.1, 0.2, 0.30, 0.25, 0.15], k=1
-            )[0]
+            number_of_events = int(
+                self.rng.choice([0, 1, 2, 3, 4], p=[0.1, 0.2, 0.30, 0.25, 0.15])
+            )
             list_of_ids = [home_id]
 
         event_id_list = self.get_regular_or_random_loc(
-            gdf_event, regular_location_ids, number_of_events
+            event_locations, regular_location_ids, number_of_events
         )
 
-        list_of_locations_not_event = self.get_info_about_loc(gdf_hw, list_of_ids)
-        list_of_locations_event = self.get_info_about_loc(gdf_event, event_id_list)
+        list_of_locations_not_event = self.get_info_about_loc(hw_locations, list_of_ids)
+        list_of_locations_event = self.get_info_about_loc(
+            event_locations, event_id_list
+        )
 
         list_of_locations = list_of_locations_not_event + list_of_locations_event
 
         return list_of_locations
 
+    @timed("static_points")
     def get_static_points(
         self,
         user_id: int,
-        data_array: List[List[Union[int, float, Timestamp]]],
-        transformer_to_WGS: Transformer,
+        data_array: TrajectoryBuffer,
+        projection: ProjectionContext,
         startlon: float,
         startlat: float,
         time_start: Timestamp,
         time_end: Timestamp,
     ) -> Timestamp:
         """
-        Generate the nearby points around some coordinates (the centroid point of a user’s location)
+        Generate the nearby points around some coordinates (the centroid point of a user’s location).
+        All random gaps, azimuths and distances of a stay are drawn at once and projected with one vectorised call
 
         Args:
             user_id (int): Id of a user
-            data_array (List[List[Union[int, float, Timestamp]]]): List to store user's GPS data (user_id, lon, lat, timestamp)
+            data_array (TrajectoryBuffer): Buffer to store user's GPS data (user_id, timestamp, lon, lat)
+            projection (ProjectionContext): Projection context of a network to convert coordinates to WGS 84
             startlon (float): Longitude of a point where to start generating nearby points (more precisely their coordinates)
             startlat (float): Latitude of a point where to start generating nearby points (more precisely their coordinates)
             time_start (Timestamp): Timestamp from which to start generating static points
@@ -267,23 +257,36 @@ class User(ABC):
             Timestamp: Time from which to start generating GPS data for another activity
         """
         time_start += timedelta(minutes=1)
-        startlon, startlat = transformer_to_WGS.transform(startlon, startlat)
-        while time_start < time_end:
-            random_minutes = random.randint(1, 5)
-            possible_forward_azimuth = random.randint(0, 360)
-            possible_distance = random.randint(0, 5)  # metres
-            endLon, endLat, _ = Geod(ellps="WGS84").fwd(
-                startlon, startlat, possible_forward_azimuth, possible_distance
-            )
-            time_gps = time_start
-            data_array.append([user_id, time_gps, endLon, endLat])
-            time_start += timedelta(minutes=random_minutes)
+        startlon, startlat = projection.to_wgs84(startlon, startlat)
+
+        window_minutes = (time_end - time_start) / timedelta(minutes=1)
+        if window_minutes <= 0:
+            return time_start.round(freq="s")
+
+        # every gap is at least one minute, so the window can not hold more points than its length in minutes
+        max_number_of_points = math.ceil(window_minutes)
+        random_minutes = self.rng.integers(1, 6, size=max_number_of_points)
+        # offsets (in minutes) of each point from time_start, the last one is the time after the last point
+        offsets = np.concatenate(([0], np.cumsum(random_minutes)))
+        number_of_points = int(np.searchsorted(offsets, window_minutes, side="left"))
+
+        possible_forward_azimuth = self.rng.integers(0, 361, size=number_of_points)
+        possible_distance = self.rng.integers(0, 6, size=number_of_points)  # metres
+        endLon, endLat = projection.forward(
+            startlon, startlat, possible_forward_azimuth, possible_distance
+        )
+        # epoch seconds
+        time_gps = (
+            time_start.round(freq="s").value // 10**9 + 60 * offsets[:number_of_points]
+        )
+        data_array.append(user_id, time_gps, endLon, endLat)
+        get_metrics().count("static_points", number_of_points)
+
+        time_start += timedelta(minutes=int(offsets[number_of_points]))
 
         return time_start.round(freq="s")
 
-    def get_points_on_path(
-        self, path: LineString, number_of_points: int
-    ) -> List[Point]:
+    def get_points_on_path(self, path: LineString, number_of_points: int) -> np.ndarray:
         """
         Generate mostly equally distanced points along path between its start and end point
 
@@ -292,13 +295,13 @@ class User(ABC):
             number_of_points (int): Number of points to generate along the path (it includes the start and end point)
 
         Returns:
-            List[Point]: List of points placed on the path
+            np.ndarray: Array of shape (number_of_points, 2) with x and y coordinates of points placed on the path
         """
 
         distances = np.linspace(0, path.length, number_of_points)
-        points = [path.interpolate(distance) for distance in distances]
+        points = shapely.line_interpolate_point(path, distances)
 
-        return points
+        return shapely.get_coordinates(points)
 
     def get_chaotic_point(
         self,
@@ -310,40 +313,148 @@ class User(ABC):
         """
         Produce one chaotic point between two points
         meaning that with very high likelihood it will not be located on the path but near to it.
-        Applied to make a movement look more humanlike
+        Applied to make a movement look more humanlike.
+        A chaotic point is uniformly distributed within the intersection of two circles around the points
+        and a buffer around the path between them, it is drawn directly in segment-aligned coordinates
+        (see get_chaotic_points), no polygons are constructed
 
         Args:
-            point_start (Point): _description_
-            point_end (Point): _description_
+            point_start (Point): A start point of a segment
+            point_end (Point): An end point of a segment
             radius_of_buffer (int): A radius to define a potential space for a chaotic point
             proximity_to_road (int): A distance to define how a chaotic point should be from a path
 
         Returns:
             Point: A chaotic point
         """
+        chaotic_point = self.get_chaotic_points(
+            np.array([[point_start.x, point_start.y]]),
+            np.array([[point_end.x, point_end.y]]),
+            radius_of_buffer,
+            proximity_to_road,
+        )[0]
 
-        points_intersection = point_start.buffer(radius_of_buffer).intersection(
-            point_end.buffer(radius_of_buffer)
-        )
-        path_between_points = LineString([point_start, point_end])
-        final_intersection = points_intersection.intersection(
-            path_between_points.buffer(proximity_to_road)
+        return Point(chaotic_point)
+
+    def get_lens_half_width(
+        self,
+        along_track: np.ndarray,
+        segment_length: np.ndarray,
+        radius_of_buffer: Union[int, float],
+        proximity_to_road: Union[int, float],
+    ) -> np.ndarray:
+        """
+        Half width (cross-track extent) of the area where a chaotic point can be located,
+        i.e. the intersection of two circles around segment's ends and a buffer around the segment itself.
+        Everything is expressed in segment-aligned coordinates: the start of a segment is the origin
+        and the segment goes along the positive axis
+
+        Args:
+            along_track (np.ndarray): Along-track offsets from the start of a segment
+            segment_length (np.ndarray): Length of a segment, broadcastable to along_track
+            radius_of_buffer (Union[int, float]): A radius of circles around start and end of a segment
+            proximity_to_road (Union[int, float]): A radius of a buffer around a segment
+
+        Returns:
+            np.ndarray: Half width of the area for each along-track offset, 0 outside the area
+        """
+        u, d = along_track, segment_length
+        corridor = np.where(
+            u < 0,
+            np.sqrt(np.clip(proximity_to_road**2 - u**2, 0, None)),
+            np.where(
+                u > d,
+                np.sqrt(np.clip(proximity_to_road**2 - (u - d) ** 2, 0, None)),
+                proximity_to_road,
+            ),
         )
-        min_x, min_y, max_x, max_y = final_intersection.bounds
-        while True:
-            chaotic_point = Point(
-                [random.uniform(min_x, max_x), random.uniform(min_y, max_y)]
+        lens = np.sqrt(
+            np.clip(
+                np.minimum(
+                    radius_of_buffer**2 - u**2, radius_of_buffer**2 - (u - d) ** 2
+                ),
+                0,
+                None,
             )
-            if chaotic_point.within(final_intersection):
-                return chaotic_point
+        )
 
+        return np.minimum(corridor, lens)
+
+    @timed("chaotic_points")
+    def get_chaotic_points(
+        self,
+        points_start: np.ndarray,
+        points_end: np.ndarray,
+        radius_of_buffer: Union[int, float],
+        proximity_to_road: Union[int, float],
+        grid_size: int = 64,
+    ) -> np.ndarray:
+        """
+        Produce one chaotic point for each pair of start and end points at once.
+        A chaotic point is uniformly distributed in the area between two points: an along-track offset is drawn
+        from the distribution of the area's width (tabulated on a grid, inverse CDF) and then a cross-track offset
+        is drawn uniformly within the width at this offset, so no rejection sampling is needed
+
+        Args:
+            points_start (np.ndarray): Array of shape (n, 2) with coordinates of segments' start points
+            points_end (np.ndarray): Array of shape (n, 2) with coordinates of segments' end points
+            radius_of_buffer (Union[int, float]): A radius to define a potential space for a chaotic point
+            proximity_to_road (Union[int, float]): A distance to define how a chaotic point should be from a path
+            grid_size (int): Number of along-track nodes used to tabulate the area's width
+
+        Returns:
+            np.ndarray: Array of shape (n, 2) with coordinates of chaotic points
+        """
+        delta = points_end - points_start
+        segment_length = np.hypot(delta[:, 0], delta[:, 1])
+        # unit vectors along and across a segment, any direction is fine for a degenerate segment
+        along = np.where(
+            segment_length[:, None] > 0,
+            delta / np.where(segment_length > 0, segment_length, 1)[:, None],
+            [1.0, 0.0],
+        )
+        across = np.column_stack((-along[:, 1], along[:, 0]))
+
+        lower = np.maximum(-proximity_to_road, segment_length - radius_of_buffer)
+        upper = np.maximum(
+            np.minimum(segment_length + proximity_to_road, radius_of_buffer), lower
+        )
+        step = (upper - lower) / (grid_size - 1)
+        grid = lower[:, None] + step[:, None] * np.arange(grid_size)
+        width = self.get_lens_half_width(
+            grid, segment_length[:, None], radius_of_buffer, proximity_to_road
+        )
+        # area between consecutive grid nodes (trapezoids) and its cumulative sum
+        cell_area = (width[:, 1:] + width[:, :-1]) / 2 * step[:, None]
+        cdf = np.cumsum(cell_area, axis=1)
+        target = self.rng.random(len(points_start)) * cdf[:, -1]
+        cell = np.minimum((cdf < target[:, None]).sum(axis=1), grid_size - 2)
+        rows = np.arange(len(points_start))
+        cdf_before = cdf[rows, cell] - cell_area[rows, cell]
+        fraction = np.divide(
+            target - cdf_before,
+            cell_area[rows, cell],
+            out=self.rng.random(len(points_start)),
+            where=cell_area[rows, cell] > 0,
+        )
+        along_track = grid[rows, cell] + np.clip(fraction, 0, 1) * step
+        cross_track = self.rng.uniform(
+            -1, 1, len(points_start)
+        ) * self.get_lens_half_width(
+            along_track, segment_length, radius_of_buffer, proximity_to_road
+        )
+
+        return (
+            points_start + along_track[:, None] * along + cross_track[:, None] * across
+        )
+
+    @timed("moving_points")
     def get_moving_points(
         self,
         user_id: int,
-        data_array: List[List[Union[int, float, Timestamp]]],
-        graph_proj: MultiDiGraph,
-        nodes: GeoDataFrame,
-        transformer_to_WGS: Transformer,
+        data_array: TrajectoryBuffer,
+        router: Router,
+        projection: ProjectionContext,
         start_node: int,
         end_node: int,
         start_coords: Tuple[float, float],
@@ -354,13 +465,14 @@ class User(ABC):
     ) -> Timestamp:
         """
         First create route between origin and destination locations, interpolate this path with points,
-        and create GPS data while moving from point to point
+        and create GPS data while moving from point to point (with a chaotic point in between each two of them).
+        The whole trip is computed at once: points, chaotic points and times are arrays, projected with one call
 
         Args:
             user_id (int): Id of a user
-            data_array (List[List[Union[int, float, Timestamp]]]): List to store user's GPS data (user_id, lon, lat, timestamp)
-            graph_proj (MultiDiGraph): Projected graph of a network
-            nodes (GeoDataFrame): Nodes of netwrok's projected graph
+            data_array (TrajectoryBuffer): Buffer to store user's GPS data (user_id, timestamp, lon, lat)
+            router (Router): Router of a network to get the shortest route (cached) between nodes
+            projection (ProjectionContext): Projection context of a network to convert coordinates to WGS 84
             start_node (int): Id of the nearest node to a start location
             end_node (int): Id of the nearest node to an end location
             start_coords Tuple[float, float]: Lon and lat of start location
@@ -373,17 +485,13 @@ class User(ABC):
             Timestamp: Time from which to start generating GPS data for another activity
         """
         # get the shortest route from start to end node
-        route = ox.distance.shortest_path(
-            graph_proj, start_node, end_node, weight="length"
-        )
-        route_nodes = nodes.loc[route]
-        route_list = list(route_nodes.geometry.values)
         # add start location's coordinates to the beggining
         # add end location's coordinates to the end
         # not all always locations are near to a network
-        route_list.insert(0, Point(start_coords[0], start_coords[1]))
-        route_list.append(Point(end_coords[0], end_coords[1]))
-        path = LineString(route_list)
+        route_coords = np.vstack(
+            (start_coords, router.get_route_coords(start_node, end_node), end_coords)
+        )
+        path = LineString(route_coords)
 
         # to make sure that the time difference between
         # two consecutive points is not higher than 10 seconds
@@ -396,66 +504,37 @@ class User(ABC):
             number_of_points = math.ceil(path.length / min_dist_between_conseq_points)
 
         points = self.get_points_on_path(path, number_of_points)
+        chaotic_points = self.get_chaotic_points(
+            points[:-1],
+            points[1:],
+            min_dist_between_conseq_points,
+            proximity_to_road,
+        )
 
-        # iterate through each point of created route
-        for i in range(number_of_points):
-            # even though the actual path and points are in projected CRS
-            # the final coordinates should be in WGS 84
-            endLon, endLat = transformer_to_WGS.transform(points[i].x, points[i].y)
-            # if not a last point calculate a chaotic point
-            if i != number_of_points - 1:
-                chaotic_point = self.get_chaotic_point(
-                    points[i],
-                    points[i + 1],
-                    min_dist_between_conseq_points,
-                    proximity_to_road,
-                )
-                distance_to_chaotic_point = LineString(
-                    [points[i], chaotic_point]
-                ).length
-                # discard situations when start point and a chaotic point are too close and thus time difference would be too small
-                # we build the model and don't want to use a lot of memory
-                if distance_to_chaotic_point < mean_move_speed_ms * 2:
-                    time_to_chaotic_point = 2
-                else:
-                    time_to_chaotic_point = (
-                        distance_to_chaotic_point / mean_move_speed_ms
-                    )
-
-                # Add current point's coordinates and the time it was registered in data array
-                time_gps = time_start.round(freq="s")
-                data_array.append([user_id, time_gps, endLon, endLat])
-
-                # Add time taken to reach a chaotic point
-                time_start += timedelta(seconds=time_to_chaotic_point)
-
-                # Change the current coordinates to coordinate of a chaotic point and project to WGS 84
-                endLon, endLat = transformer_to_WGS.transform(
-                    chaotic_point.x, chaotic_point.y
-                )
-                # Lenght from chaotic point to the next point or maybe it will be more clear - end point
-                distance_to_next_point = LineString(
-                    [chaotic_point, points[i + 1]]
-                ).length
-                # discard to precise situations
-                if distance_to_next_point < mean_move_speed_ms * 2:
-                    time_to_next_point = 2
-                else:
-                    time_to_next_point = distance_to_next_point / mean_move_speed_ms
-
-                # Add chaotic point's coordinates and the time it was registered in data array
-                time_gps = time_start.round(freq="s")
-                data_array.append([user_id, time_gps, endLon, endLat])
-
-                # Add time taken to reach a the next point
-                # It will become a start time of the next iteration of a loop
-                time_start += timedelta(seconds=time_to_next_point)
-
-            # if last point in the route - add it and its time to data array
-            else:
-                endLon, endLat = transformer_to_WGS.transform(points[i].x, points[i].y)
-                time_gps = time_start.round(freq="s")
-                data_array.append([user_id, time_gps, endLon, endLat])
+        # the trajectory goes point -> chaotic point -> next point -> ... -> last point
+        trajectory = np.empty((2 * number_of_points - 1, 2))
+        trajectory[0::2] = points
+        trajectory[1::2] = chaotic_points
+
+        # time taken to reach each point of the trajectory from the previous one
+        distances = np.hypot(*np.diff(trajectory, axis=0).T)
+        # discard situations when two consecutive points are too close and thus time difference would be too small
+        # we build the model and don't want to use a lot of memory
+        seconds = np.where(
+            distances < mean_move_speed_ms * 2, 2, distances / mean_move_speed_ms
+        )
+        offsets = np.concatenate(([0], np.cumsum(seconds)))
+
+        # even though the actual path and points are in projected CRS
+        # the final coordinates should be in WGS 84
+        endLon, endLat = projection.to_wgs84(trajectory[:, 0], trajectory[:, 1])
+        # epoch seconds, rounded half to even as Timestamp.round does
+        time_gps = np.rint(time_start.value / 10**9 + offsets).astype(np.int64)
+        data_array.append(user_id, time_gps, endLon, endLat)
+        get_metrics().count("moving_points", len(time_gps))
+        get_metrics().count("chaotic_points", len(chaotic_points))
+
+        time_start += timedelta(seconds=offsets[-1])
 
         return time_start.round(freq="s")
 
@@ -466,9 +545,8 @@ class User(ABC):
         beggining_of_day: Timestamp,
         day_of_week: int,
         list_of_locations: List[List[Union[int, float]]],
-        network_graph_proj: MultiDiGraph,
-        network_nodes: GeoDataFrame,
-        transformer_to_WGS: Transformer,
+        network_router: Router,
+        projection: ProjectionContext,
     ) -> Timestamp:
         # pylint: disable=missing-function-docstring
         pass
@@ -476,11 +554,10 @@ class User(ABC):
     @abstractmethod
     def generate_gps(
         self,
-        network_gdf_hw: GeoDataFrame,
-        network_gdf_event: GeoDataFrame,
-        network_graph_proj: MultiDiGraph,
-        network_nodes: GeoDataFrame,
-        transformer_to_WGS: Transformer,
+        network_hw_locations: Locations,
+        network_event_locations: Locations,
+        network_router: Router,
+        projection: ProjectionContext,
     ):
         # pylint: disable=missing-function-docstring
         pass
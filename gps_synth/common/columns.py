@@ -19,3 +19,6 @@ class ColNames:
     home_id = "home_id"
     work_id = "work_id"
     regular_loc_array = "regular_loc_array"
+    # partition columns of GPS output derived from timestamp and user_id
+    date = "date"
+    user_bucket = "user_bucket"
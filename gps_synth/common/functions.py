@@ -2,12 +2,18 @@ import importlib
 import os
 import shutil
 import uuid
-from typing import List, Optional, Type
+from typing import Any, Dict, List, Optional, Type
 
 import pyarrow as pa
 import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from pandas import DataFrame
 
+# limit of partitions of a dataset written at once (pyarrow's default is 1024), e.g. days x user buckets of GPS output
+MAX_PARTITIONS_PER_WRITE = 1 << 16
+# name of a summary file of a parquet dataset, see write_parquet_summary
+PARQUET_SUMMARY_FILE_NAME = "_metadata"
+
 
 def delete_directory(directory: str) -> None:
     """
@@ -62,7 +68,8 @@ def write_df_to_parquet(
     base_dir: str,
     partition_cols: Optional[List[str]] = None,
     existing_data_behavior: Optional[str] = None,
-) -> None:
+    basename: Optional[str] = None,
+) -> int:
     """
     Writes dataframe to Parquet
     If df is empty, writes a file
@@ -73,6 +80,48 @@ def write_df_to_parquet(
         base_dir (str): Base directory where to write data
         partition_cols (Optional[List[str]] = None): A list of columns to use for partitioning, if None use [profile_name]
         existing_data_behavior (str): Controls how the dataset will handle data that already exists in the destination
+        basename (Optional[str] = None): Deterministic name of written files (a file with the same name is overwritten),
+                                         if None a unique name is generated, so data is appended
+
+    Returns:
+        int: Number of bytes written
+    """
+
+    table = pa.Table.from_pandas(df)
+
+    del df
+
+    return write_table_to_parquet(
+        table, base_dir, partition_cols, existing_data_behavior, basename
+    )
+
+
+def write_table_to_parquet(
+    table: pa.Table,
+    base_dir: str,
+    partition_cols: Optional[List[str]] = None,
+    existing_data_behavior: Optional[str] = None,
+    basename: Optional[str] = None,
+    file_options: Optional[Dict[str, Any]] = None,
+    row_group_size: Optional[int] = None,
+) -> int:
+    """
+    Writes Arrow table to Parquet, see write_df_to_parquet
+
+    Args:
+        table (pa.Table): Table to write in parquet
+        base_dir (str): Base directory where to write data
+        partition_cols (Optional[List[str]] = None): A list of columns to use for partitioning, if None use [profile_name]
+        existing_data_behavior (str): Controls how the dataset will handle data that already exists in the destination
+        basename (Optional[str] = None): Deterministic name of written files (a file with the same name is overwritten),
+                                         if None a unique name is generated, so data is appended
+        file_options (Optional[Dict[str, Any]] = None): Parquet writer options (e.g. compression, compression_level,
+                                                         use_dictionary, write_statistics), if None pyarrow defaults are used
+        row_group_size (Optional[int] = None): Number of rows in a row group (the last one of a file may be smaller),
+                                               if None pyarrow defaults are used
+
+    Returns:
+        int: Number of bytes written
     """
 
     partition_cols = ["profile_name"] if partition_cols is None else partition_cols
@@ -88,9 +137,7 @@ def write_df_to_parquet(
     if os.path.exists(base_dir) and os.path.isfile(base_dir):
         os.remove(base_dir)
 
-    table = pa.Table.from_pandas(df)
-
-    del df
+    written_paths = []
 
     # if path exists - overwrite
     # if path is unqiue - append
@@ -101,5 +148,72 @@ def write_df_to_parquet(
         partitioning=partition_cols,
         existing_data_behavior=existing_data_behavior,
         partitioning_flavor="hive",
-        basename_template="part-{i}" + f"{uuid.uuid4().hex}.parquet",
+        basename_template=(
+            "part-{i}" + f"{uuid.uuid4().hex}.parquet"
+            if basename is None
+            else f"{basename}-" + "{i}.parquet"
+        ),
+        file_options=(
+            None
+            if file_options is None
+            else ds.ParquetFileFormat().make_write_options(**file_options)
+        ),
+        max_partitions=MAX_PARTITIONS_PER_WRITE,
+        min_rows_per_group=row_group_size or 0,
+        max_rows_per_group=row_group_size or 1024 * 1024,
+        file_visitor=lambda written_file: written_paths.append(written_file.path),
     )
+
+    return sum(map(os.path.getsize, written_paths))
+
+
+def write_parquet_summary(base_dir: str) -> int:
+    """
+    Write a _metadata summary file of a parquet dataset: footers of all its files (schema, row groups and their statistics)
+    with paths of files relative to base_dir, so a reader (e.g. pyarrow.dataset.parquet_dataset) prunes partitions
+    and row groups without listing and opening every file. The file is replaced atomically
+
+    Args:
+        base_dir (str): Base directory of a dataset
+
+    Raises:
+        ValueError: If files of a dataset have different schemas
+
+    Returns:
+        int: Number of files in the summary
+    """
+    metadata_collector = []
+    for root, dir_names, file_names in os.walk(base_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if not file_name.endswith(".parquet"):
+                continue
+            file_path = os.path.join(root, file_name)
+            file_metadata = pq.read_metadata(file_path)
+            if metadata_collector and not file_metadata.schema.equals(
+                metadata_collector[0].schema
+            ):
+                raise ValueError(
+                    f"Schema of '{file_path}' differs from other files of the dataset"
+                )
+            file_metadata.set_file_path(
+                os.path.relpath(file_path, base_dir).replace(os.sep, "/")
+            )
+            metadata_collector.append(file_metadata)
+
+    summary_path = os.path.join(base_dir, PARQUET_SUMMARY_FILE_NAME)
+    if not metadata_collector:
+        if os.path.exists(summary_path):
+            os.remove(summary_path)
+        return 0
+
+    # a name starting with "_" is ignored by dataset discovery, so readers never see a partially written summary
+    tmp_path = f"{summary_path}.tmp"
+    pq.write_metadata(
+        metadata_collector[0].schema.to_arrow_schema(),
+        tmp_path,
+        metadata_collector=metadata_collector,
+    )
+    os.replace(tmp_path, summary_path)
+
+    return len(metadata_collector)
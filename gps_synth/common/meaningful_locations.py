@@ -0,0 +1,218 @@
+"""
+Bulk assignment of meaningful locations (home, work, regular events) to all users of a profile.
+
+Instead of drawing anchors user by user with open-ended retries, all homes are sampled at once,
+candidates for work and regular events of all homes are found with batched radius queries of a spatial index,
+and choices are drawn vectorially with a NumPy Generator. Retries are bounded: users who did not get
+their anchors within `max_attempts` rounds are reported as failed instead of looping forever in sparse regions.
+"""
+
+import numpy as np
+
+from gps_synth.common.metrics import get_metrics, timed
+from gps_synth.network.locations import Locations
+
+# minimal number of locations within a radius around home to choose work or regular events from
+MIN_NEIGHBOURS = 20
+# number of users whose candidate locations are held in memory at once
+ASSIGNMENT_BATCH_SIZE = 1024
+
+
+class MeaningfulLocations:
+    """
+    Compact anchors of users: positions of home and work in home/work locations of a network
+    and a ragged array of positions of regular events in event locations
+    """
+
+    def __init__(
+        self,
+        home_ids: np.ndarray,
+        work_ids: np.ndarray,
+        regular_ids: np.ndarray,
+        regular_offsets: np.ndarray,
+        number_of_failed: int = 0,
+    ):
+        self.home_ids = home_ids
+        self.work_ids = work_ids
+        # regular events of i-th user are regular_ids[regular_offsets[i]:regular_offsets[i + 1]]
+        self.regular_ids = regular_ids
+        self.regular_offsets = regular_offsets
+        # number of users who did not get anchors within the retry budget
+        self.number_of_failed = number_of_failed
+
+    def __len__(self) -> int:
+        return len(self.home_ids)
+
+    def get_regular_ids(self, user_index: int) -> np.ndarray:
+        """
+        Get regular event locations of a user
+
+        Args:
+            user_index (int): Position of a user
+
+        Returns:
+            np.ndarray: Positions of regular event locations
+        """
+        return self.regular_ids[
+            self.regular_offsets[user_index] : self.regular_offsets[user_index + 1]
+        ]
+
+    def take(self, start: int, end: int) -> "MeaningfulLocations":
+        """
+        Get anchors of a contiguous range of users
+
+        Args:
+            start (int): Position of the first user
+            end (int): Position after the last user
+
+        Returns:
+            MeaningfulLocations: Anchors of users from start to end
+        """
+        end = min(end, len(self))
+        regular_offsets = self.regular_offsets[start : end + 1]
+
+        return MeaningfulLocations(
+            self.home_ids[start:end],
+            self.work_ids[start:end],
+            self.regular_ids[regular_offsets[0] : regular_offsets[-1]],
+            regular_offsets - regular_offsets[0],
+        )
+
+
+def choose_from_ragged(
+    flat: np.ndarray,
+    offsets: np.ndarray,
+    sizes: np.ndarray,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    Choose sizes[i] distinct elements uniformly at random from each row of a ragged array,
+    by taking elements with the smallest random keys within each row
+
+    Args:
+        flat (np.ndarray): Flat elements of a ragged array
+        offsets (np.ndarray): Offsets of rows, i-th row is flat[offsets[i]:offsets[i + 1]]
+        sizes (np.ndarray): Number of elements to choose from each row, not more than a length of a row
+        rng (np.random.Generator): Generator to draw random keys
+
+    Returns:
+        np.ndarray: Chosen elements, row by row (sizes[i] elements of i-th row)
+    """
+    row = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    order = np.lexsort((rng.random(len(flat)), row))
+    rank = np.arange(len(flat)) - offsets[row]
+
+    return flat[order][rank < sizes[row]]
+
+
+@timed("meaningful_locations")
+def assign_meaningful_locations(
+    hw_locations: Locations,
+    event_locations: Locations,
+    number_of_users: int,
+    radius_buffer_h_w: float,
+    radius_buffer_h_r: float,
+    rng: np.random.Generator,
+    max_attempts: int = 100,
+) -> MeaningfulLocations:
+    """
+    Assign meaningful locations to users of a profile all at once:
+
+    - a home is a random home/work location with at least MIN_NEIGHBOURS home/work locations within radius_buffer_h_w,
+      homes not satisfying it are redrawn, at most max_attempts times
+    - work is a random home/work location within radius_buffer_h_w of home, other than home
+    - 4-6 regular events are distinct random event locations within a radius of home, the radius starts from radius_buffer_h_r
+      and grows by 100 meters (at most max_attempts times) till there are at least MIN_NEIGHBOURS event locations within it
+
+    Args:
+        hw_locations (Locations): Spatial index of locations of a network to choose from for home and work anchors
+        event_locations (Locations): Spatial index of locations of a network to choose from for regular event anchors
+        number_of_users (int): Number of users to assign anchors to
+        radius_buffer_h_w (float): Radius around home anchor to search for work anchor
+        radius_buffer_h_r (float): Initial radius around home anchor to search for regular event anchors
+        rng (np.random.Generator): Generator to draw all random choices
+        max_attempts (int): Maximal number of rounds to find a home or a radius for regular events
+
+    Returns:
+        MeaningfulLocations: Anchors of users who got them (in the order of users), and the number of failed users
+    """
+    home_ids = np.full(number_of_users, -1, dtype=np.int64)
+    pending = np.arange(number_of_users)
+    for _ in range(max_attempts):
+        if len(pending) == 0:
+            break
+        candidates = rng.integers(0, len(hw_locations), size=len(pending))
+        get_metrics().count("home_draws", len(candidates))
+        is_valid = (
+            hw_locations.count_within(
+                hw_locations.x[candidates],
+                hw_locations.y[candidates],
+                radius_buffer_h_w,
+            )
+            >= MIN_NEIGHBOURS
+        )
+        home_ids[pending[is_valid]] = candidates[is_valid]
+        pending = pending[~is_valid]
+
+    home_ids = home_ids[home_ids >= 0]
+    home_x, home_y = hw_locations.x[home_ids], hw_locations.y[home_ids]
+
+    # radius to search for regular events grows until there are enough of them around home
+    radius_h_r = np.full(len(home_ids), radius_buffer_h_r, dtype=np.float64)
+    pending = np.arange(len(home_ids))
+    for _ in range(max_attempts):
+        is_sparse = (
+            event_locations.count_within(
+                home_x[pending], home_y[pending], radius_h_r[pending]
+            )
+            < MIN_NEIGHBOURS
+        )
+        pending = pending[is_sparse]
+        if len(pending) == 0:
+            break
+        radius_h_r[pending] += 100
+        get_metrics().count("regular_radius_expansions", len(pending))
+
+    is_assigned = np.ones(len(home_ids), dtype=bool)
+    is_assigned[pending] = False
+    home_ids, home_x, home_y, radius_h_r = (
+        home_ids[is_assigned],
+        home_x[is_assigned],
+        home_y[is_assigned],
+        radius_h_r[is_assigned],
+    )
+    number_of_regular = rng.integers(3, 6, size=len(home_ids)) + 1
+
+    work_ids_batches, regular_ids_batches = [], []
+    for start in range(0, len(home_ids), ASSIGNMENT_BATCH_SIZE):
+        batch = slice(start, start + ASSIGNMENT_BATCH_SIZE)
+
+        # work among home/work locations around home except home itself
+        flat, offsets = hw_locations.query_radius_many(
+            home_x[batch], home_y[batch], radius_buffer_h_w
+        )
+        counts = np.diff(offsets)
+        home_position = (
+            np.flatnonzero(flat == np.repeat(home_ids[batch], counts)) - offsets[:-1]
+        )
+        choice = rng.integers(0, counts - 1)
+        choice += choice >= home_position
+        work_ids_batches.append(flat[offsets[:-1] + choice])
+
+        flat, offsets = event_locations.query_radius_many(
+            home_x[batch], home_y[batch], radius_h_r[batch]
+        )
+        regular_ids_batches.append(
+            choose_from_ragged(flat, offsets, number_of_regular[batch], rng)
+        )
+
+    regular_offsets = np.zeros(len(home_ids) + 1, dtype=np.int64)
+    np.cumsum(number_of_regular, out=regular_offsets[1:])
+
+    return MeaningfulLocations(
+        home_ids,
+        np.concatenate(work_ids_batches or [np.empty(0, dtype=np.int64)]),
+        np.concatenate(regular_ids_batches or [np.empty(0, dtype=np.int64)]),
+        regular_offsets,
+        number_of_failed=number_of_users - len(home_ids),
+    )
@@ -0,0 +1,163 @@
+"""
+Run metrics: per-stage timers and counters collected in the main process and in worker processes.
+
+Hot paths record into the active RunMetrics of a process (get_metrics), e.g. `with get_metrics().timer("routing"):`,
+`@timed("static_points")` or `get_metrics().count("routes_computed")`. generate_users_chunk activates a fresh RunMetrics for a chunk and returns
+it with the chunk, so metrics of chunks generated by workers are merged into the metrics of a profile in the main process.
+Timers are inclusive (a stage contains time of stages called from it) and are summed over processes,
+so with several workers they add up to more than the wall time of a run.
+"""
+
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+
+class RunMetrics:
+    def __init__(self):
+        # stage name -> [number of calls, seconds]
+        self.timers: Dict[str, List[float]] = {}
+        # counter name -> value
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Time a block of code as one call of a stage
+
+        Args:
+            name (str): Name of a stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        # pylint: disable=missing-function-docstring
+        timer = self.timers.setdefault(name, [0, 0.0])
+        timer[0] += calls
+        timer[1] += seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        # pylint: disable=missing-function-docstring
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def merge(self, other: "RunMetrics") -> None:
+        """
+        Add timers and counters of other metrics (e.g. of a chunk generated by a worker)
+
+        Args:
+            other (RunMetrics): Metrics to add
+        """
+        for name, (calls, seconds) in other.timers.items():
+            self.add_time(name, seconds, calls)
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    @classmethod
+    def combine(cls, metrics: Iterable["RunMetrics"]) -> "RunMetrics":
+        # pylint: disable=missing-function-docstring
+        combined = cls()
+        for other in metrics:
+            combined.merge(other)
+
+        return combined
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert metrics to a JSON serialisable form, stages are sorted by time
+
+        Returns:
+            Dict[str, Any]: Timers (calls, seconds and milliseconds per call of each stage) and counters
+        """
+        return {
+            "timers": {
+                name: {
+                    "calls": calls,
+                    "seconds": round(seconds, 6),
+                    "ms_per_call": round(seconds / calls * 1000, 6) if calls else 0.0,
+                }
+                for name, (calls, seconds) in sorted(
+                    self.timers.items(), key=lambda item: -item[1][1]
+                )
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+# metrics of a process hot paths record into, see use_metrics
+_active_metrics = RunMetrics()
+
+
+def get_metrics() -> RunMetrics:
+    """
+    Get the active metrics of the current process
+
+    Returns:
+        RunMetrics: Metrics to record timers and counters into
+    """
+    return _active_metrics
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing every call of a function as a stage of the metrics active at the time of a call
+
+    Args:
+        name (str): Name of a stage
+
+    Returns:
+        Callable[[Callable], Callable]: Decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _active_metrics.add_time(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def use_metrics(metrics: RunMetrics) -> Iterator[RunMetrics]:
+    """
+    Make metrics active within a block (e.g. while a chunk or a profile is generated), the previous ones are restored after it
+
+    Args:
+        metrics (RunMetrics): Metrics to record into
+
+    Yields:
+        RunMetrics: The activated metrics
+    """
+    global _active_metrics  # pylint: disable=global-statement
+    previous_metrics = _active_metrics
+    _active_metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _active_metrics = previous_metrics
+
+
+def write_run_report(report_path: str, report: Dict[str, Any]) -> None:
+    """
+    Write a run report as JSON atomically
+
+    Args:
+        report_path (str): Path of a JSON file
+        report (Dict[str, Any]): Report to write
+    """
+    tmp_path = f"{report_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f_out:
+        json.dump(report, f_out, indent=2, default=str)
+    os.replace(tmp_path, report_path)
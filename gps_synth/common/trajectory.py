@@ -0,0 +1,228 @@
+"""
+Columnar storage of generated GPS records.
+
+TrajectoryBuffer keeps records in growable NumPy arrays (int64 epoch seconds, float64 lon/lat)
+with a dictionary-encoded user id, so millions of records do not turn into millions of Python objects.
+"""
+
+import zlib
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pyarrow as pa
+
+from gps_synth.common.columns import ColNames
+
+
+def get_user_bucket(user_id: str, number_of_buckets: int) -> int:
+    """
+    Get a bucket of a user (user_bucket partition of GPS output), stable across processes and runs
+
+    Args:
+        user_id (str): Id of a user
+        number_of_buckets (int): Number of buckets
+
+    Returns:
+        int: CRC-32 of a user id modulo the number of buckets
+    """
+    return zlib.crc32(user_id.encode("utf-8")) % number_of_buckets
+
+
+class TrajectoryBuffer:
+    def __init__(self, capacity: int = 1024):
+        # dictionary of user ids, user_code column refers to positions in this list
+        self.user_ids: List[str] = []
+        self._user_codes: Dict[str, int] = {}
+
+        self._size = 0
+        self._user_code = np.empty(capacity, dtype=np.int32)
+        self._timestamp = np.empty(capacity, dtype=np.int64)
+        self._lon = np.empty(capacity, dtype=np.float64)
+        self._lat = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def user_code(self) -> np.ndarray:
+        # pylint: disable=missing-function-docstring
+        return self._user_code[: self._size]
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        # pylint: disable=missing-function-docstring
+        return self._timestamp[: self._size]
+
+    @property
+    def lon(self) -> np.ndarray:
+        # pylint: disable=missing-function-docstring
+        return self._lon[: self._size]
+
+    @property
+    def lat(self) -> np.ndarray:
+        # pylint: disable=missing-function-docstring
+        return self._lat[: self._size]
+
+    def get_user_code(self, user_id: str) -> int:
+        """
+        Get a code of a user id in the buffer's dictionary, add the user id if it is not there yet
+
+        Args:
+            user_id (str): Id of a user
+
+        Returns:
+            int: Position of the user id in the dictionary
+        """
+        user_code = self._user_codes.get(user_id)
+        if user_code is None:
+            user_code = len(self.user_ids)
+            self._user_codes[user_id] = user_code
+            self.user_ids.append(user_id)
+
+        return user_code
+
+    def reserve(self, size: int) -> None:
+        """
+        Make sure the buffer can hold at least size records without reallocation, grow geometrically otherwise
+
+        Args:
+            size (int): Number of records the buffer should be able to hold
+        """
+        capacity = len(self._timestamp)
+        if size <= capacity:
+            return
+
+        new_capacity = max(size, 2 * capacity)
+        for attr in ["_user_code", "_timestamp", "_lon", "_lat"]:
+            column = getattr(self, attr)
+            new_column = np.empty(new_capacity, dtype=column.dtype)
+            new_column[: self._size] = column[: self._size]
+            setattr(self, attr, new_column)
+
+    def append(
+        self,
+        user_id: str,
+        timestamps: np.ndarray,
+        lons: np.ndarray,
+        lats: np.ndarray,
+    ) -> None:
+        """
+        Append a batch of records of one user
+
+        Args:
+            user_id (str): Id of a user
+            timestamps (np.ndarray): Epoch seconds of the records
+            lons (np.ndarray): Longitudes of the records
+            lats (np.ndarray): Latitudes of the records
+        """
+        number_of_records = len(timestamps)
+        start, end = self._size, self._size + number_of_records
+        self.reserve(end)
+
+        self._user_code[start:end] = self.get_user_code(user_id)
+        self._timestamp[start:end] = timestamps
+        self._lon[start:end] = lons
+        self._lat[start:end] = lats
+        self._size = end
+
+    def extend(self, other: "TrajectoryBuffer") -> None:
+        """
+        Append all records of another buffer, user codes are translated to the dictionary of this buffer
+
+        Args:
+            other (TrajectoryBuffer): A buffer to copy records from
+        """
+        code_mapping = np.array(
+            [self.get_user_code(user_id) for user_id in other.user_ids],
+            dtype=np.int32,
+        )
+        start, end = self._size, self._size + len(other)
+        self.reserve(end)
+
+        self._user_code[start:end] = code_mapping[other.user_code]
+        self._timestamp[start:end] = other.timestamp
+        self._lon[start:end] = other.lon
+        self._lat[start:end] = other.lat
+        self._size = end
+
+    @classmethod
+    def concat(cls, buffers: Iterable["TrajectoryBuffer"]) -> "TrajectoryBuffer":
+        """
+        Concatenate several buffers into a new one
+
+        Args:
+            buffers (Iterable[TrajectoryBuffer]): Buffers to concatenate
+
+        Returns:
+            TrajectoryBuffer: A buffer with all records of the given buffers
+        """
+        buffers = list(buffers)
+        result = cls(capacity=max(sum(len(buffer) for buffer in buffers), 1))
+        for buffer in buffers:
+            result.extend(buffer)
+
+        return result
+
+    def sort(self) -> None:
+        """
+        Sort records in place by user id and timestamp
+        """
+        # rank of each user code in the lexicographic order of user ids
+        user_rank = np.empty(len(self.user_ids), dtype=np.int64)
+        user_rank[np.argsort(np.array(self.user_ids, dtype=object))] = np.arange(
+            len(self.user_ids)
+        )
+        order = np.lexsort((self.timestamp, user_rank[self.user_code]))
+
+        for attr in ["_user_code", "_timestamp", "_lon", "_lat"]:
+            column = getattr(self, attr)
+            column[: self._size] = column[: self._size][order]
+
+    def to_arrow(self, dictionary_user_id: bool = True) -> pa.Table:
+        """
+        Convert records to an Arrow table without copying the columns:
+        user_id is dictionary-encoded, timestamp is timestamp[s], lon and lat are float64
+
+        Args:
+            dictionary_user_id (bool): If False user_id is decoded to a string column (the only copied column)
+
+        Returns:
+            pa.Table: Table with user_id, timestamp, lon, lat columns
+        """
+        user_id = pa.DictionaryArray.from_arrays(
+            pa.array(self.user_code), pa.array(self.user_ids, type=pa.string())
+        )
+        if not dictionary_user_id:
+            user_id = user_id.dictionary_decode()
+        timestamp = pa.array(self.timestamp).view(pa.timestamp("s"))
+
+        return pa.Table.from_arrays(
+            [user_id, timestamp, pa.array(self.lon), pa.array(self.lat)],
+            names=[ColNames.user_id, ColNames.timestamp, ColNames.lon, ColNames.lat],
+        )
+
+    def get_dates(self) -> np.ndarray:
+        """
+        Get UTC dates of records
+
+        Returns:
+            np.ndarray: datetime64[D] date of every record
+        """
+        return self.timestamp.astype("datetime64[s]").astype("datetime64[D]")
+
+    def get_user_buckets(self, number_of_buckets: int) -> np.ndarray:
+        """
+        Get buckets of users of records, see get_user_bucket
+
+        Args:
+            number_of_buckets (int): Number of buckets
+
+        Returns:
+            np.ndarray: int32 bucket of a user of every record
+        """
+        buckets = np.array(
+            [get_user_bucket(user_id, number_of_buckets) for user_id in self.user_ids],
+            dtype=np.int32,
+        )
+
+        return buckets[self.user_code]
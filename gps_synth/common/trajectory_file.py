@@ -0,0 +1,420 @@
+"""
+Compact binary trajectory files for replaying GPS data as a stream.
+
+A file holds records of users sorted by (user_id, timestamp), each user's records being a contiguous block.
+All numbers are little-endian and every section starts at a multiple of 8 bytes:
+
+- header (HEADER_DTYPE): magic, format version, width of user ids, number of users and records, coordinate scale
+- index (get_index_dtype): per user its id, timestamp of its first record, offset of its block and number of records,
+  sorted by user id
+- timestamp deltas (uint32): seconds since the previous record of a user, 0 for the first record of a user
+- lon, lat (int32): fixed-point coordinates, degrees multiplied by the coordinate scale (1e7, about 1 cm)
+
+TrajectoryFile memory-maps a file, so its sections are NumPy views of the page cache instead of decoded copies:
+opening a file reads only its header and index, blocks of users are decoded lazily, and records of all users (and of
+several files, see merge_records) are iterated in time order with a k-way merge holding about one decoded block per
+user.
+"""
+
+import os
+import uuid
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from gps_synth.common.columns import ColNames
+from gps_synth.common.functions import check_or_create_dir
+from gps_synth.common.trajectory import TrajectoryBuffer
+
+TRAJECTORY_FILE_MAGIC = b"GPSYNTRJ"
+TRAJECTORY_FILE_VERSION = 1
+TRAJECTORY_FILE_EXTENSION = ".trj"
+# fixed-point lon/lat: 1e-7 degrees, int32 holds +-214 degrees
+COORDINATE_SCALE = 10**7
+# number of records of a user decoded at once while iterating
+DECODE_BLOCK_SIZE = 4096
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("user_id_size", "<u4"),
+        ("number_of_users", "<u8"),
+        ("number_of_records", "<u8"),
+        ("coordinate_scale", "<i8"),
+    ]
+)
+
+# a record: (timestamp, user_id, lon, lat)
+Record = Tuple[int, str, float, float]
+
+
+def get_index_dtype(user_id_size: int) -> np.dtype:
+    # pylint: disable=missing-function-docstring
+    return np.dtype(
+        [
+            ("user_id", f"S{user_id_size}"),
+            ("start_timestamp", "<i8"),
+            ("offset", "<u8"),
+            ("count", "<u8"),
+        ]
+    )
+
+
+def get_section_offsets(
+    user_id_size: int, number_of_users: int, number_of_records: int
+) -> List[int]:
+    """
+    Get offsets of sections of a file: index, timestamp deltas, lon, lat and the end of a file
+
+    Args:
+        user_id_size (int): Width of user ids in bytes
+        number_of_users (int): Number of users
+        number_of_records (int): Number of records
+
+    Returns:
+        List[int]: Offsets in bytes, each aligned to 8 bytes
+    """
+    section_sizes = [
+        HEADER_DTYPE.itemsize,
+        get_index_dtype(user_id_size).itemsize * number_of_users,
+        4 * number_of_records,
+        4 * number_of_records,
+        4 * number_of_records,
+    ]
+    offsets = []
+    offset = 0
+    for section_size in section_sizes:
+        offset += -(-section_size // 8) * 8
+        offsets.append(offset)
+
+    return offsets
+
+
+def get_trajectory_file_path(
+    directory: str, profile_name: str, basename: Optional[str] = None
+) -> str:
+    """
+    Get a path of a trajectory file of a batch of users, partitioned by profile as GPS output
+
+    Args:
+        directory (str): Directory of trajectory files (OUTPUTS.TRAJECTORIES.PATH)
+        profile_name (str): Name of a profile the users belong to
+        basename (Optional[str] = None): Deterministic name of a file, if None a unique name is generated
+
+    Returns:
+        str: {directory}/profile_name={profile_name}/{basename}.trj
+    """
+    if basename is None:
+        basename = f"part-{uuid.uuid4().hex}"
+
+    return os.path.join(
+        directory,
+        f"{ColNames.profile_name}={profile_name}",
+        basename + TRAJECTORY_FILE_EXTENSION,
+    )
+
+
+def write_trajectory_file(gps_data: TrajectoryBuffer, file_path: str) -> int:
+    """
+    Write records of users to a trajectory file (creating its directory), the file is replaced atomically
+
+    Args:
+        gps_data (TrajectoryBuffer): Records sorted by (user_id, timestamp), see TrajectoryBuffer.sort
+        file_path (str): Path of a file
+
+    Raises:
+        ValueError: If records are not sorted or consecutive records of a user are more than 2**32 seconds apart
+
+    Returns:
+        int: Number of bytes written
+    """
+    user_code = gps_data.user_code
+    timestamp = gps_data.timestamp
+    # first record of every user's block
+    block_starts = np.flatnonzero(np.diff(user_code, prepend=-1))
+    block_counts = np.diff(block_starts, append=len(gps_data))
+    block_user_ids = [
+        gps_data.user_ids[code].encode("utf-8") for code in user_code[block_starts]
+    ]
+    if len(set(block_user_ids)) != len(block_user_ids) or block_user_ids != sorted(
+        block_user_ids
+    ):
+        raise ValueError("Records are not sorted by user_id")
+
+    deltas = np.diff(timestamp, prepend=0)
+    deltas[block_starts] = 0
+    if len(deltas) and (deltas.min() < 0 or deltas.max() > np.iinfo(np.uint32).max):
+        raise ValueError("Records are not sorted by timestamp within users")
+
+    user_id_size = max(map(len, block_user_ids), default=1)
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (
+        TRAJECTORY_FILE_MAGIC,
+        TRAJECTORY_FILE_VERSION,
+        user_id_size,
+        len(block_starts),
+        len(gps_data),
+        COORDINATE_SCALE,
+    )
+    index = np.zeros(len(block_starts), dtype=get_index_dtype(user_id_size))
+    index["user_id"] = block_user_ids
+    index["start_timestamp"] = timestamp[block_starts]
+    index["offset"] = block_starts
+    index["count"] = block_counts
+
+    sections = [
+        header,
+        index,
+        deltas.astype("<u4"),
+        np.round(gps_data.lon * COORDINATE_SCALE).astype("<i4"),
+        np.round(gps_data.lat * COORDINATE_SCALE).astype("<i4"),
+    ]
+    offsets = get_section_offsets(user_id_size, len(block_starts), len(gps_data))
+
+    check_or_create_dir(os.path.dirname(file_path))
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f_out:
+        position = 0
+        for section, section_end in zip(sections, offsets):
+            f_out.write(section.tobytes())
+            position += section.nbytes
+            f_out.write(b"\x00" * (section_end - position))
+            position = section_end
+    os.replace(tmp_path, file_path)
+
+    return offsets[-1]
+
+
+class TrajectoryFile:
+    """
+    Memory-mapped trajectory file written by write_trajectory_file
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.buffer = np.memmap(file_path, dtype=np.uint8, mode="r")
+
+        header = np.frombuffer(self.buffer, dtype=HEADER_DTYPE, count=1)[0]
+        if (
+            header["magic"] != TRAJECTORY_FILE_MAGIC
+            or header["version"] != TRAJECTORY_FILE_VERSION
+        ):
+            raise ValueError(f"'{file_path}' is not a trajectory file")
+        self.coordinate_scale = int(header["coordinate_scale"])
+        number_of_users = int(header["number_of_users"])
+        number_of_records = int(header["number_of_records"])
+
+        offsets = get_section_offsets(
+            int(header["user_id_size"]), number_of_users, number_of_records
+        )
+        self.index = np.frombuffer(
+            self.buffer,
+            dtype=get_index_dtype(int(header["user_id_size"])),
+            count=number_of_users,
+            offset=offsets[0],
+        )
+        self.deltas, self.lon, self.lat = (
+            np.frombuffer(
+                self.buffer, dtype=dtype, count=number_of_records, offset=offset
+            )
+            for dtype, offset in zip(("<u4", "<i4", "<i4"), offsets[1:4])
+        )
+
+        self.user_ids: List[str] = [
+            user_id.decode("utf-8") for user_id in self.index["user_id"].tolist()
+        ]
+        self._user_positions: Dict[str, int] = {
+            user_id: position for position, user_id in enumerate(self.user_ids)
+        }
+
+    def __len__(self) -> int:
+        return len(self.deltas)
+
+    def get_user_block(
+        self, user_id: str
+    ) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get encoded records of a user without copying them
+
+        Args:
+            user_id (str): Id of a user
+
+        Returns:
+            Tuple[int, np.ndarray, np.ndarray, np.ndarray]: Timestamp of the first record, views of timestamp deltas
+            and fixed-point lon and lat
+        """
+        user_index = self.index[self._user_positions[user_id]]
+        block = slice(
+            int(user_index["offset"]), int(user_index["offset"] + user_index["count"])
+        )
+
+        return (
+            int(user_index["start_timestamp"]),
+            self.deltas[block],
+            self.lon[block],
+            self.lat[block],
+        )
+
+    def read_user(self, user_id: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Decode records of a user
+
+        Args:
+            user_id (str): Id of a user
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: int64 epoch seconds, float64 lon and lat
+        """
+        start_timestamp, deltas, lon, lat = self.get_user_block(user_id)
+
+        return (
+            start_timestamp + np.cumsum(deltas, dtype=np.int64),
+            lon / self.coordinate_scale,
+            lat / self.coordinate_scale,
+        )
+
+    def iter_user_blocks(
+        self, user_id: str
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Decode records of a user DECODE_BLOCK_SIZE records at a time
+
+        Args:
+            user_id (str): Id of a user
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: int64 epoch seconds, float64 lon and lat of a block
+        """
+        timestamp, deltas, lon, lat = self.get_user_block(user_id)
+        for start in range(0, len(deltas), DECODE_BLOCK_SIZE):
+            block = slice(start, start + DECODE_BLOCK_SIZE)
+            timestamps = timestamp + np.cumsum(deltas[block], dtype=np.int64)
+            timestamp = int(timestamps[-1])
+            yield (
+                timestamps,
+                lon[block] / self.coordinate_scale,
+                lat[block] / self.coordinate_scale,
+            )
+
+    def iter_user_records(self, user_id: str) -> Iterator[Record]:
+        """
+        Iterate records of a user in time order
+
+        Args:
+            user_id (str): Id of a user
+
+        Yields:
+            Record: (timestamp, user_id, lon, lat)
+        """
+        for timestamps, lon, lat in self.iter_user_blocks(user_id):
+            yield from zip(
+                timestamps.tolist(), repeat(user_id), lon.tolist(), lat.tolist()
+            )
+
+    def iter_records(self) -> Iterator[Record]:
+        """
+        Iterate records of all users in time order, see merge_records
+
+        Returns:
+            Iterator[Record]: (timestamp, user_id, lon, lat)
+        """
+        return merge_records([self])
+
+
+def open_trajectory_files(directory: str) -> List[TrajectoryFile]:
+    """
+    Open all trajectory files in a directory and its subdirectories (e.g. OUTPUTS.TRAJECTORIES.PATH)
+
+    Args:
+        directory (str): Directory to search
+
+    Returns:
+        List[TrajectoryFile]: Opened files, in the order of their paths
+    """
+    return [
+        TrajectoryFile(os.path.join(root, file_name))
+        for root, _, file_names in sorted(os.walk(directory))
+        for file_name in sorted(file_names)
+        if file_name.endswith(TRAJECTORY_FILE_EXTENSION)
+    ]
+
+
+def merge_records(trajectory_files: Iterable[TrajectoryFile]) -> Iterator[Record]:
+    """
+    Iterate records of all users of several trajectory files in time order, records with equal timestamps are ordered
+    by user id (and by the order of files).
+    Users' blocks are merged in rounds instead of record by record: every user holds its decoded records which are not
+    yielded yet, the horizon of a round is the smallest last timestamp of them among users with more records to decode,
+    records before the horizon are yielded sorted at once and users reaching the horizon decode their next blocks
+
+    Args:
+        trajectory_files (Iterable[TrajectoryFile]): Files to merge
+
+    Yields:
+        Record: (timestamp, user_id, lon, lat)
+    """
+    sources = sorted(
+        (user_id, file_position, trajectory_file)
+        for file_position, trajectory_file in enumerate(trajectory_files)
+        for user_id in trajectory_file.user_ids
+    )
+    user_ids = [user_id for user_id, _, _ in sources]
+    # position of a user in sources -> its blocks, number of its records left to decode and decoded records
+    # which are not yielded yet
+    blocks: Dict[int, Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+    undecoded: Dict[int, int] = {}
+    pending: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+    for position, (user_id, _, trajectory_file) in enumerate(sources):
+        blocks[position] = trajectory_file.iter_user_blocks(user_id)
+        pending[position] = next(blocks[position])
+        undecoded[position] = len(trajectory_file.get_user_block(user_id)[1]) - len(
+            pending[position][0]
+        )
+
+    while pending:
+        # users with records left to decode limit the horizon, the others are yielded up to their last record
+        horizon = min(
+            (
+                int(pending[position][0][-1])
+                for position, number_of_records in undecoded.items()
+                if number_of_records
+            ),
+            default=None,
+        )
+
+        positions, parts = [], []
+        for position, (timestamps, lon, lat) in list(pending.items()):
+            end = (
+                len(timestamps)
+                if horizon is None
+                else int(np.searchsorted(timestamps, horizon))
+            )
+            positions.append(position)
+            parts.append((timestamps[:end], lon[:end], lat[:end]))
+
+            if end == len(timestamps):
+                del blocks[position], undecoded[position], pending[position]
+                continue
+            pending[position] = (timestamps[end:], lon[end:], lat[end:])
+            if undecoded[position] and timestamps[-1] == horizon:
+                next_block = next(blocks[position])
+                undecoded[position] -= len(next_block[0])
+                pending[position] = tuple(
+                    np.concatenate(arrays)
+                    for arrays in zip(pending[position], next_block)
+                )
+
+        timestamps, lon, lat = (np.concatenate(arrays) for arrays in zip(*parts))
+        sources_positions = np.repeat(positions, [len(part[0]) for part in parts])
+        order = np.lexsort((sources_positions, timestamps))
+        # records of a round are converted to Python objects block by block
+        for start in range(0, len(order), DECODE_BLOCK_SIZE):
+            block = order[start : start + DECODE_BLOCK_SIZE]
+            yield from zip(
+                timestamps[block].tolist(),
+                map(user_ids.__getitem__, sources_positions[block].tolist()),
+                lon[block].tolist(),
+                lat[block].tolist(),
+            )
@@ -0,0 +1,125 @@
+"""
+Background writing of output: writes are executed by a thread while the main thread keeps generating users.
+
+A caller prepares data to write in its own thread (e.g. sorts a batch and converts it to an Arrow table) and submits
+a write of it. Compression and file I/O of pyarrow release the GIL, so they run in parallel with generation.
+The queue of submitted writes is bounded: with WRITE_QUEUE_SIZE batches waiting (and one being written)
+the next submit blocks until a write finishes, which bounds memory held by the writer.
+Writes are executed in the order of submission. Each write records its timers and counters into its own RunMetrics,
+which are merged into the metrics active at the time of submission, and its completion callback (e.g. recording
+written chunks in a manifest) is called, in the main thread on a next submit or flush, so metrics and manifests
+are never updated by the writer thread.
+"""
+
+import queue
+import threading
+from typing import Callable, Optional
+
+from gps_synth.common.metrics import RunMetrics, get_metrics
+
+
+class BackgroundWriter:
+    def __init__(self, queue_size: int = 1):
+        # completed writes: (metrics of a write, metrics active at its submission, completion callback)
+        self.completed: queue.SimpleQueue = queue.SimpleQueue()
+        # the first error of a write, raised in the main thread, writes after it are skipped
+        self.error: Optional[BaseException] = None
+
+        # with a queue of size 0 writes are executed synchronously in the calling thread
+        self.queue: Optional[queue.Queue] = None
+        self.thread: Optional[threading.Thread] = None
+        if queue_size > 0:
+            self.queue = queue.Queue(queue_size)
+            self.thread = threading.Thread(
+                target=self.work, name="gps_synth-writer", daemon=True
+            )
+            self.thread.start()
+
+    def work(self) -> None:
+        # pylint: disable=missing-function-docstring
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                if self.error is None:
+                    self.execute(*task)
+            except BaseException as e:  # pylint: disable=broad-exception-caught
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def execute(
+        self,
+        write: Callable[[RunMetrics], None],
+        metrics: RunMetrics,
+        on_written: Optional[Callable[[], None]],
+    ) -> None:
+        # pylint: disable=missing-function-docstring
+        write_metrics = RunMetrics()
+        write(write_metrics)
+        self.completed.put((write_metrics, metrics, on_written))
+
+    def submit(
+        self,
+        write: Callable[[RunMetrics], None],
+        on_written: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Submit a write, blocks while the queue of writes is full
+
+        Args:
+            write (Callable[[RunMetrics], None]): Function writing prepared data and recording its timers and counters into given metrics
+            on_written (Optional[Callable[[], None]] = None): Function called in the main thread once data is written
+        """
+        metrics = get_metrics()
+        if self.queue is None:
+            self.execute(write, metrics, on_written)
+        else:
+            # time the main thread is blocked by the writer (backpressure)
+            with metrics.timer("write_wait"):
+                self.queue.put((write, metrics, on_written))
+        self.collect()
+
+    def collect(self) -> None:
+        """
+        Merge metrics and call completion callbacks of finished writes
+
+        Raises:
+            BaseException: An error of a write
+        """
+        while not self.completed.empty():
+            write_metrics, metrics, on_written = self.completed.get()
+            metrics.merge(write_metrics)
+            if on_written is not None:
+                on_written()
+
+        if self.error is not None:
+            raise self.error
+
+    def flush(self) -> None:
+        """
+        Wait until all submitted writes are finished
+
+        Raises:
+            BaseException: An error of a write
+        """
+        if self.queue is not None:
+            with get_metrics().timer("write_wait"):
+                self.queue.join()
+        self.collect()
+
+    def close(self) -> None:
+        """
+        Finish submitted writes and stop the writer thread
+
+        Raises:
+            BaseException: An error of a write
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            # next writes (if any) are executed synchronously
+            self.queue = None
+        self.collect()
@@ -1,23 +1,66 @@
+import datetime
+import functools
 import logging
+import multiprocessing as mp
 import os
-import uuid
-from typing import Any, Dict, List, Optional
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
-import geopandas as gpd
-import pandas as pd
-from pyproj import CRS, Transformer
+import numpy as np
 
-from gps_synth.common.abs_user import User
 from gps_synth.common.columns import ColNames
 from gps_synth.common.functions import (
     check_or_create_dir,
     class_getter,
     delete_directory,
-    write_df_to_parquet,
+    write_parquet_summary,
+    write_table_to_parquet,
 )
+from gps_synth.common.metrics import (
+    RunMetrics,
+    get_metrics,
+    use_metrics,
+    write_run_report,
+)
+from gps_synth.common.trajectory_file import (
+    get_trajectory_file_path,
+    write_trajectory_file,
+)
+from gps_synth.common.writer import BackgroundWriter
+from gps_synth.gps_generator.manifest import (
+    RunManifest,
+    get_config_fingerprint,
+    get_manifest_path,
+)
+from gps_synth.gps_generator.network_pool import NetworkPool
+from gps_synth.gps_generator.output_tables import (
+    create_gps_data,
+    create_gps_table,
+    create_metadata_table,
+    create_network_table,
+)
+from gps_synth.gps_generator.users_chunk import (
+    UsersChunk,
+    generate_users_chunk,
+    group_users_chunks,
+    set_network_attributes,
+)
+from gps_synth.network.cache import NetworkCache
 from gps_synth.network.network import Network
 
-crs_4326 = CRS.from_epsg(4326)
+# parquet options of GPS output, see OUTPUTS.GPS
+DEFAULT_GPS_COMPRESSION = "zstd"
+DEFAULT_GPS_ROW_GROUP_SIZE = 64 * 1024
+# GPS output is partitioned by these columns by default, date and user_bucket are derived from timestamp and user_id
+DEFAULT_GPS_PARTITION_COLUMNS = [ColNames.profile_name]
+GPS_PARTITION_COLUMNS = [ColNames.profile_name, ColNames.date, ColNames.user_bucket]
+DEFAULT_GPS_USER_BUCKETS = 16
+# number of batches waiting for the background writer, see EXECUTION.WRITE_QUEUE_SIZE
+DEFAULT_WRITE_QUEUE_SIZE = 1
+# chunks of users submitted to the pool but not consumed yet, per worker, see iter_users_chunks
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
 
 
 class GPS_Generator:
@@ -26,26 +69,130 @@ class GPS_Generator:
         self.logger = logging.getLogger(__name__)
 
         self.network_dictionary = {}
+        # networks built in parallel and not yet handed to their profiles, see start_networks
+        self.network_pool: Optional[NetworkPool] = None
         self.users_dictionary = {}
         # to connect users/profiles with their corresponding network
         self.users_network_dict = {}
+        # timers and counters of each profile (including its workers) and of writing results after all profiles
+        self.profile_metrics: Dict[str, RunMetrics] = {}
+        self.output_metrics = RunMetrics()
+
+        execution_config = self.config.get("EXECUTION", {})
+        self.network_workers = execution_config.get("NETWORK_WORKERS", 1)
+        # shard SHARD_INDEX of SHARD_COUNT generates chunks of users whose index modulo SHARD_COUNT is SHARD_INDEX
+        self.shard: Optional[Tuple[int, int]] = None
+        if execution_config.get("SHARD_COUNT") is not None:
+            self.shard = (
+                execution_config["SHARD_INDEX"],
+                execution_config["SHARD_COUNT"],
+            )
+            if not 0 <= self.shard[0] < self.shard[1]:
+                raise ValueError(
+                    f"Shard index {self.shard[0]} is out of range for {self.shard[1]} shards"
+                )
+            if execution_config.get("SEED") is None:
+                raise ValueError(
+                    "Shards of a run must share its seed, set EXECUTION.SEED"
+                )
+
+        # progress of a resumable (or sharded) run is recorded in a manifest next to the GPS output folder
+        self.manifest = None
+        is_resumed = False
+        if execution_config.get("RESUME", False) or self.shard is not None:
+            self.manifest = RunManifest(
+                get_manifest_path(
+                    os.path.join(base_dir, self.config["OUTPUTS"]["GPS"]["PATH"]),
+                    self.shard,
+                ),
+                get_config_fingerprint(self.config),
+                self.shard,
+            )
+            is_resumed = self.manifest.load(
+                execution_config.get("SEED"),
+                self.config["DO_CLEAR_OUTPUT"] is True and self.shard is None,
+            )
 
         for output in self.config["OUTPUTS"]:
             output_path = os.path.join(base_dir, self.config["OUTPUTS"][output]["PATH"])
-            if self.config["DO_CLEAR_OUTPUT"] is True:
+            # output of a resumed run is kept, shards write to the same folders concurrently and never clear them
+            if (
+                self.config["DO_CLEAR_OUTPUT"] is True
+                and not is_resumed
+                and self.shard is None
+            ):
                 delete_directory(output_path)
             check_or_create_dir(output_path)
             self.config["OUTPUTS"][output]["PATH"] = output_path
 
-    def create_network(self, profile_network_config: Any) -> Network:
+        # GPS data is sorted by (user_id, timestamp), so with min/max statistics of row groups of moderate size
+        # a reader scanning one user's data skips almost all row groups of a file
+        gps_config = self.config["OUTPUTS"]["GPS"]
+        self.gps_file_options = {
+            "compression": gps_config.get("COMPRESSION", DEFAULT_GPS_COMPRESSION),
+            "compression_level": gps_config.get("COMPRESSION_LEVEL"),
+            "use_dictionary": [ColNames.user_id],
+            "write_statistics": True,
+        }
+        self.gps_row_group_size = gps_config.get(
+            "ROW_GROUP_SIZE", DEFAULT_GPS_ROW_GROUP_SIZE
+        )
+        # partitions by date and user bucket let readers of a day or of a slice of users skip other files
+        self.gps_partition_columns = gps_config.get(
+            "PARTITION_COLUMNS", DEFAULT_GPS_PARTITION_COLUMNS
+        )
+        unknown_columns = set(self.gps_partition_columns) - set(GPS_PARTITION_COLUMNS)
+        if unknown_columns:
+            raise ValueError(
+                f"GPS output can not be partitioned by {sorted(unknown_columns)}, use some of {GPS_PARTITION_COLUMNS}"
+            )
+        self.gps_user_buckets = gps_config.get("USER_BUCKETS", DEFAULT_GPS_USER_BUCKETS)
+        # GPS data is also written as compact trajectory files for replay if the output is configured
+        self.trajectories_path = (
+            self.config["OUTPUTS"].get("TRAJECTORIES", {}).get("PATH")
+        )
+
+        # metrics of a run are written as JSON next to the metadata output (e.g. metadata_run_report.json)
+        self.run_report_path = (
+            os.path.normpath(self.config["OUTPUTS"]["METADATA"]["PATH"])
+            + "_run_report"
+            + (
+                ""
+                if self.shard is None
+                else f"-shard-{self.shard[0]}-of-{self.shard[1]}"
+            )
+            + ".json"
+            if self.config["OUTPUTS"]["METADATA"].get("RUN_REPORT", True)
+            else None
+        )
+
+        # GPS data, metadata and network tables are written by a background thread, see BackgroundWriter
+        self.writer = BackgroundWriter(
+            execution_config.get("WRITE_QUEUE_SIZE", DEFAULT_WRITE_QUEUE_SIZE)
+        )
+
+        # networks built in previous runs are reused if the cache is configured
+        network_cache_config = self.config.get("NETWORK_CACHE")
+        self.network_cache = (
+            None
+            if network_cache_config is None
+            else NetworkCache(
+                os.path.join(base_dir, network_cache_config["PATH"]),
+                network_cache_config.get("MAX_ENTRIES"),
+                network_cache_config.get("MAX_AGE_DAYS"),
+                network_cache_config.get("REFRESH", False),
+            )
+        )
+
+    def init_network(self, profile_network_config: Any) -> Network:
         """
-        Initialise Network class and run it
+        Initialise Network class without running it
 
         Args:
             profile_network_config (Any): YAML object with config params regarding network
 
         Returns:
-            Network: Instance of Network class with completed run method
+            Network: Instance of Network class
         """
 
         network_class = class_getter(
@@ -53,113 +200,387 @@ class GPS_Generator:
             profile_network_config["NETWORK_CLASS"],
         )
 
-        network = network_class(profile_network_config)
+        return network_class(
+            profile_network_config, self.network_cache, self.config.get("ROUTING")
+        )
 
-        network.run()
+    def create_network(self, profile_network_config: Any) -> Network:
+        """
+        Initialise Network class and run it
+
+        Args:
+            profile_network_config (Any): YAML object with config params regarding network
+
+        Returns:
+            Network: Instance of Network class with completed run method
+        """
+        network = self.init_network(profile_network_config)
+
+        with get_metrics().timer("network"):
+            network.run()
 
         return network
 
-    def generate_users(self, profile_user_config: Any) -> List[User]:
+    def start_networks(self) -> None:
+        """
+        Start building unique networks of all profiles in a pool of EXECUTION.NETWORK_WORKERS processes,
+        with 1 worker (default) networks are built in the main process when their profile is reached
+        """
+        if self.network_workers <= 1:
+            return
+
+        networks = {}
+        for profile_config in self.config["PROFILES"].values():
+            profile_network_config = profile_config["NETWORK_PARAMS"]
+            if profile_network_config["USE_ALREADY_CREATED"] is not True:
+                networks.setdefault(
+                    profile_network_config["NETWORK_NAME"],
+                    self.init_network(profile_network_config),
+                )
+
+        self.network_pool = NetworkPool(networks, self.network_workers)
+
+    def get_profile_network(
+        self, profile_name: str, profile_network_config: Any, streaming: bool
+    ) -> Network:
         """
-        Initialise User class and run it as many times as specified in NUM_USERS config param.
-        Store instances in a list
+        Get a network of a profile: reuse an already created one, or create it (or take it from the pool of networks)
+        and write its tables if a run is streamed
 
         Args:
-            profile_user_config (Any): YAML object with config params regarding users
+            profile_name (str): Name of a profile
+            profile_network_config (Any): YAML object with config params regarding network
+            streaming (bool): Whether results are written while they are generated
 
         Returns:
-            List[User]: list of instances of User class with completed run method
+            Network: Instance of Network class with completed run method
         """
-        users_array = []
+        network_name = profile_network_config["NETWORK_NAME"]
+
+        # check if a network was already created (some profile scan have identical network
+        if profile_network_config["USE_ALREADY_CREATED"] is True:
+            # reuse already created network
+            try:
+                network = self.network_dictionary[network_name]
+            except KeyError as e:
+                self.logger.warning(
+                    "%s : the network called %s is not yet created",
+                    e,
+                    network_name,
+                )
+                raise
+
+        else:
+            # create a unique Network
+            # store Network in a dict
+            if self.network_pool is not None and network_name in self.network_pool:
+                network = self.network_pool.get(network_name)
+            else:
+                network = self.create_network(profile_network_config)
+            self.network_dictionary[network_name] = network
+            # shards of a run build the same networks, only the first one writes them
+            if streaming and (self.shard is None or self.shard[0] == 0):
+                self.output_network_tables(
+                    {network_name: network},
+                    self.config["OUTPUTS"]["NETWORK_TABLES"]["PATH"],
+                    self.config["OUTPUTS"]["NETWORK_TABLES"]["PARTITION_COLUMNS"],
+                    self.config["OUTPUTS"]["NETWORK_TABLES"]["EXISTING_DATA_BEHAVIOUR"],
+                )
+        self.logger.info(
+            "Network for profile '%s' is generated, network name: %s",
+            profile_name,
+            network_name,
+        )
+
+        return network
 
+    def iter_users_chunks(
+        self,
+        profile_user_config: Any,
+        network: Network,
+        seed_sequence: np.random.SeedSequence,
+        skip_chunks: Optional[Set[int]] = None,
+        profile_name: Optional[str] = None,
+    ) -> Iterator[UsersChunk]:
+        """
+        Generate as many users as specified in NUM_USERS config param: their meaningful locations and GPS data.
+        Users are split into chunks of EXECUTION.CHUNK_SIZE users, which are generated either in the main process
+        or in a pool of EXECUTION.WORKERS forked processes sharing network attributes.
+        Chunks are yielded in order as soon as they are generated. A shard generates only its own chunks (see is_own_chunk)
+
+        Args:
+            profile_user_config (Any): YAML object with config params regarding users
+            network (Network): Instance of Network class with completed run method
+            seed_sequence (np.random.SeedSequence): Seed sequence of a profile, each user gets its own child sequence
+            skip_chunks (Optional[Set[int]] = None): Indexes of chunks not to generate (e.g. written by a previous run),
+                                                     other chunks are generated exactly as if none were skipped
+            profile_name (Optional[str] = None): Name of a profile to record its number of chunks in the manifest
+
+        Yields:
+            UsersChunk: GPS data and anchor locations of users, chunk by chunk
+        """
+        execution_config = self.config.get("EXECUTION", {})
+        workers = execution_config.get("WORKERS", 1)
+        chunk_size = execution_config.get("CHUNK_SIZE", 100)
+
+        if workers > 1 and "fork" not in mp.get_all_start_methods():
+            self.logger.warning(
+                "Processes can not be forked on this platform, users are generated in the main process"
+            )
+            workers = 1
+
+        number_of_users = profile_user_config["NUM_USERS"]
+        user_seed_sequences = seed_sequence.spawn(number_of_users)
+
+        # meaningful locations of all users of a profile are assigned at once
         user_class = class_getter(
             profile_user_config["USER_MODULE_PATH"], profile_user_config["USER_CLASS"]
         )
+        meaningful_locations = user_class.assign_meaningful_locations(
+            profile_user_config,
+            network.hw_locations,
+            network.event_locations,
+            number_of_users,
+            np.random.default_rng(seed_sequence.spawn(1)[0]),
+        )
+        get_metrics().count("users_failed", meaningful_locations.number_of_failed)
+        if meaningful_locations.number_of_failed > 0:
+            self.logger.warning(
+                "%s users did not get meaningful locations within the retry budget and are skipped",
+                meaningful_locations.number_of_failed,
+            )
+        number_of_users = len(meaningful_locations)
+
+        # 128-bit user ids are drawn from the profile's seed sequence: unique in case of appending parquets,
+        # but the same for the same seed (e.g. in a resumed run)
+        id_rng = np.random.default_rng(seed_sequence.spawn(1)[0])
+        user_ids = [id_rng.bytes(16).hex() for _ in range(number_of_users)]
+
+        chunks_args = [
+            (
+                profile_user_config,
+                user_ids[chunk_start : chunk_start + chunk_size],
+                user_seed_sequences[chunk_start : chunk_start + chunk_size],
+                meaningful_locations.take(chunk_start, chunk_start + chunk_size),
+                chunk_index,
+            )
+            for chunk_index, chunk_start in enumerate(
+                range(0, number_of_users, chunk_size)
+            )
+            if (skip_chunks is None or chunk_index not in skip_chunks)
+            and self.is_own_chunk(chunk_index)
+        ]
+        if self.manifest is not None and profile_name is not None:
+            self.manifest.set_number_of_chunks(
+                profile_name, -(-number_of_users // chunk_size)
+            )
+        network_attributes = (
+            network.hw_locations,
+            network.event_locations,
+            network.router,
+            network.projection,
+        )
+
+        route_cache_hits, route_cache_misses = 0, 0
+        if workers > 1:
+            # forked workers inherit network attributes passed to the initializer, they are not pickled
+            with mp.get_context("fork").Pool(
+                workers,
+                initializer=set_network_attributes,
+                initargs=network_attributes,
+            ) as pool:
+                # at most CHUNKS_IN_FLIGHT_PER_WORKER chunks per worker are generated or wait to be consumed,
+                # the next chunk is submitted once one is taken, so memory does not grow with the number of users
+                # when the consumer (e.g. writing of a streamed run) is slower than generation
+                chunks_args_iterator = iter(chunks_args)
+                pending_chunks = deque(
+                    pool.apply_async(generate_users_chunk, chunk_args)
+                    for chunk_args in islice(
+                        chunks_args_iterator, CHUNKS_IN_FLIGHT_PER_WORKER * workers
+                    )
+                )
+                while pending_chunks:
+                    users_chunk = pending_chunks.popleft().get()
+                    for chunk_args in islice(chunks_args_iterator, 1):
+                        pending_chunks.append(
+                            pool.apply_async(generate_users_chunk, chunk_args)
+                        )
+                    get_metrics().merge(users_chunk.metrics)
+                    route_cache_hits += users_chunk.metrics.counters["route_cache_hits"]
+                    route_cache_misses += users_chunk.metrics.counters[
+                        "route_cache_misses"
+                    ]
+                    yield users_chunk
+        else:
+            set_network_attributes(*network_attributes)
+            for chunk_args in chunks_args:
+                users_chunk = generate_users_chunk(*chunk_args)
+                get_metrics().merge(users_chunk.metrics)
+                route_cache_hits += users_chunk.metrics.counters["route_cache_hits"]
+                route_cache_misses += users_chunk.metrics.counters["route_cache_misses"]
+                yield users_chunk
+
+        self.logger.info(
+            "Route cache hits: %s, misses: %s", route_cache_hits, route_cache_misses
+        )
 
-        for _ in range(profile_user_config["NUM_USERS"]):
-            # ensure uniqueness of user ids in case of appending parquets
-            user_id = uuid.uuid4().hex
-            new_user = user_class(user_id, profile_user_config)
-            users_array.append(new_user)
+    def is_own_chunk(self, chunk_index: int) -> bool:
+        """
+        Check if a chunk of users is generated by this process: by any process in an unsharded run,
+        by shard i of N if the chunk's index modulo N is i (chunks of every profile are spread over all shards)
 
-        return users_array
+        Args:
+            chunk_index (int): Position of a chunk among chunks of a profile
+
+        Returns:
+            bool: True if the chunk belongs to this shard
+        """
+        return self.shard is None or chunk_index % self.shard[1] == self.shard[0]
 
-    def execute_method_for_users(
-        self, users: List[User], method_name: str, args: List = None
-    ) -> List[User]:
+    def generate_users(
+        self,
+        profile_user_config: Any,
+        network: Network,
+        seed_sequence: np.random.SeedSequence,
+    ) -> List[UsersChunk]:
         """
-        Loop through users and execute specified instance method
+        Generate all users of a profile at once, see iter_users_chunks
 
         Args:
-            users (List[User]): List of User instances
-            method_name (str): Name of a method you want to execute
-            args (List): List of args of the method, they are all related to Network attributes
+            profile_user_config (Any): YAML object with config params regarding users
+            network (Network): Instance of Network class with completed run method
+            seed_sequence (np.random.SeedSequence): Seed sequence of a profile, each user gets its own child sequence
 
         Returns:
-            List[User]: List of User instances with executed method
+            List[UsersChunk]: GPS data and anchor locations of users, chunk by chunk
+        """
+        return list(self.iter_users_chunks(profile_user_config, network, seed_sequence))
+
+    def submit_file(
+        self,
+        output: str,
+        write_file: Callable[[], int],
+        number_of_rows: int,
+        on_written: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Submit a write of an output file to the background writer, time of writing is added to the write_{output} timer
+        and written rows and bytes to {output}_rows_written and {output}_bytes_written counters
+
+        Args:
+            output (str): Name of an output (gps, trajectories, metadata or network_tables)
+            write_file (Callable[[], int]): Function writing prepared data, returns number of bytes written
+            number_of_rows (int): Number of rows written by write_file
+            on_written (Optional[Callable[[], None]] = None): Function called once the file is written, see BackgroundWriter
+        """
+
+        def write(metrics: RunMetrics) -> None:
+            with metrics.timer(f"write_{output}"):
+                bytes_written = write_file()
+            metrics.count(f"{output}_rows_written", number_of_rows)
+            metrics.count(f"{output}_bytes_written", bytes_written)
+
+        self.writer.submit(write, on_written)
+
+    def write_gps_batch(
+        self,
+        users_chunks: List[UsersChunk],
+        profile_name: str,
+        gps_output_folder_path: str,
+        partition_columns: Optional[List[str]] = None,
+        existing_data_behavior: Optional[str] = None,
+        basename: Optional[str] = None,
+        on_written: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Sort users' synth GPS data of a batch of chunks by (user_id, timestamp) and write it with stated output schema
+        (user_id with dictionary pages, timestamp[s], float64 lon and lat) as one parquet fragment with row groups
+        of OUTPUTS.GPS.ROW_GROUP_SIZE rows and OUTPUTS.GPS.COMPRESSION.
+        If OUTPUTS.TRAJECTORIES is configured, the batch is also written as a compact trajectory file
+        (OUTPUTS.TRAJECTORIES.PATH/profile_name={profile_name}/{basename}.trj).
+        The table is built in the calling thread and written by the background writer
+
+        Args:
+            users_chunks (List[UsersChunk]): Chunks of users of a profile to write
+            profile_name (str): Name of a profile the users belong to
+            gps_output_folder_path (str): A path to a folder to store GPS results (created as by appending sub-path to the base/parent path)
+            partition_columns (Optional[List[str]] = None): Columns to use for partitioning (profile_name, date, user_bucket),
+                                                            if None OUTPUTS.GPS.PARTITION_COLUMNS
+            existing_data_behavior (str): Controls how the dataset will handle data that already exists in the destination
+            basename (Optional[str] = None): Deterministic name of written files, if None a unique name is generated
+            on_written (Optional[Callable[[], None]] = None): Function called once the batch is written, see BackgroundWriter
         """
+        if partition_columns is None:
+            partition_columns = self.gps_partition_columns
+        with get_metrics().timer("write_gps"):
+            gps_data = create_gps_data(users_chunks)
+            gps_data_table = create_gps_table(
+                gps_data, profile_name, partition_columns, self.gps_user_buckets
+            )
 
-        for user in users:
-            method = getattr(user, method_name)
-            method(*args)
-        return users
+        self.submit_file(
+            "gps",
+            functools.partial(
+                write_table_to_parquet,
+                gps_data_table,
+                gps_output_folder_path,
+                partition_columns,
+                existing_data_behavior,
+                basename,
+                self.gps_file_options,
+                self.gps_row_group_size,
+            ),
+            gps_data_table.num_rows,
+            on_written if self.trajectories_path is None else None,
+        )
+        if self.trajectories_path is not None:
+            # the same sorted batch as a compact trajectory file, see gps_synth/common/trajectory_file.py,
+            # writes are executed in order, so the batch is complete once its trajectory file is written
+            trajectory_file_path = get_trajectory_file_path(
+                self.trajectories_path, profile_name, basename
+            )
+            self.submit_file(
+                "trajectories",
+                functools.partial(
+                    write_trajectory_file, gps_data, trajectory_file_path
+                ),
+                len(gps_data),
+                on_written,
+            )
 
     def output_gps(
         self,
-        users_dictionary: Dict[str, List[User]],
+        users_dictionary: Dict[str, List[UsersChunk]],
         gps_output_folder_path: str,
         partition_columns: Optional[List[str]] = None,
         existing_data_behavior: Optional[str] = None,
+        batch_size: Optional[int] = None,
     ) -> None:
         """
-        Write users' synth GPS data with stated output schema for each profile
+        Write users' synth GPS data with stated output schema for each profile.
+        Records are written in batches of users, each batch is sorted and written as its own parquet fragment,
+        so only one batch is held in the output schema at a time
 
         Args:
-            users_dictionary (Dict[str, List[User]]): A dictionary where key is a name of a profile and a value is a list of User instances belonging to this profile
+            users_dictionary (Dict[str, List[UsersChunk]]): A dictionary where key is a name of a profile and a value is a list of chunks of users belonging to this profile
             gps_output_folder_path (str): A path to a folder to store GPS results (created as by appending sub-path to the base/parent path)
             partition_columns (List[str]): Columsn to use for partitioning
             existing_data_behavior (str): Controls how the dataset will handle data that already exists in the destination
+            batch_size (Optional[int] = None): Number of users to write in one fragment (rounded up to whole chunks), if None write a profile in one fragment
         """
 
         self.logger.info("Writing GPS data")
-        gps_data = []
-        gps_data_df = pd.DataFrame(
-            columns=[
-                ColNames.user_id,
-                ColNames.timestamp,
-                ColNames.lon,
-                ColNames.lat,
-                ColNames.profile_name,
-            ]
-        )
-
-        for profile_name, users in users_dictionary.items():
-            for user in users:
-                gps_data += user.data_array
-            gps_data_profile_df = pd.DataFrame(
-                gps_data,
-                columns=[
-                    ColNames.user_id,
-                    ColNames.timestamp,
-                    ColNames.lon,
-                    ColNames.lat,
-                ],
-            ).sort_values(by=[ColNames.user_id, ColNames.timestamp])
-            # pylint: disable=unsupported-assignment-operation
-            gps_data_profile_df[ColNames.profile_name] = profile_name
-
-            # if you borther with pd.concat FutureWarning, here is a solution
-            # https://stackoverflow.com/questions/77254777/alternative-to-concat-of-empty-dataframe-now-that-it-is-being-deprecated
-            gps_data_df = pd.concat(
-                [gps_data_df, gps_data_profile_df], ignore_index=True
-            )
 
-        write_df_to_parquet(
-            gps_data_df,
-            gps_output_folder_path,
-            partition_columns,
-            existing_data_behavior,
-        )
+        for profile_name, users_chunks in users_dictionary.items():
+            for batch in group_users_chunks(users_chunks, batch_size):
+                self.write_gps_batch(
+                    batch,
+                    profile_name,
+                    gps_output_folder_path,
+                    partition_columns,
+                    existing_data_behavior,
+                )
+        self.writer.flush()
 
     def output_network_tables(
         self,
@@ -181,36 +602,71 @@ class GPS_Generator:
         self.logger.info("Writing Network tables")
 
         for network_name, network in network_dictionary.items():
+            with get_metrics().timer("write_network_tables"):
+                network_table = create_network_table(network_name, network)
+
+            self.submit_file(
+                "network_tables",
+                functools.partial(
+                    write_table_to_parquet,
+                    network_table,
+                    network_output_folder_path,
+                    partition_columns,
+                    existing_data_behavior,
+                ),
+                network_table.num_rows,
+            )
+        self.writer.flush()
 
-            network_gdf = gpd.GeoDataFrame(
-                pd.concat(
-                    [
-                        network.gdf_hw.assign(loc_type="hw"),
-                        network.gdf_event.assign(loc_type="event"),
-                    ],
-                    ignore_index=True,
-                )
-            ).to_crs(4326)
-
-            network_gdf[ColNames.centre_x] = network_gdf["geometry"].x
-            network_gdf[ColNames.centre_y] = network_gdf["geometry"].y
+    def write_metadata_batch(
+        self,
+        users_chunks: List[UsersChunk],
+        profile_name: str,
+        network_name: str,
+        network: Network,
+        metadata_output_folder_path: str,
+        partition_columns: Optional[List[str]] = None,
+        existing_data_behavior: Optional[str] = None,
+        basename: Optional[str] = None,
+        on_written: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Write metadata (OSM ids of anchor locations) of users of a batch of chunks with stated output schema as one parquet fragment,
+        the table is built in the calling thread and written by the background writer
 
-            network_df = network_gdf.drop(
-                columns=["nearest_node_id", "distance_to_node", "geometry"]
+        Args:
+            users_chunks (List[UsersChunk]): Chunks of users of a profile to write
+            profile_name (str): Name of a profile the users belong to
+            network_name (str): Name of a network of a profile
+            network (Network): Network of a profile to search for locations by ids
+            metadata_output_folder_path (str): A path to a folder to store GPS results (created as by appending sub-path to the base/parent path)
+            partition_columns (List[str]): Columsn to use for partitioning
+            existing_data_behavior (str): Controls how the dataset will handle data that already exists in the destination
+            basename (Optional[str] = None): Deterministic name of written files, if None a unique name is generated
+            on_written (Optional[Callable[[], None]] = None): Function called once the batch is written, see BackgroundWriter
+        """
+        with get_metrics().timer("write_metadata"):
+            metadata_table = create_metadata_table(
+                users_chunks, profile_name, network_name, network
             )
 
-            network_df[ColNames.network_name] = network_name
-
-            write_df_to_parquet(
-                network_df,
-                network_output_folder_path,
+        self.submit_file(
+            "metadata",
+            functools.partial(
+                write_table_to_parquet,
+                metadata_table,
+                metadata_output_folder_path,
                 partition_columns,
                 existing_data_behavior,
-            )
+                basename,
+            ),
+            metadata_table.num_rows,
+            on_written,
+        )
 
     def output_metadata(
         self,
-        users_dictionary: Dict[str, List[User]],
+        users_dictionary: Dict[str, List[UsersChunk]],
         network_dictionary: Dict[str, Network],
         users_network_dict: Dict[str, str],
         metadata_output_folder_path: str,
@@ -221,7 +677,7 @@ class GPS_Generator:
         Write metadata with stated output schema for each profile to see anchor locations for every user (e.g. for checking purposes)
 
         Args:
-            users_dictionary (Dict[str, List[User]]): A dictionary where key is a name of a profile and a value is a list of User instances belonging to this profile
+            users_dictionary (Dict[str, List[UsersChunk]]): A dictionary where key is a name of a profile and a value is a list of chunks of users belonging to this profile
             network_dictionary (Dict[str, Network]): A dictionary where key is a name of a profile and a value is an instance of Network belonging to this profile
             users_network_dict (Dict[str, str]): Dictionaru to connect users to their network
             metadata_output_folder_path (str): A path to a folder to store GPS results (created as by appending sub-path to the base/parent path)
@@ -230,148 +686,203 @@ class GPS_Generator:
         """
         self.logger.info("Writing metadata\n")
 
-        for profile_name, users in users_dictionary.items():
+        for profile_name, users_chunks in users_dictionary.items():
 
             network_name = users_network_dict[profile_name]
 
-            network = network_dictionary[network_name]
-
-            # network_name is needed to make it clear in what particular network to search for locations by ids
-            # alternatice way is to look in config
-            metadata_data_df = pd.DataFrame(
-                [
-                    [
-                        user.user_id,
-                        network.gdf_hw.iloc[user.home_id]["osmid"],
-                        network.gdf_hw.iloc[user.work_id]["osmid"],
-                        network.gdf_event.iloc[user.regular_loc_array]["osmid"].values,
-                        profile_name,
-                        network_name,
-                    ]
-                    for user in users
-                ],
-                columns=[
-                    ColNames.user_id,
-                    ColNames.home_id,
-                    ColNames.work_id,
-                    ColNames.regular_loc_array,
-                    ColNames.profile_name,
-                    ColNames.network_name,
-                ],
-            )
-
-            write_df_to_parquet(
-                metadata_data_df,
+            self.write_metadata_batch(
+                users_chunks,
+                profile_name,
+                network_name,
+                network_dictionary[network_name],
                 metadata_output_folder_path,
                 partition_columns,
                 existing_data_behavior,
             )
+        self.writer.flush()
 
-    def run(self):
-        # pylint: disable=missing-function-docstring
-        profiles = self.config["PROFILES"].keys()
-
-        # for each profile
-        for profile in profiles:
-            # get config params
-            profile_config = self.config["PROFILES"][profile]
-            # and profile name
-            profile_name = profile_config["PROFILE_NAME"]
-
-            self.logger.info("Started generating process for profile: %s", profile_name)
-
-            profile_network_config = profile_config["NETWORK_PARAMS"]
+    def stream_users(
+        self,
+        profile_user_config: Any,
+        network: Network,
+        seed_sequence: np.random.SeedSequence,
+        profile_name: str,
+    ) -> int:
+        """
+        Generate users of a profile and write their GPS data and metadata batch by batch while next chunks are being generated.
+        A batch is OUTPUTS.GPS.BATCH_SIZE users (rounded up to whole chunks), by default every chunk is written as soon as it arrives,
+        and it is released after being written, so memory is bounded by a batch (and chunks waiting in a pool) instead of all users of a run.
+        In a resumable run chunks already written (as recorded in the manifest) are skipped and every written batch is recorded
 
-            # check if a network was already created (some profile scan have identical network
-            if profile_network_config["USE_ALREADY_CREATED"] is True:
-                # reuse already created network
-                try:
-                    network = self.network_dictionary[
-                        profile_network_config["NETWORK_NAME"]
-                    ]
-                except KeyError as e:
-                    self.logger.warning(
-                        "%s : the network called %s is not yet created",
-                        e,
-                        profile_network_config["NETWORK_NAME"],
-                    )
-                    raise
+        Args:
+            profile_user_config (Any): YAML object with config params regarding users
+            network (Network): Instance of Network class with completed run method
+            seed_sequence (np.random.SeedSequence): Seed sequence of a profile, each user gets its own child sequence
+            profile_name (str): Name of a profile
 
-            else:
-                # create a unique Network
-                # store Network in a dict
-                network = self.create_network(profile_network_config)
-                self.network_dictionary[profile_network_config["NETWORK_NAME"]] = (
-                    network
+        Returns:
+            int: Number of users of a profile (including users written by a previous run)
+        """
+        batch_size = self.config["OUTPUTS"]["GPS"].get("BATCH_SIZE")
+        if batch_size is None:
+            batch_size = 1
+        network_name = self.users_network_dict[profile_name]
+
+        written_chunks = None
+        number_of_users = 0
+        if self.manifest is not None:
+            written_chunks = self.manifest.get_written_chunks(profile_name)
+            number_of_users = self.manifest.get_number_of_users(profile_name)
+            if written_chunks:
+                self.logger.info(
+                    "%s chunks (%s users) of profile '%s' are already written and skipped",
+                    len(written_chunks),
+                    number_of_users,
+                    profile_name,
                 )
-            self.logger.info(
-                "Network for profile '%s' is generated, network name: %s",
-                profile_name,
-                profile_network_config["NETWORK_NAME"],
-            )
-            # store the Network attributes globally so each user instance can access them
-            self.users_network_dict[profile_name] = profile_network_config[
-                "NETWORK_NAME"
-            ]
 
-            (
-                network_graph_crs,
-                network_gdf_hw,
-                network_gdf_event,
-                network_graph_proj,
-                network_graph_nodes,
-            ) = (
-                getattr(network, attr)
-                for attr in ["graph_crs", "gdf_hw", "gdf_event", "graph_proj", "nodes"]
-            )
-            # transformer from graph projection to WGS86
-            transformer_to_WGS = Transformer.from_crs(
-                network_graph_crs, crs_4326, always_xy=True
-            )
-
-            # generagte users of a profile
-            profile_users_config = profile_config["USER_PARAMS"]
-            users = self.generate_users(profile_users_config)
-            self.logger.info(
-                "Users for profile '%s' is generated, number of users: %s",
+        for batch in group_users_chunks(
+            self.iter_users_chunks(
+                profile_user_config,
+                network,
+                seed_sequence,
+                written_chunks,
                 profile_name,
-                profile_users_config["NUM_USERS"],
-            )
-            # create meaningful locations for each user
-            users_with_meaningful_loc = self.execute_method_for_users(
-                users,
-                "get_meaningful_locations",
-                [
-                    network_gdf_hw,
-                    network_gdf_event,
-                ],
+            ),
+            batch_size,
+        ):
+            # files of a batch of a resumable run have deterministic names, a partially written batch is overwritten
+            basename = (
+                None
+                if self.manifest is None
+                else self.manifest.get_fragment_name(profile_name, batch[0].chunk_index)
             )
-            self.logger.info(
-                "Meaningful locations for users of profile '%s' is generated",
+            number_of_users += sum(map(len, batch))
+            self.write_gps_batch(
+                batch,
                 profile_name,
+                self.config["OUTPUTS"]["GPS"]["PATH"],
+                basename=basename,
             )
-            # generate synth gps data for each user
-            users_with_gps = self.execute_method_for_users(
-                users_with_meaningful_loc,
-                "generate_gps",
-                [
-                    network_gdf_hw,
-                    network_gdf_event,
-                    network_graph_proj,
-                    network_graph_nodes,
-                    transformer_to_WGS,
-                ],
-            )
-            self.logger.info(
-                "GPD data for users of profile '%s' is generated", profile_name
+            # metadata of a batch is written after its GPS data, then the batch is complete
+            self.write_metadata_batch(
+                batch,
+                profile_name,
+                network_name,
+                network,
+                self.config["OUTPUTS"]["METADATA"]["PATH"],
+                basename=basename,
+                on_written=functools.partial(
+                    self.complete_batch,
+                    profile_name,
+                    {
+                        users_chunk.chunk_index: len(users_chunk)
+                        for users_chunk in batch
+                    },
+                    basename,
+                    number_of_users,
+                ),
             )
-            # store users with gps data in a dict
-            self.users_dictionary[profile_name] = users_with_gps
 
-        # Write output results
-        self.logger.info("Started writing results")
+        # a profile is complete once all its batches are written
+        self.writer.flush()
+
+        return number_of_users
+
+    def complete_batch(
+        self,
+        profile_name: str,
+        chunks: Dict[int, int],
+        basename: Optional[str],
+        number_of_users: int,
+    ) -> None:
+        """
+        Record a written batch of users in the manifest of a resumable run and log progress
+
+        Args:
+            profile_name (str): Name of a profile
+            chunks (Dict[int, int]): Number of users of each written chunk by its index
+            basename (Optional[str]): Name of fragments of a batch
+            number_of_users (int): Number of users of a profile written so far
+        """
+        if self.manifest is not None:
+            self.manifest.add_chunks(profile_name, chunks, basename)
+        self.logger.info(
+            "Written GPS data of %s users of profile '%s'",
+            number_of_users,
+            profile_name,
+        )
+
+    def output_run_report(
+        self,
+        seed: int,
+        started_at: datetime.datetime,
+        wall_seconds: float,
+    ) -> None:
+        """
+        Write timers and counters of a run (in total and per profile) as a JSON report next to the metadata output,
+        unless OUTPUTS.METADATA.RUN_REPORT is False
+
+        Args:
+            seed (int): Seed of the run
+            started_at (datetime.datetime): Start time of the run
+            wall_seconds (float): Duration of the run
+        """
+        if self.run_report_path is None:
+            return
+
+        execution_config = self.config.get("EXECUTION", {})
+        report = {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(wall_seconds, 3),
+            "seed": seed,
+            "workers": execution_config.get("WORKERS", 1),
+            "chunk_size": execution_config.get("CHUNK_SIZE", 100),
+            # metrics of all profiles and of writing results after them (if a run is not streamed)
+            "total": RunMetrics.combine(
+                [*self.profile_metrics.values(), self.output_metrics]
+            ).to_dict(),
+            "profiles": {
+                profile_name: {
+                    "network_name": self.users_network_dict.get(profile_name),
+                    **profile_metrics.to_dict(),
+                }
+                for profile_name, profile_metrics in self.profile_metrics.items()
+            },
+        }
+        write_run_report(self.run_report_path, report)
+        self.logger.info("Run report is written to %s", self.run_report_path)
+
+    def output_gps_summary(self) -> None:
+        """
+        Write a _metadata summary file of GPS output (footers of all its files, including ones of previous runs
+        appended to the folder) unless OUTPUTS.GPS.SUMMARY_FILE is False, see write_parquet_summary
+        """
+        if not self.config["OUTPUTS"]["GPS"].get("SUMMARY_FILE", True):
+            return
+
+        with (
+            use_metrics(self.output_metrics) as metrics,
+            metrics.timer("write_gps_summary"),
+        ):
+            try:
+                number_of_files = write_parquet_summary(
+                    self.config["OUTPUTS"]["GPS"]["PATH"]
+                )
+            except ValueError as e:
+                self.logger.warning("Summary file of GPS output is not written: %s", e)
+                return
+        self.logger.info("Summary file of %s GPS files is written", number_of_files)
 
-        self.output_gps(self.users_dictionary, self.config["OUTPUTS"]["GPS"]["PATH"])
+    def output_results(self) -> None:
+        """
+        Write GPS data, network tables and metadata of all profiles after they are generated (if a run is not streamed)
+        """
+        self.output_gps(
+            self.users_dictionary,
+            self.config["OUTPUTS"]["GPS"]["PATH"],
+            batch_size=self.config["OUTPUTS"]["GPS"].get("BATCH_SIZE"),
+        )
         self.output_network_tables(
             self.network_dictionary,
             self.config["OUTPUTS"]["NETWORK_TABLES"]["PATH"],
@@ -384,3 +895,106 @@ class GPS_Generator:
             self.users_network_dict,
             self.config["OUTPUTS"]["METADATA"]["PATH"],
         )
+
+    def run(self):
+        # pylint: disable=missing-function-docstring
+        started_at = datetime.datetime.now()
+        start_time = time.perf_counter()
+        profiles = self.config["PROFILES"].keys()
+
+        # in a streaming mode GPS data and metadata are written batch by batch during generation,
+        # a resumable run is always streamed, its progress is the set of written batches
+        streaming = (
+            self.config.get("EXECUTION", {}).get("STREAMING", False)
+            or self.manifest is not None
+        )
+
+        # each profile gets its own seed sequence derived from the run seed, each user of a profile - a child of it
+        seed = self.config.get("EXECUTION", {}).get("SEED")
+        if self.manifest is not None and self.manifest.seed is not None:
+            # a resumed run continues with the seed of the run it resumes
+            seed = self.manifest.seed
+        seed_sequence = np.random.SeedSequence(seed)
+        self.logger.info("Seed of the run: %s", seed_sequence.entropy)
+        if self.manifest is not None:
+            self.manifest.seed = seed_sequence.entropy
+            self.manifest.save()
+        profile_seed_sequences = seed_sequence.spawn(len(profiles))
+
+        # networks of next profiles are built while users of the first ones are generated
+        self.start_networks()
+
+        # for each profile
+        for profile, profile_seed_sequence in zip(profiles, profile_seed_sequences):
+            # get config params
+            profile_config = self.config["PROFILES"][profile]
+            # and profile name
+            profile_name = profile_config["PROFILE_NAME"]
+
+            # timers and counters of a profile, workers' ones are merged into them
+            with use_metrics(
+                self.profile_metrics.setdefault(profile_name, RunMetrics())
+            ):
+                self.logger.info(
+                    "Started generating process for profile: %s", profile_name
+                )
+
+                profile_network_config = profile_config["NETWORK_PARAMS"]
+                network = self.get_profile_network(
+                    profile_name, profile_network_config, streaming
+                )
+                # store the Network attributes globally so each user instance can access them
+                self.users_network_dict[profile_name] = profile_network_config[
+                    "NETWORK_NAME"
+                ]
+
+                # generagte users of a profile: their meaningful locations and synth gps data
+                profile_users_config = profile_config["USER_PARAMS"]
+                if self.manifest is not None and self.manifest.is_completed(
+                    profile_name
+                ):
+                    self.logger.info(
+                        "Users and their GPS data for profile '%s' are already written by a previous run, number of users: %s",
+                        profile_name,
+                        self.manifest.get_number_of_users(profile_name),
+                    )
+                    continue
+                if streaming:
+                    number_of_users = self.stream_users(
+                        profile_users_config,
+                        network,
+                        profile_seed_sequence,
+                        profile_name,
+                    )
+                    if self.manifest is not None:
+                        self.manifest.complete_profile(profile_name)
+                else:
+                    users_chunks = self.generate_users(
+                        profile_users_config, network, profile_seed_sequence
+                    )
+                    number_of_users = sum(
+                        len(users_chunk) for users_chunk in users_chunks
+                    )
+                    # store users with gps data in a dict
+                    self.users_dictionary[profile_name] = users_chunks
+                self.logger.info(
+                    "Users and their GPS data for profile '%s' is generated, number of users: %s",
+                    profile_name,
+                    number_of_users,
+                )
+
+        if not streaming:
+            # Write output results
+            self.logger.info("Started writing results")
+
+            with use_metrics(self.output_metrics):
+                self.output_results()
+
+        self.writer.close()
+        # shards of a run write the summary once all of them are verified
+        if self.shard is None:
+            self.output_gps_summary()
+
+        self.output_run_report(
+            seed_sequence.entropy, started_at, time.perf_counter() - start_time
+        )
@@ -0,0 +1,460 @@
+"""
+Manifest of a resumable run: which chunks of users of which profiles are already written.
+
+The manifest is a small JSON file next to the GPS output folder. It is rewritten atomically after each written batch,
+so after a failure it lists exactly the chunks whose GPS data and metadata are on disk. A rerun with the same
+config and seed continues from it: written chunks are not generated again and the missing ones are regenerated
+with the same seeds and written under the same (deterministic) fragment names.
+
+A manifest is only valid for the config it was written with: a hash of the params that define generated data
+and the layout of its files (profiles, chunk and batch sizes, routing, partitioning and file options of GPS output,
+trajectory files, seed) is stored in it. A rerun with a different config starts over only if its output is cleared,
+otherwise it is refused: files of the previous run would be mixed with files of another layout.
+
+A sharded run (shard i of N generates chunks whose index modulo N is i, see EXECUTION.SHARD_INDEX and SHARD_COUNT)
+keeps one manifest per shard. Shards of a run share the config and the seed, so their fragment names never collide.
+After all shards finish, verify_shard_manifests checks that together they wrote every chunk of every profile exactly once
+(and that their fragments are on disk in every output folder, as well as network tables written by shard 0)
+and merges them into the manifest of an unsharded run.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pyarrow.dataset as ds
+
+from gps_synth.common.columns import ColNames
+from gps_synth.common.trajectory_file import TRAJECTORY_FILE_EXTENSION
+
+MANIFEST_FORMAT_VERSION = 1
+# params of OUTPUTS.GPS which define the layout and the encoding of GPS files
+FINGERPRINT_GPS_PARAMS = (
+    "BATCH_SIZE",
+    "PARTITION_COLUMNS",
+    "USER_BUCKETS",
+    "COMPRESSION",
+    "COMPRESSION_LEVEL",
+    "ROW_GROUP_SIZE",
+)
+
+
+def get_config_fingerprint(config: Any) -> str:
+    """
+    Compute a hash of config params which define generated data and the layout of output files,
+    params which do not (e.g. WORKERS, LOGGING) are ignored
+
+    Args:
+        config (Any): YAML object with all specified config params
+
+    Returns:
+        str: Hex digest of config params
+    """
+    execution_config = config.get("EXECUTION", {})
+    gps_config = config["OUTPUTS"]["GPS"]
+    params = json.dumps(
+        [
+            MANIFEST_FORMAT_VERSION,
+            config["PROFILES"],
+            execution_config.get("CHUNK_SIZE", 100),
+            {param: gps_config.get(param) for param in FINGERPRINT_GPS_PARAMS},
+            config["OUTPUTS"].get("TRAJECTORIES"),
+            config.get("ROUTING"),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+def get_manifest_path(
+    gps_output_path: str, shard: Optional[Tuple[int, int]] = None
+) -> str:
+    """
+    Get a path of a manifest next to the GPS output folder
+
+    Args:
+        gps_output_path (str): Path of the GPS output folder
+        shard (Optional[Tuple[int, int]] = None): Index of a shard and number of shards, if None a manifest of an unsharded run
+
+    Returns:
+        str: Path of a manifest, e.g. gps_data_manifest.json or gps_data_manifest-shard-0-of-4.json
+    """
+    manifest_path = os.path.normpath(gps_output_path) + "_manifest"
+    if shard is not None:
+        manifest_path += f"-shard-{shard[0]}-of-{shard[1]}"
+
+    return manifest_path + ".json"
+
+
+class RunManifest:
+    def __init__(
+        self,
+        manifest_path: str,
+        config_fingerprint: str,
+        shard: Optional[Tuple[int, int]] = None,
+    ):
+        self.manifest_path = manifest_path
+        self.config_fingerprint = config_fingerprint
+        # index of a shard and number of shards of a sharded run
+        self.shard = None if shard is None else list(shard)
+        # entropy of a seed sequence of a run
+        self.seed = None
+        # profile name -> {"chunks": {chunk index: number of users}, "completed": bool,
+        # "number_of_chunks": number of chunks of all shards, "fragments": base names of written files}
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def load(self, seed: Optional[int], can_start_over: bool = True) -> bool:
+        """
+        Load progress of a previous run if it was made with the same config and seed
+
+        Args:
+            seed (Optional[int]): SEED of a run, if None the seed of a previous run is reused
+            can_start_over (bool = True): Whether a run can start over if the manifest was written with another config
+                or seed, False if files of the previous run are kept in the output folders
+
+        Raises:
+            ValueError: If the manifest was written with another config or seed and a run cannot start over
+
+        Returns:
+            bool: True if a run is resumed, False if it starts over
+        """
+        if not os.path.exists(self.manifest_path):
+            return False
+
+        with open(self.manifest_path, "r", encoding="utf-8") as f_in:
+            manifest = json.load(f_in)
+
+        if (
+            manifest["config_fingerprint"] != self.config_fingerprint
+            or manifest.get("shard") != self.shard
+            or (seed is not None and seed != manifest["seed"])
+        ):
+            if not can_start_over:
+                raise ValueError(
+                    f"Manifest {self.manifest_path} was written with another config or seed, "
+                    "a run keeping its output cannot resume it: clear the output or restore the config"
+                )
+            self.logger.info(
+                "Manifest %s was written with another config or seed, the run starts over",
+                self.manifest_path,
+            )
+            return False
+
+        self.seed = manifest["seed"]
+        self.profiles = {
+            profile_name: {
+                "chunks": {
+                    int(chunk_index): number_of_users
+                    for chunk_index, number_of_users in progress["chunks"].items()
+                },
+                "completed": progress["completed"],
+                "number_of_chunks": progress.get("number_of_chunks"),
+                "fragments": progress.get("fragments", []),
+            }
+            for profile_name, progress in manifest["profiles"].items()
+        }
+
+        return True
+
+    def save(self) -> None:
+        """
+        Write the manifest atomically, a reader sees either a previous or a new version
+        """
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f_out:
+            json.dump(
+                {
+                    "format_version": MANIFEST_FORMAT_VERSION,
+                    "config_fingerprint": self.config_fingerprint,
+                    "shard": self.shard,
+                    "seed": self.seed,
+                    "profiles": self.profiles,
+                },
+                f_out,
+            )
+        os.replace(tmp_path, self.manifest_path)
+
+    def get_fragment_name(self, profile_name: str, chunk_index: int) -> str:
+        """
+        Get a deterministic name of files of a batch starting with a chunk, the same in a resumed run
+        and different for runs with another config or seed (so their files are not overwritten)
+
+        Args:
+            profile_name (str): Name of a profile
+            chunk_index (int): Index of the first chunk of a batch
+
+        Returns:
+            str: Base name of files
+        """
+        run_key = hashlib.sha256(
+            f"{self.config_fingerprint}-{self.seed}".encode("utf-8")
+        ).hexdigest()[:12]
+
+        return f"{profile_name}-{run_key}-{chunk_index:06d}"
+
+    def get_profile(self, profile_name: str) -> Dict[str, Any]:
+        # pylint: disable=missing-function-docstring
+        return self.profiles.setdefault(
+            profile_name,
+            {
+                "chunks": {},
+                "completed": False,
+                "number_of_chunks": None,
+                "fragments": [],
+            },
+        )
+
+    def get_written_chunks(self, profile_name: str) -> Set[int]:
+        """
+        Get indexes of chunks of a profile which are already written
+
+        Args:
+            profile_name (str): Name of a profile
+
+        Returns:
+            Set[int]: Indexes of written chunks
+        """
+        return set(self.get_profile(profile_name)["chunks"])
+
+    def get_number_of_users(self, profile_name: str) -> int:
+        """
+        Get number of users of a profile in written chunks
+
+        Args:
+            profile_name (str): Name of a profile
+
+        Returns:
+            int: Number of written users
+        """
+        return sum(self.get_profile(profile_name)["chunks"].values())
+
+    def is_completed(self, profile_name: str) -> bool:
+        # pylint: disable=missing-function-docstring
+        return self.get_profile(profile_name)["completed"]
+
+    def set_number_of_chunks(self, profile_name: str, number_of_chunks: int) -> None:
+        # pylint: disable=missing-function-docstring
+        self.get_profile(profile_name)["number_of_chunks"] = number_of_chunks
+
+    def add_chunks(
+        self,
+        profile_name: str,
+        chunks: Dict[int, int],
+        fragment_name: Optional[str] = None,
+    ) -> None:
+        """
+        Record written chunks of a profile and save the manifest
+
+        Args:
+            profile_name (str): Name of a profile
+            chunks (Dict[int, int]): Index of a written chunk -> number of users in it
+            fragment_name (Optional[str] = None): Base name of files the chunks are written to
+        """
+        progress = self.get_profile(profile_name)
+        progress["chunks"].update(chunks)
+        if fragment_name is not None and fragment_name not in progress["fragments"]:
+            progress["fragments"].append(fragment_name)
+        self.save()
+
+    def complete_profile(self, profile_name: str) -> None:
+        """
+        Record that all chunks of a profile are written and save the manifest
+
+        Args:
+            profile_name (str): Name of a profile
+        """
+        self.get_profile(profile_name)["completed"] = True
+        self.save()
+
+
+def get_fragment_names(output_path: str) -> Set[str]:
+    """
+    Get base names of files written to an output folder: parquet files (names without the "-{i}.parquet" suffix)
+    and trajectory files (names without the ".trj" extension)
+
+    Args:
+        output_path (str): Path of an output folder
+
+    Returns:
+        Set[str]: Base names of files in all partitions
+    """
+    fragment_names = set()
+    for _, _, file_names in os.walk(output_path):
+        for file_name in file_names:
+            if file_name.endswith(".parquet"):
+                fragment_names.add(file_name.rsplit("-", 1)[0])
+            elif file_name.endswith(TRAJECTORY_FILE_EXTENSION):
+                fragment_names.add(file_name[: -len(TRAJECTORY_FILE_EXTENSION)])
+
+    return fragment_names
+
+
+def get_network_names(network_tables_path: str) -> Set[str]:
+    """
+    Get names of networks written to the network tables folder (whatever its partition columns are)
+
+    Args:
+        network_tables_path (str): Path of the network tables folder
+
+    Returns:
+        Set[str]: Names of networks with written tables
+    """
+    dataset = ds.dataset(network_tables_path, format="parquet", partitioning="hive")
+    if ColNames.network_name not in dataset.schema.names:
+        return set()
+
+    return set(
+        dataset.to_table(columns=[ColNames.network_name])
+        .column(ColNames.network_name)
+        .unique()
+        .to_pylist()
+    )
+
+
+def merge_shard_progress(
+    merged_progress: Dict[str, Any],
+    progress: Dict[str, Any],
+    description: str,
+    shard_index: int,
+    shard_count: int,
+    fragment_names: List[Set[str]],
+) -> List[str]:
+    """
+    Add progress of a profile in a shard's manifest to the merged progress of the profile and check it
+
+    Args:
+        merged_progress (Dict[str, Any]): Progress of a profile merged from previous shards
+        progress (Dict[str, Any]): Progress of a profile in a shard's manifest
+        description (str): Description of a profile and a shard for problems
+        shard_index (int): Index of a shard
+        shard_count (int): Number of shards
+        fragment_names (List[Set[str]]): Base names of files in each output folder
+
+    Returns:
+        List[str]: Problems found
+    """
+    problems = []
+    if not progress["completed"]:
+        problems.append(f"{description} is not completed")
+    if progress["number_of_chunks"] is not None:
+        if merged_progress["number_of_chunks"] not in (
+            None,
+            progress["number_of_chunks"],
+        ):
+            problems.append(f"{description} has another number of chunks")
+        merged_progress["number_of_chunks"] = progress["number_of_chunks"]
+
+    for chunk_index, number_of_users in progress["chunks"].items():
+        if chunk_index % shard_count != shard_index:
+            problems.append(f"{description} has a chunk of another shard {chunk_index}")
+        if chunk_index in merged_progress["chunks"]:
+            problems.append(f"{description} has an already written chunk {chunk_index}")
+        merged_progress["chunks"][chunk_index] = number_of_users
+
+    for fragment_name in progress["fragments"]:
+        if any(fragment_name not in names for names in fragment_names):
+            problems.append(f"{description} has missing files of {fragment_name}")
+    merged_progress["fragments"].extend(progress["fragments"])
+
+    return problems
+
+
+def verify_shard_manifests(
+    gps_output_path: str,
+    output_paths: List[str],
+    config_fingerprint: str,
+    shard_count: int,
+    profile_names: List[str],
+    network_tables_path: str,
+    network_names: List[str],
+) -> List[str]:
+    """
+    Check manifests of all shards of a sharded run: they are written with the same config and seed, every profile is completed
+    by every shard, each chunk of a profile is written by exactly the shard it belongs to, every recorded fragment
+    has files in every output folder and tables of every network are written. If there are no problems, the manifests
+    are merged into the manifest of an unsharded run (so a resumed unsharded run finds all profiles completed)
+
+    Args:
+        gps_output_path (str): Path of the GPS output folder, manifests are next to it
+        output_paths (List[str]): Paths of output folders every fragment is written to (GPS data, metadata
+            and trajectory files if configured)
+        config_fingerprint (str): Fingerprint of the config of the run
+        shard_count (int): Number of shards
+        profile_names (List[str]): Names of profiles of the run
+        network_tables_path (str): Path of the network tables folder
+        network_names (List[str]): Names of networks of the run
+
+    Returns:
+        List[str]: Problems found, empty if the shards are complete and consistent
+    """
+    problems = []
+    manifests = []
+    for shard_index in range(shard_count):
+        manifest = RunManifest(
+            get_manifest_path(gps_output_path, (shard_index, shard_count)),
+            config_fingerprint,
+            (shard_index, shard_count),
+        )
+        if not os.path.exists(manifest.manifest_path):
+            problems.append(f"manifest of shard {shard_index} is missing")
+        elif not manifest.load(None):
+            problems.append(
+                f"manifest of shard {shard_index} is written with another config"
+            )
+        else:
+            manifests.append(manifest)
+    if problems:
+        return problems
+
+    if len({manifest.seed for manifest in manifests}) > 1:
+        return ["shards are run with different seeds"]
+
+    merged_manifest = RunManifest(
+        get_manifest_path(gps_output_path), config_fingerprint
+    )
+    merged_manifest.seed = manifests[0].seed
+    fragment_names = [get_fragment_names(output_path) for output_path in output_paths]
+    for profile_name in dict.fromkeys(
+        [
+            *profile_names,
+            *(
+                profile_name
+                for manifest in manifests
+                for profile_name in manifest.profiles
+            ),
+        ]
+    ):
+        merged_progress = merged_manifest.get_profile(profile_name)
+        for shard_index, manifest in enumerate(manifests):
+            problems += merge_shard_progress(
+                merged_progress,
+                manifest.get_profile(profile_name),
+                f"profile '{profile_name}' of shard {shard_index}",
+                shard_index,
+                shard_count,
+                fragment_names,
+            )
+
+        missing_chunks = set(range(merged_progress["number_of_chunks"] or 0)) - set(
+            merged_progress["chunks"]
+        )
+        if missing_chunks:
+            problems.append(
+                f"chunks {sorted(missing_chunks)} of profile '{profile_name}' are not written"
+            )
+        merged_progress["completed"] = True
+
+    written_network_names = get_network_names(network_tables_path)
+    for network_name in dict.fromkeys(network_names):
+        if network_name not in written_network_names:
+            problems.append(f"tables of network '{network_name}' are not written")
+
+    if not problems:
+        merged_manifest.save()
+
+    return problems
@@ -0,0 +1,98 @@
+"""
+Building networks of a run in parallel.
+
+Networks of all profiles are known from the config, so the ones which are not in the network cache are built
+in a pool of forked processes from the start of a run, while the main process already generates users of profiles
+whose networks are ready. A worker returns the compact form of a built network (Network.get_built_data: graph arrays,
+graph CRS and location tables, the same as a network cache entry) instead of a pickled graph, the main process
+restores the graph and creates indexes of a network (Network.create_indexes) when its first profile is reached.
+Cached networks are loaded in the main process, memory-mapped, as in a serial run.
+"""
+
+import multiprocessing as mp
+import time
+from multiprocessing.pool import AsyncResult
+from typing import Any, Dict, Tuple
+
+from gps_synth.common.metrics import get_metrics
+from gps_synth.network.network import Network
+
+
+def build_network_data(network: Network) -> Tuple[Tuple[Any, ...], float]:
+    """
+    Build a network in a worker process
+
+    Args:
+        network (Network): Instance of Network class which is not built yet
+
+    Returns:
+        Tuple[Tuple[Any, ...], float]: Compact form of a built network and seconds spent building it
+    """
+    start = time.perf_counter()
+    network.build()
+
+    return network.get_built_data(), time.perf_counter() - start
+
+
+class NetworkPool:
+    """
+    Networks of a run, the ones missing in the network cache are built concurrently in a pool of forked processes
+    """
+
+    def __init__(self, networks: Dict[str, Network], processes: int):
+        # network name -> network which is not handed to a profile yet
+        self.networks = networks
+        # network name -> result of a network built by a worker
+        self.builds: Dict[str, AsyncResult] = {}
+        self.pool = None
+
+        network_names = [
+            network_name
+            for network_name, network in networks.items()
+            if not network.is_cached()
+        ]
+        if network_names:
+            # a worker is replaced after every network, so memory of building it is returned to the system
+            self.pool = mp.get_context("fork").Pool(
+                min(processes, len(network_names)), maxtasksperchild=1
+            )
+            for network_name in network_names:
+                self.builds[network_name] = self.pool.apply_async(
+                    build_network_data, (networks[network_name],)
+                )
+            self.pool.close()
+
+    def __contains__(self, network_name: str) -> bool:
+        return network_name in self.networks
+
+    def get(self, network_name: str) -> Network:
+        """
+        Get a network with completed run method, waiting for a worker building it if needed
+
+        Args:
+            network_name (str): Name of a network
+
+        Returns:
+            Network: Instance of Network class with completed run method
+        """
+        network = self.networks.pop(network_name)
+        build = self.builds.pop(network_name, None)
+        metrics = get_metrics()
+
+        if build is None:
+            with metrics.timer("network"):
+                network.run()
+        else:
+            # time of a main process waiting for a worker, the rest of building overlaps with generation of users
+            with metrics.timer("network_wait"):
+                built_data, build_seconds = build.get()
+            metrics.add_time("network_build", build_seconds)
+            with metrics.timer("network"):
+                network.set_built_data(*built_data)
+                network.create_indexes()
+
+        if not self.builds and self.pool is not None:
+            self.pool.join()
+            self.pool = None
+
+        return network
@@ -0,0 +1,158 @@
+"""
+Output schemas of a run: Arrow tables of GPS data, metadata and network tables built from generated users and networks.
+
+Tables are built in the main thread and written by the background writer of GPS_Generator.
+"""
+
+from typing import List
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+
+from gps_synth.common.columns import ColNames
+from gps_synth.common.trajectory import TrajectoryBuffer
+from gps_synth.gps_generator.users_chunk import UsersChunk
+from gps_synth.network.network import Network
+
+
+def create_gps_data(users_chunks: List[UsersChunk]) -> TrajectoryBuffer:
+    """
+    Collect users' synth GPS data of a batch of chunks sorted by (user_id, timestamp)
+
+    Args:
+        users_chunks (List[UsersChunk]): Chunks of users of a profile
+
+    Returns:
+        TrajectoryBuffer: Sorted GPS data of a batch
+    """
+    gps_data = TrajectoryBuffer.concat(
+        users_chunk.gps_data for users_chunk in users_chunks
+    )
+    gps_data.sort()
+
+    return gps_data
+
+
+def create_gps_table(
+    gps_data: TrajectoryBuffer,
+    profile_name: str,
+    partition_columns: List[str],
+    number_of_user_buckets: int,
+) -> pa.Table:
+    """
+    Convert sorted GPS data of a batch to the output schema (user_id with dictionary pages, timestamp[s],
+    float64 lon and lat) without copying coordinates, with derived partition columns if requested
+
+    Args:
+        gps_data (TrajectoryBuffer): GPS data of a batch sorted by (user_id, timestamp), see create_gps_data
+        profile_name (str): Name of a profile the users belong to
+        partition_columns (List[str]): Columns GPS output is partitioned by (profile_name, date, user_bucket)
+        number_of_user_buckets (int): Number of buckets of the user_bucket column
+
+    Returns:
+        pa.Table: GPS data of a batch
+    """
+    # user_id is written as a string column, dictionary-encoded by parquet: unlike for a dictionary column,
+    # readers filtering by user_id use row group statistics of a string column to skip row groups
+    gps_data_table = gps_data.to_arrow(dictionary_user_id=False)
+    gps_data_table = gps_data_table.append_column(
+        ColNames.profile_name,
+        pa.repeat(profile_name, gps_data_table.num_rows),
+    )
+    # derived partition columns are stored only in paths of files, which keep their (user_id, timestamp) order
+    if ColNames.date in partition_columns:
+        gps_data_table = gps_data_table.append_column(
+            ColNames.date, pa.array(gps_data.get_dates())
+        )
+    if ColNames.user_bucket in partition_columns:
+        gps_data_table = gps_data_table.append_column(
+            ColNames.user_bucket,
+            pa.array(gps_data.get_user_buckets(number_of_user_buckets)),
+        )
+
+    return gps_data_table
+
+
+def create_network_table(network_name: str, network: Network) -> pa.Table:
+    """
+    Convert locations of a network to the output schema of network tables
+
+    Args:
+        network_name (str): Name of a network
+        network (Network): Instance of Network class with completed run method
+
+    Returns:
+        pa.Table: Home/work and event locations of a network with their centres in WGS 84
+    """
+    network_gdf = gpd.GeoDataFrame(
+        pd.concat(
+            [
+                network.gdf_hw.assign(loc_type="hw"),
+                network.gdf_event.assign(loc_type="event"),
+            ],
+            ignore_index=True,
+        )
+    ).to_crs(4326)
+
+    network_gdf[ColNames.centre_x] = network_gdf["geometry"].x
+    network_gdf[ColNames.centre_y] = network_gdf["geometry"].y
+
+    network_df = network_gdf.drop(
+        columns=["nearest_node_id", "distance_to_node", "geometry"]
+    )
+
+    network_df[ColNames.network_name] = network_name
+
+    return pa.Table.from_pandas(network_df)
+
+
+def create_metadata_table(
+    users_chunks: List[UsersChunk],
+    profile_name: str,
+    network_name: str,
+    network: Network,
+) -> pa.Table:
+    """
+    Convert anchor locations of users of a batch of chunks to the output schema of metadata (OSM ids of locations)
+
+    Args:
+        users_chunks (List[UsersChunk]): Chunks of users of a profile
+        profile_name (str): Name of a profile the users belong to
+        network_name (str): Name of a network of a profile
+        network (Network): Network of a profile to search for locations by ids
+
+    Returns:
+        pa.Table: Metadata of a batch
+    """
+    # network_name is needed to make it clear in what particular network to search for locations by ids
+    # alternatice way is to look in config
+    metadata_data_df = pd.DataFrame(
+        [
+            [
+                user_id,
+                network.hw_locations.osmid[home_id],
+                network.hw_locations.osmid[work_id],
+                network.event_locations.osmid[regular_loc_array],
+                profile_name,
+                network_name,
+            ]
+            for users_chunk in users_chunks
+            for user_id, home_id, work_id, regular_loc_array in zip(
+                users_chunk.user_ids,
+                users_chunk.home_ids,
+                users_chunk.work_ids,
+                users_chunk.regular_loc_arrays,
+            )
+        ],
+        columns=[
+            ColNames.user_id,
+            ColNames.home_id,
+            ColNames.work_id,
+            ColNames.regular_loc_array,
+            ColNames.profile_name,
+            ColNames.network_name,
+        ],
+    )
+
+    return pa.Table.from_pandas(metadata_data_df)
@@ -0,0 +1,169 @@
+"""
+Generation of users in chunks, either in the main process or in worker processes.
+
+Workers are forked, so they inherit the network attributes (set with set_network_attributes before the pool is created)
+via copy-on-write instead of receiving a pickled copy with each task. Each chunk is returned in a columnar form (UsersChunk)
+rather than as pickled User instances, together with metrics (timers and counters) recorded while generating it.
+"""
+
+from typing import Any, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from gps_synth.common.abs_user import User
+from gps_synth.common.functions import class_getter
+from gps_synth.common.meaningful_locations import MeaningfulLocations
+from gps_synth.common.metrics import RunMetrics, use_metrics
+from gps_synth.common.trajectory import TrajectoryBuffer
+from gps_synth.network.locations import Locations
+from gps_synth.network.projection import ProjectionContext
+from gps_synth.network.routing import Router
+
+# network attributes of the profile being generated, see set_network_attributes
+network_attributes = {}
+
+
+class UsersChunk:
+    """
+    Columnar result of generating a chunk of users: their GPS data and anchor locations
+    """
+
+    def __init__(self, chunk_index: int = 0):
+        # position of a chunk among chunks of a profile
+        self.chunk_index = chunk_index
+        self.gps_data = TrajectoryBuffer()
+        self.user_ids: List[str] = []
+        self.home_ids: List[int] = []
+        self.work_ids: List[int] = []
+        self.regular_loc_arrays: List[List[int]] = []
+        # timers and counters (e.g. route cache hits and misses) recorded while generating the chunk
+        self.metrics = RunMetrics()
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def add_user(self, user: User) -> None:
+        """
+        Store GPS data and anchor locations of a user with generated GPS data
+
+        Args:
+            user (User): Instance of User class with completed generate_gps method
+        """
+        self.gps_data.extend(user.data_array)
+        self.user_ids.append(user.user_id)
+        self.home_ids.append(user.home_id)
+        self.work_ids.append(user.work_id)
+        self.regular_loc_arrays.append(list(user.regular_loc_array))
+
+
+def group_users_chunks(
+    users_chunks: Iterable[UsersChunk], batch_size: Optional[int]
+) -> Iterator[List[UsersChunk]]:
+    """
+    Group chunks of users into batches of at least batch_size users (rounded up to whole chunks),
+    a batch is yielded as soon as it is complete, so chunks can be consumed while they are being generated
+
+    Args:
+        users_chunks (Iterable[UsersChunk]): Chunks of users
+        batch_size (Optional[int]): Minimal number of users in a batch, if None all chunks form one batch
+
+    Yields:
+        List[UsersChunk]: Batch of chunks of users
+    """
+    batch = []
+    for users_chunk in users_chunks:
+        batch.append(users_chunk)
+        if batch_size is not None and sum(map(len, batch)) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def set_network_attributes(
+    hw_locations: Locations,
+    event_locations: Locations,
+    router: Router,
+    projection: ProjectionContext,
+) -> None:
+    """
+    Store network attributes of a profile at module level, so they can be used by generate_users_chunk
+    in the current process or in forked worker processes (used as a pool initializer)
+
+    Args:
+        hw_locations (Locations): Locations of a network to use for home and work anchors
+        event_locations (Locations): Locations of a network to use for regular and random event anchors
+        router (Router): Router of a network, each process fills its own copy of the route cache
+        projection (ProjectionContext): Projection context of a network
+    """
+    network_attributes.clear()
+    network_attributes.update(
+        hw_locations=hw_locations,
+        event_locations=event_locations,
+        router=router,
+        projection=projection,
+    )
+
+
+def generate_users_chunk(
+    profile_user_config: Any,
+    user_ids: List[str],
+    seed_sequences: List[np.random.SeedSequence],
+    meaningful_locations: MeaningfulLocations,
+    chunk_index: int = 0,
+) -> UsersChunk:
+    """
+    Create users of a profile with their meaningful locations (assigned in bulk for a profile) and generate their GPS data.
+    Each user is seeded with its own seed sequence, so results do not depend on how users are split into chunks
+
+    Args:
+        profile_user_config (Any): YAML object with config params regarding users
+        user_ids (List[str]): Ids of users to generate
+        seed_sequences (List[np.random.SeedSequence]): Seed sequence of each user
+        meaningful_locations (MeaningfulLocations): Anchors of each user
+        chunk_index (int): Position of a chunk among chunks of a profile
+
+    Returns:
+        UsersChunk: GPS data and anchor locations of generated users
+    """
+    user_class = class_getter(
+        profile_user_config["USER_MODULE_PATH"], profile_user_config["USER_CLASS"]
+    )
+
+    users_chunk = UsersChunk(chunk_index)
+    route_cache = network_attributes["router"].route_cache
+    hits, misses = route_cache.hits, route_cache.misses
+
+    with use_metrics(users_chunk.metrics) as metrics, metrics.timer("users"):
+        for user_index, (user_id, seed_sequence) in enumerate(
+            zip(user_ids, seed_sequences)
+        ):
+            user = user_class(
+                user_id, profile_user_config, rng=np.random.default_rng(seed_sequence)
+            )
+            user.set_meaningful_locations(
+                int(meaningful_locations.home_ids[user_index]),
+                int(meaningful_locations.work_ids[user_index]),
+                meaningful_locations.get_regular_ids(user_index).tolist(),
+            )
+            if network_attributes["router"].precompute:
+                network_attributes["router"].precompute_routes(
+                    user.get_anchor_nodes(
+                        network_attributes["hw_locations"],
+                        network_attributes["event_locations"],
+                    )
+                )
+            user.generate_gps(
+                network_attributes["hw_locations"],
+                network_attributes["event_locations"],
+                network_attributes["router"],
+                network_attributes["projection"],
+            )
+            users_chunk.add_user(user)
+
+    users_chunk.metrics.count("users", len(users_chunk))
+    users_chunk.metrics.count("route_cache_hits", route_cache.hits - hits)
+    users_chunk.metrics.count("route_cache_misses", route_cache.misses - misses)
+
+    return users_chunk
@@ -1,20 +1,45 @@
+import argparse
+import cProfile
 import datetime
+import gc
+import io
 import logging
 import os
-import sys
-from typing import Any
+import pstats
+from typing import Any, Optional, Tuple
 
 import yaml
 
-from gps_synth.common.functions import check_or_create_dir, class_getter
-
-
-def main(config_file_path: str) -> None:
+from gps_synth.common.functions import (
+    check_or_create_dir,
+    class_getter,
+    write_parquet_summary,
+)
+from gps_synth.gps_generator.manifest import (
+    get_config_fingerprint,
+    verify_shard_manifests,
+)
+
+# number of functions (by cumulative time) logged after a profiled run
+PROFILE_TOP_FUNCTIONS = 30
+
+
+def main(
+    config_file_path: str,
+    profile_path: Optional[str] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    verify_shards_count: Optional[int] = None,
+) -> None:
     """
     Load config, setup logger, initialise GPS_Generator class and run it
 
     Args:
         config_file_path (str): Relative path to config file spceified as the second parameter in terminal command
+        profile_path (Optional[str] = None): If set, the run is profiled with cProfile and stats are dumped to this path,
+                                             an empty string means a .prof file next to the log file
+        shard (Optional[Tuple[int, int]] = None): Index of a shard and number of shards to run (overrides EXECUTION.SHARD_INDEX and SHARD_COUNT)
+        verify_shards_count (Optional[int] = None): If set, nothing is generated, manifests of this number of shards
+                                                    of a finished sharded run are verified and merged
     """
 
     base_dir = os.getcwd()
@@ -22,22 +47,138 @@ def main(config_file_path: str) -> None:
     with open(str(config_file_path), "r", encoding="utf-8") as f_in:
         config = yaml.safe_load(f_in)
 
-    set_up_logger(config, base_dir)
+    if shard is not None:
+        config.setdefault("EXECUTION", {}).update(
+            SHARD_INDEX=shard[0], SHARD_COUNT=shard[1]
+        )
+
+    log_file_path = set_up_logger(config, base_dir)
 
     logger = logging.getLogger(__name__)
 
     logger.info("Run main.py")
 
+    if verify_shards_count is not None:
+        verify_shards(config, base_dir, verify_shards_count)
+        return
+
     GPS_GENERATOR = class_getter(
         config["INIT"]["GPS_GENERATOR_PATH"], config["INIT"]["GPS_GENERATOR_CLASS"]
     )
 
     GPS_GENERATOR = GPS_GENERATOR(config, base_dir)
 
-    GPS_GENERATOR.run()
+    if profile_path is None:
+        GPS_GENERATOR.run()
+    else:
+        profile_run(
+            GPS_GENERATOR.run,
+            profile_path or os.path.splitext(log_file_path)[0] + ".prof",
+        )
+
+    # free networks (graphs are reference cycles) in the main thread, otherwise they may be collected
+    # during interpreter shutdown by a native thread (e.g. of Arrow) which then aborts the process
+    del GPS_GENERATOR
+    gc.collect()
+
+
+def verify_shards(config: Any, base_dir: str, shard_count: int) -> None:
+    """
+    Verify that shards of a sharded run wrote every chunk of users exactly once, merge their manifests
+    and write a summary file of GPS output (unless OUTPUTS.GPS.SUMMARY_FILE is False)
+
+    Args:
+        config (Any): YAML object with all specified config params
+        base_dir (str): The string path to GPS_Generator folder
+        shard_count (int): Number of shards of the run
+
+    Raises:
+        ValueError: If manifests of shards are missing, inconsistent or incomplete
+    """
+    logger = logging.getLogger(__name__)
+
+    problems = verify_shard_manifests(
+        os.path.join(base_dir, config["OUTPUTS"]["GPS"]["PATH"]),
+        [
+            os.path.join(base_dir, config["OUTPUTS"][output]["PATH"])
+            for output in ("GPS", "METADATA", "TRAJECTORIES")
+            if output in config["OUTPUTS"]
+        ],
+        get_config_fingerprint(config),
+        shard_count,
+        [
+            profile_config["PROFILE_NAME"]
+            for profile_config in config["PROFILES"].values()
+        ],
+        os.path.join(base_dir, config["OUTPUTS"]["NETWORK_TABLES"]["PATH"]),
+        [
+            profile_config["NETWORK_PARAMS"]["NETWORK_NAME"]
+            for profile_config in config["PROFILES"].values()
+        ],
+    )
+    for problem in problems:
+        logger.error(problem)
+    if problems:
+        raise ValueError(
+            f"Manifests of {shard_count} shards have {len(problems)} problem(s), see the log"
+        )
+
+    logger.info("All %s shards are complete, their manifests are merged", shard_count)
 
+    if config["OUTPUTS"]["GPS"].get("SUMMARY_FILE", True):
+        number_of_files = write_parquet_summary(
+            os.path.join(base_dir, config["OUTPUTS"]["GPS"]["PATH"])
+        )
+        logger.info("Summary file of %s GPS files is written", number_of_files)
 
-def set_up_logger(config: Any, base_dir: str) -> None:
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a shard given as i/N (shard i of N, 0 <= i < N)
+
+    Args:
+        value (str): Shard in the form i/N
+
+    Returns:
+        Tuple[int, int]: Index of a shard and number of shards
+    """
+    try:
+        shard_index, shard_count = map(int, value.split("/"))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"'{value}' is not in the form i/N") from e
+    if not 0 <= shard_index < shard_count:
+        raise argparse.ArgumentTypeError(f"shard {value} is out of range")
+
+    return shard_index, shard_count
+
+
+def profile_run(run: Any, profile_path: str) -> None:
+    """
+    Run a function under cProfile, dump stats (readable with pstats or e.g. snakeviz) and log the top functions.
+    Only the main process is profiled: with EXECUTION.WORKERS > 1 users are generated in workers,
+    whose stages are covered by the run report, so use WORKERS: 1 to profile generation itself
+
+    Args:
+        run (Any): Function to profile
+        profile_path (str): Path to dump stats to
+    """
+    logger = logging.getLogger(__name__)
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run)
+    finally:
+        profiler.dump_stats(profile_path)
+        stats_stream = io.StringIO()
+        pstats.Stats(profiler, stream=stats_stream).sort_stats(
+            "cumulative"
+        ).print_stats(PROFILE_TOP_FUNCTIONS)
+        logger.info(
+            "Profile is written to %s\n%s", profile_path, stats_stream.getvalue()
+        )
+
+
+def set_up_logger(config: Any, base_dir: str) -> str:
     """
     The function creates a log_dir folder (by appending sub-path to the base/parent path) to store logs
     and sets up a logger
@@ -45,13 +186,24 @@ def set_up_logger(config: Any, base_dir: str) -> None:
     Args:
         config (Any): YAML object with all specified config params
         base_dir (str): The string path to GPS_Generator folder
+
+    Returns:
+        str: Path of a log file
     """
 
     log_dir = os.path.join(base_dir, config["LOGGING"]["LOG_DIR"])
     check_or_create_dir(log_dir)
 
+    # shards started at once get their own log files
+    execution_config = config.get("EXECUTION", {})
+    shard_suffix = (
+        ""
+        if execution_config.get("SHARD_COUNT") is None
+        else f"-shard-{execution_config['SHARD_INDEX']}-of-{execution_config['SHARD_COUNT']}"
+    )
     log_file_path = os.path.join(
-        log_dir, f"{datetime.datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}.log"
+        log_dir,
+        f"{datetime.datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}{shard_suffix}.log",
     )
     logging.getLogger(__name__)
     logging.basicConfig(
@@ -61,6 +213,31 @@ def set_up_logger(config: Any, base_dir: str) -> None:
         level=config["LOGGING"]["LEVEL"],
     )
 
+    return log_file_path
+
 
 if __name__ == "__main__":
-    main(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Generate synthetic GPS data")
+    parser.add_argument("config_file_path", help="Path to a config file")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Profile the run with cProfile and dump stats to PATH (by default next to the log file)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="i/N",
+        help="Generate shard i of N: chunks of users of every profile whose index modulo N is i (EXECUTION.SEED is required)",
+    )
+    parser.add_argument(
+        "--verify-shards",
+        type=int,
+        metavar="N",
+        help="Verify manifests of N shards of a finished sharded run and merge them, nothing is generated",
+    )
+    args = parser.parse_args()
+    main(args.config_file_path, args.profile, args.shard, args.verify_shards)
@@ -0,0 +1,363 @@
+"""
+Persistent on-disk cache of prepared networks.
+
+An entry is addressed by a hash of the parameters a network is built from (place or local files, network type, OSM tags, network class),
+it stores the projected graph as compact arrays (node ids and coordinates, CSR adjacency with edge lengths)
+and location tables as parquet. Arrays are memory-mapped when an entry is loaded.
+
+Invalidation and eviction:
+
+- an entry older than `max_age_days` is treated as missing and rebuilt (OSM data changes over time)
+- `refresh=True` ignores existing entries, every network is rebuilt and its entry overwritten
+- an entry is never replaced while it may be in use: if another process (e.g. a shard of the same run) saves
+  the same entry first, it is kept and the own copy is discarded. Only a corrupt entry or, with `refresh=True`,
+  an entry saved before the cache was opened is replaced
+- after an entry is saved, least recently used entries above `max_entries` are deleted (staging directories
+  of entries being saved are not entries)
+- the format version is a part of the key, entries of an outdated format are never read and eventually evicted
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+from geopandas import GeoDataFrame
+from networkx import MultiDiGraph
+from pyproj import CRS
+
+from gps_synth.common.functions import check_or_create_dir, delete_directory
+
+CACHE_FORMAT_VERSION = 1
+# an entry is written to a staging directory with this prefix and renamed once complete
+TMP_ENTRY_PREFIX = ".tmp-"
+
+GRAPH_ARRAYS = ["node_id", "node_x", "node_y", "indptr", "indices", "lengths"]
+
+
+def graph_to_arrays(graph_proj: MultiDiGraph) -> Dict[str, np.ndarray]:
+    """
+    Convert a projected graph into compact arrays: node ids and coordinates, and CSR adjacency
+    (for each node - positions of its successors and lengths of edges to them, the shortest of parallel edges is kept)
+
+    Args:
+        graph_proj (MultiDiGraph): Projected graph of a network
+
+    Returns:
+        Dict[str, np.ndarray]: node_id, node_x, node_y, indptr, indices and lengths arrays
+    """
+    node_id = np.fromiter(graph_proj.nodes, dtype=np.int64, count=len(graph_proj))
+    node_x = np.array([data["x"] for _, data in graph_proj.nodes(data=True)])
+    node_y = np.array([data["y"] for _, data in graph_proj.nodes(data=True)])
+    node_position = {node: position for position, node in enumerate(node_id.tolist())}
+
+    edges = np.array(
+        [
+            (node_position[u], node_position[v], length)
+            for u, v, length in graph_proj.edges(data="length")
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    row, col, lengths = (
+        edges[:, 0].astype(np.int64),
+        edges[:, 1].astype(np.int64),
+        edges[:, 2],
+    )
+
+    # keep the shortest of parallel edges
+    order = np.lexsort((lengths, col, row))
+    row, col, lengths = row[order], col[order], lengths[order]
+    first = np.ones(len(row), dtype=bool)
+    first[1:] = (row[1:] != row[:-1]) | (col[1:] != col[:-1])
+    row, col, lengths = row[first], col[first], lengths[first]
+
+    indptr = np.zeros(len(node_id) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row, minlength=len(node_id)), out=indptr[1:])
+
+    return {
+        "node_id": node_id,
+        "node_x": node_x,
+        "node_y": node_y,
+        "indptr": indptr,
+        "indices": col,
+        "lengths": lengths,
+    }
+
+
+def arrays_to_graph(
+    graph_arrays: Dict[str, np.ndarray], graph_crs: Any
+) -> MultiDiGraph:
+    """
+    Restore a projected graph from arrays created by graph_to_arrays
+
+    Args:
+        graph_arrays (Dict[str, np.ndarray]): node_id, node_x, node_y, indptr, indices and lengths arrays
+        graph_crs (Any): CRS of a projected graph
+
+    Returns:
+        MultiDiGraph: Projected graph with x and y node attributes and length edge attribute
+    """
+    node_id = graph_arrays["node_id"].tolist()
+    graph_proj = MultiDiGraph(crs=graph_crs)
+    graph_proj.add_nodes_from(
+        (node, {"x": x, "y": y})
+        for node, x, y in zip(
+            node_id,
+            graph_arrays["node_x"].tolist(),
+            graph_arrays["node_y"].tolist(),
+        )
+    )
+
+    row = np.repeat(np.arange(len(node_id)), np.diff(graph_arrays["indptr"]))
+    graph_proj.add_edges_from(
+        (node_id[u], node_id[v], {"length": length})
+        for u, v, length in zip(
+            row.tolist(),
+            graph_arrays["indices"].tolist(),
+            graph_arrays["lengths"].tolist(),
+        )
+    )
+
+    return graph_proj
+
+
+class NetworkCache:
+    def __init__(
+        self,
+        cache_dir: str,
+        max_entries: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+        refresh: bool = False,
+    ):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.refresh = refresh
+        # with refresh, entries saved before this time are replaced, later ones are saved by other processes
+        self.opened_at = time.time()
+        self.logger = logging.getLogger(__name__)
+
+        check_or_create_dir(cache_dir)
+
+    def get_key(
+        self,
+        network_class: str,
+        place_name: str,
+        network_type: str,
+        osm_tags_for_hw: List[str],
+        osm_tags_for_event: List[str],
+        network_source: Optional[List[Any]] = None,
+    ) -> str:
+        """
+        Compute a key of a cache entry based on parameters a network is built from
+
+        Args:
+            network_class (str): Full name of a class building a network
+            place_name (str): A name of place in which a graph should be derived
+            network_type (str): What type of street network to get
+            osm_tags_for_hw (List[str]): List of OSM tags to use for search location of home/work anchor points
+            osm_tags_for_event (List[str]): List of OSM tags to use for search location of event anchor points
+            network_source (Optional[List[Any]] = None): Source of a network and description of its local files
+
+        Returns:
+            str: Hex digest identifying a network
+        """
+        params = json.dumps(
+            [
+                CACHE_FORMAT_VERSION,
+                network_class,
+                place_name,
+                network_type,
+                list(osm_tags_for_hw),
+                list(osm_tags_for_event),
+                network_source,
+            ]
+        )
+
+        return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+    def get_entry_dir(self, key: str) -> str:
+        # pylint: disable=missing-function-docstring
+        return os.path.join(self.cache_dir, key)
+
+    def read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Read metadata of a cache entry as it is on disk (regardless of refresh and age)
+
+        Args:
+            key (str): Key of an entry
+
+        Returns:
+            Optional[Dict[str, Any]]: Metadata of an entry, or None if there is no entry or it is corrupt
+        """
+        try:
+            with open(
+                os.path.join(self.get_entry_dir(key), "meta.json"),
+                "r",
+                encoding="utf-8",
+            ) as f_in:
+                meta = json.load(f_in)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("format_version") != CACHE_FORMAT_VERSION:
+            return None
+
+        return meta
+
+    def get_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Read metadata of a cache entry, an expired entry is deleted
+
+        Args:
+            key (str): Key of an entry
+
+        Returns:
+            Optional[Dict[str, Any]]: Metadata of an entry, or None if there is no valid entry (or the cache is refreshed)
+        """
+        meta = None if self.refresh else self.read_meta(key)
+        if meta is None:
+            return None
+
+        if (
+            self.max_age_days is not None
+            and time.time() - meta["created"] > self.max_age_days * 86400
+        ):
+            self.logger.info("Network cache entry %s is expired", key)
+            self.invalidate(key)
+            return None
+
+        return meta
+
+    def load(
+        self, key: str
+    ) -> Optional[Tuple[Dict[str, np.ndarray], Any, GeoDataFrame, GeoDataFrame]]:
+        """
+        Load a cache entry, arrays are memory-mapped
+
+        Args:
+            key (str): Key of an entry
+
+        Returns:
+            Optional[Tuple[Dict[str, np.ndarray], Any, GeoDataFrame, GeoDataFrame]]: Graph arrays, graph CRS,
+            home/work and event locations, or None if there is no valid entry
+        """
+        meta = self.get_meta(key)
+        if meta is None:
+            return None
+
+        entry_dir = self.get_entry_dir(key)
+        graph_arrays = {
+            name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r")
+            for name in GRAPH_ARRAYS
+        }
+        gdf_hw = gpd.read_parquet(os.path.join(entry_dir, "gdf_hw.parquet"))
+        gdf_event = gpd.read_parquet(os.path.join(entry_dir, "gdf_event.parquet"))
+
+        # access time of an entry is used for least recently used eviction
+        os.utime(os.path.join(entry_dir, "meta.json"))
+        self.logger.info("Network is loaded from cache entry %s", key)
+
+        return graph_arrays, CRS.from_wkt(meta["graph_crs"]), gdf_hw, gdf_event
+
+    def save(
+        self,
+        key: str,
+        graph_arrays: Dict[str, np.ndarray],
+        graph_crs: Any,
+        gdf_hw: GeoDataFrame,
+        gdf_event: GeoDataFrame,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Save a cache entry and evict least recently used entries if there are too many. A valid entry saved meanwhile
+        by another process is kept (it may be in use), only a corrupt or, with refresh, an old entry is replaced
+
+        Args:
+            key (str): Key of an entry
+            graph_arrays (Dict[str, np.ndarray]): Arrays created by graph_to_arrays
+            graph_crs (Any): CRS of a projected graph
+            gdf_hw (GeoDataFrame): Locations of a network to use for home and work anchors
+            gdf_event (GeoDataFrame): Locations of a network to use for event anchors
+            params (Optional[Dict[str, Any]] = None): Parameters of a network, stored for reference
+        """
+        # write into a temporary directory and then move it, so a failed write never leaves a broken entry
+        tmp_dir = os.path.join(self.cache_dir, f"{TMP_ENTRY_PREFIX}{uuid.uuid4().hex}")
+        check_or_create_dir(tmp_dir)
+
+        for name in GRAPH_ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), graph_arrays[name])
+        gdf_hw.to_parquet(os.path.join(tmp_dir, "gdf_hw.parquet"))
+        gdf_event.to_parquet(os.path.join(tmp_dir, "gdf_event.parquet"))
+
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f_out:
+            json.dump(
+                {
+                    "format_version": CACHE_FORMAT_VERSION,
+                    "created": time.time(),
+                    "graph_crs": CRS.from_user_input(graph_crs).to_wkt(),
+                    "params": params,
+                },
+                f_out,
+            )
+
+        meta = self.read_meta(key)
+        if os.path.exists(self.get_entry_dir(key)) and (
+            meta is None or (self.refresh and meta["created"] < self.opened_at)
+        ):
+            self.invalidate(key)
+        try:
+            # fails if the entry exists
+            os.rename(tmp_dir, self.get_entry_dir(key))
+        except OSError:
+            # another process (e.g. a shard of the same run) has saved the same entry meanwhile
+            self.logger.info("Network cache entry %s is already saved", key)
+            delete_directory(tmp_dir)
+
+        self.evict()
+
+    def invalidate(self, key: str) -> None:
+        """
+        Delete a cache entry if it exists
+
+        Args:
+            key (str): Key of an entry
+        """
+        entry_dir = self.get_entry_dir(key)
+        if os.path.exists(entry_dir):
+            delete_directory(entry_dir)
+
+    def evict(self) -> None:
+        """
+        Delete least recently used entries above max_entries
+        """
+        if self.max_entries is None:
+            return
+
+        # entries may be saved or evicted by other processes meanwhile (e.g. networks built in parallel),
+        # only committed entries are ranked, staging directories of saves in progress are never deleted
+        entries = []
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(TMP_ENTRY_PREFIX):
+                continue
+            try:
+                entries.append(
+                    (
+                        os.path.getmtime(
+                            os.path.join(self.cache_dir, entry, "meta.json")
+                        ),
+                        entry,
+                    )
+                )
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+        for _, entry in entries[self.max_entries :]:
+            self.logger.info("Evicting network cache entry %s", entry)
+            shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
@@ -0,0 +1,97 @@
+"""
+Spatial index of locations of a network used for anchor points.
+
+Locations keeps projected coordinates of location centroids in NumPy arrays with a KD-tree over them,
+so radius queries take O(log N + k) instead of testing every location against a buffer polygon.
+Neighbours of many centers are found or counted with one batched query (query_radius_many, count_within).
+Nearest node ids and OSM ids are kept in NumPy arrays too, so resolving a location by its position is plain array indexing.
+"""
+
+import itertools
+from typing import Tuple, Union
+
+import numpy as np
+from geopandas import GeoDataFrame
+from scipy.spatial import cKDTree
+
+
+class Locations:
+    def __init__(self, gdf_locations: GeoDataFrame):
+        self.gdf_locations = gdf_locations
+        self.x = gdf_locations.geometry.x.to_numpy()
+        self.y = gdf_locations.geometry.y.to_numpy()
+        self.node_id = gdf_locations["nearest_node_id"].to_numpy()
+        self.osmid = gdf_locations["osmid"].to_numpy()
+        self.tree = cKDTree(np.column_stack((self.x, self.y)))
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def query_radius(self, x: float, y: float, radius: float) -> np.ndarray:
+        """
+        Find locations within a radius around a point
+
+        Args:
+            x (float): X coordinate of a center point (in a projected CRS of a network)
+            y (float): Y coordinate of a center point
+            radius (float): A radius around a center point
+
+        Returns:
+            np.ndarray: Sorted positions of locations within a radius
+        """
+        return np.asarray(
+            self.tree.query_ball_point((x, y), radius, return_sorted=True),
+            dtype=np.int64,
+        )
+
+    def query_radius_many(
+        self, x: np.ndarray, y: np.ndarray, radius: Union[float, np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find locations within a radius around each of several points with one batched query
+
+        Args:
+            x (np.ndarray): X coordinates of center points (in a projected CRS of a network)
+            y (np.ndarray): Y coordinates of center points
+            radius (Union[float, np.ndarray]): A radius around all center points or a radius around each of them
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Ragged array of sorted positions of locations within a radius
+            of each center point: flat positions and offsets, neighbours of i-th center are flat[offsets[i]:offsets[i + 1]]
+        """
+        neighbours = self.tree.query_ball_point(
+            np.column_stack((x, y)), radius, return_sorted=True
+        )
+        counts = np.fromiter(
+            map(len, neighbours), dtype=np.int64, count=len(neighbours)
+        )
+        offsets = np.zeros(len(neighbours) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        flat = np.fromiter(
+            itertools.chain.from_iterable(neighbours),
+            dtype=np.int64,
+            count=offsets[-1],
+        )
+
+        return flat, offsets
+
+    def count_within(
+        self, x: np.ndarray, y: np.ndarray, radius: Union[float, np.ndarray]
+    ) -> np.ndarray:
+        """
+        Count locations within a radius around each of several points with one batched query
+
+        Args:
+            x (np.ndarray): X coordinates of center points (in a projected CRS of a network)
+            y (np.ndarray): Y coordinates of center points
+            radius (Union[float, np.ndarray]): A radius around all center points or a radius around each of them
+
+        Returns:
+            np.ndarray: Number of locations within a radius of each center point
+        """
+        return np.asarray(
+            self.tree.query_ball_point(
+                np.column_stack((x, y)), radius, return_length=True
+            ),
+            dtype=np.int64,
+        )
@@ -1,24 +1,143 @@
-from typing import List
+import os
+from typing import Any, Dict, List, Optional, Tuple
 
+import geopandas as gpd
+import numpy as np
 import osmnx as ox
+import pandas as pd
+import pyproj
 from networkx import MultiDiGraph
 from pandas import DataFrame
 
+from gps_synth.network.cache import NetworkCache, arrays_to_graph, graph_to_arrays
+from gps_synth.network.locations import Locations
+from gps_synth.network.osm_file import features_from_osm_file, graph_from_osm_file
+from gps_synth.network.projection import ProjectionContext
+from gps_synth.network.routing import Router, get_routing_engine_class
+
+NETWORK_SOURCES = ["place", "osm_file", "graphml"]
+
 
 class Network:
-    def __init__(self, profile_network_config):
+    def __init__(
+        self,
+        profile_network_config,
+        network_cache: Optional[NetworkCache] = None,
+        routing_config: Optional[Dict[str, Any]] = None,
+    ):
         self.network_name = profile_network_config["NETWORK_NAME"]
-        self.place_name = profile_network_config["PLACE_NAME"]
+        # where a network is built from: "place" - downloaded from OSM by PLACE_NAME,
+        # "osm_file" - a local OSM extract, "graphml" - a GraphML graph and a file with locations
+        self.network_source = profile_network_config.get("NETWORK_SOURCE", "place")
+        if self.network_source not in NETWORK_SOURCES:
+            raise ValueError(
+                f"NETWORK_SOURCE should be one of {NETWORK_SOURCES}, got {self.network_source}"
+            )
+        self.place_name = profile_network_config.get("PLACE_NAME")
+        self.osm_file_path = profile_network_config.get("OSM_FILE_PATH")
+        self.graphml_path = profile_network_config.get("GRAPHML_PATH")
+        self.locations_path = profile_network_config.get("LOCATIONS_PATH")
         self.network_type = profile_network_config["NETWORK_TYPE"]
         self.osm_tags_for_hw = profile_network_config["OSM_TAGS_FOR_HOME_AND_WORK"]
         self.osm_tags_for_event = profile_network_config["OSM_TAGS_FOR_EVENT"]
 
-        self.graph_proj = None
+        # the graph and its nodes are restored from graph_arrays on first access if a network is not built
+        # in this process (see set_built_data), routing and locations only use graph_arrays
+        self._graph_proj = None
         self.graph_crs = None
-        self.nodes = None
+        self._nodes = None
+        # compact form of the projected graph: node ids and coordinates, CSR adjacency with edge lengths
+        self.graph_arrays = None
 
         self.gdf_hw = None
         self.gdf_event = None
+        # spatial indexes of gdf_hw and gdf_event
+        self.hw_locations = None
+        self.event_locations = None
+
+        self.network_cache = network_cache
+
+        self.routing_config = {} if routing_config is None else routing_config
+        self.router = None
+        # cached coordinate conversions from graph_crs to WGS 84
+        self.projection = None
+
+    @property
+    def graph_proj(self) -> Optional[MultiDiGraph]:
+        # pylint: disable=missing-function-docstring
+        if self._graph_proj is None and self.graph_arrays is not None:
+            self._graph_proj = arrays_to_graph(self.graph_arrays, self.graph_crs)
+        return self._graph_proj
+
+    @graph_proj.setter
+    def graph_proj(self, graph_proj: Optional[MultiDiGraph]) -> None:
+        self._graph_proj = graph_proj
+
+    @property
+    def nodes(self) -> Optional[gpd.GeoDataFrame]:
+        # pylint: disable=missing-function-docstring
+        if self._nodes is None and self.graph_arrays is not None:
+            self._nodes = gpd.GeoDataFrame(
+                {"x": self.graph_arrays["node_x"], "y": self.graph_arrays["node_y"]},
+                geometry=gpd.points_from_xy(
+                    self.graph_arrays["node_x"], self.graph_arrays["node_y"]
+                ),
+                index=pd.Index(self.graph_arrays["node_id"], name="osmid"),
+                crs=self.graph_crs,
+            )
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes: Optional[gpd.GeoDataFrame]) -> None:
+        self._nodes = nodes
+
+    def load_graph(self, place_name: str, network_type: str) -> MultiDiGraph:
+        """
+        Get a graph of a street network from the network's source
+
+        Args:
+            place_name (str): A name of place in which a graph should be derived (for "place" source)
+            network_type (str): What type of street network to get (for "place" and "osm_file" sources)
+
+        Returns:
+            MultiDiGraph: A graph of a street network, not necessarily projected
+        """
+        if self.network_source == "osm_file":
+            return graph_from_osm_file(self.osm_file_path, network_type)
+        if self.network_source == "graphml":
+            return ox.load_graphml(self.graphml_path)
+
+        return ox.graph_from_place(place_name, network_type=network_type)
+
+    def load_features(self, place_name: str, osm_tags: List[str]) -> DataFrame:
+        """
+        Get OSM features having any of specified tags from the network's source
+
+        Args:
+            place_name (str): A name of place in which OSM locations should be derived (for "place" source)
+            osm_tags (List[str]): OSM tags to search locations with
+
+        Returns:
+            DataFrame: OSM features with name, tags' and geometry columns
+        """
+        if self.network_source == "osm_file":
+            return features_from_osm_file(self.osm_file_path, osm_tags)
+        if self.network_source == "graphml":
+            gdf_locations = gpd.read_file(self.locations_path)
+            index_columns = [
+                column
+                for column in ["element_type", "osmid"]
+                if column in gdf_locations.columns
+            ]
+            if index_columns:
+                gdf_locations = gdf_locations.set_index(index_columns)
+            # tags absent in the file are treated as tags no location has
+            for osm_tag in ["name"] + osm_tags:
+                if osm_tag not in gdf_locations.columns:
+                    gdf_locations[osm_tag] = None
+            return gdf_locations
+
+        return ox.features_from_place(place_name, tags=dict.fromkeys(osm_tags, True))
 
     def prepare_graph(self, place_name: str, network_type: str) -> None:
         """
@@ -29,8 +148,13 @@ class Network:
             place_name (str): A name of place in which a graph should be derived
             network_type (str): What type of street network to get if custom_filter is None
         """
-        graph = ox.graph_from_place(place_name, network_type=network_type)
-        graph_proj = ox.project_graph(graph)
+        graph = self.load_graph(place_name, network_type)
+        # a GraphML graph may be already projected
+        graph_proj = (
+            graph
+            if pyproj.CRS.from_user_input(graph.graph["crs"]).is_projected
+            else ox.project_graph(graph)
+        )
         nodes = ox.graph_to_gdfs(graph_proj, nodes=True, edges=False)
         graph_crs = nodes.crs
 
@@ -62,9 +186,7 @@ class Network:
             Dataframe: All locations from OSM filtered by tag and geometry coditions, and with several new computed columns
         """
         combined_osm_tags = osm_tags_for_hw + osm_tags_for_event
-        gdf_locations = ox.features_from_place(
-            place_name, tags=dict.fromkeys(combined_osm_tags, True)
-        )
+        gdf_locations = self.load_features(place_name, combined_osm_tags)
         geometry_condition = ~(
             gdf_locations["geometry"].isna() | gdf_locations["geometry"].empty
         )
@@ -108,10 +230,166 @@ class Network:
             list(set(df_locations.columns) - set(delete_columns))
         ].reset_index()
 
+    def get_source_description(self) -> List[Any]:
+        """
+        Describe local files a network is built from (path, size and modification time of each),
+        so a cache entry is not reused after a file is changed
+
+        Returns:
+            List[Any]: Network source followed by descriptions of its files
+        """
+        paths = {
+            "place": [],
+            "osm_file": [self.osm_file_path],
+            "graphml": [self.graphml_path, self.locations_path],
+        }[self.network_source]
+        description = [self.network_source]
+        for path in paths:
+            file_stat = os.stat(path)
+            description.append(
+                [os.path.abspath(path), file_stat.st_size, file_stat.st_mtime]
+            )
+
+        return description
+
+    def get_cache_key(self) -> str:
+        """
+        Key of a network in the network cache, derived from the parameters the network is built from
+
+        Returns:
+            str: Key of a cache entry
+        """
+        return self.network_cache.get_key(
+            f"{type(self).__module__}.{type(self).__qualname__}",
+            self.place_name,
+            self.network_type,
+            self.osm_tags_for_hw,
+            self.osm_tags_for_event,
+            network_source=self.get_source_description(),
+        )
+
+    def is_cached(self) -> bool:
+        """
+        Check whether a network can be loaded from the network cache instead of being built
+
+        Returns:
+            bool: True if the network cache is configured and has a valid entry of the network
+        """
+        return (
+            self.network_cache is not None
+            and self.network_cache.get_meta(self.get_cache_key()) is not None
+        )
+
+    def load_from_cache(self) -> bool:
+        """
+        Restore graph's features and locations from the network cache and store them in instance attributes
+
+        Returns:
+            bool: True if the network was found in the cache
+        """
+        cache_entry = self.network_cache.load(self.get_cache_key())
+        if cache_entry is None:
+            return False
+
+        self.set_built_data(*cache_entry)
+
+        return True
+
+    def get_built_data(
+        self,
+    ) -> Tuple[Dict[str, np.ndarray], Any, gpd.GeoDataFrame, gpd.GeoDataFrame]:
+        """
+        Get the compact form of a built network, as it is stored in the network cache or passed between processes
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], Any, gpd.GeoDataFrame, gpd.GeoDataFrame]: Graph arrays, graph CRS,
+            home/work and event locations
+        """
+        return self.graph_arrays, self.graph_crs, self.gdf_hw, self.gdf_event
+
+    def set_built_data(
+        self,
+        graph_arrays: Dict[str, np.ndarray],
+        graph_crs: Any,
+        gdf_hw: gpd.GeoDataFrame,
+        gdf_event: gpd.GeoDataFrame,
+    ) -> None:
+        """
+        Restore graph's features and locations from the compact form of a built network (see get_built_data),
+        graph_proj and nodes are created from graph arrays only when they are accessed
+
+        Args:
+            graph_arrays (Dict[str, np.ndarray]): Arrays created by graph_to_arrays
+            graph_crs (Any): CRS of a projected graph
+            gdf_hw (gpd.GeoDataFrame): Locations of a network to use for home and work anchors
+            gdf_event (gpd.GeoDataFrame): Locations of a network to use for event anchors
+        """
+        self.graph_arrays = graph_arrays
+        self.graph_crs = graph_crs
+        self.graph_proj = None
+        self.nodes = None
+        self.gdf_hw = gdf_hw
+        self.gdf_event = gdf_event
+
+    def save_to_cache(self) -> None:
+        """
+        Store graph's features and locations of a completed network in the network cache
+        """
+        self.network_cache.save(
+            self.get_cache_key(),
+            self.graph_arrays,
+            self.graph_crs,
+            self.gdf_hw,
+            self.gdf_event,
+            params={
+                "network_name": self.network_name,
+                "network_source": self.get_source_description(),
+                "place_name": self.place_name,
+                "network_type": self.network_type,
+                "osm_tags_for_hw": self.osm_tags_for_hw,
+                "osm_tags_for_event": self.osm_tags_for_event,
+            },
+        )
+
+    def create_router(self) -> Router:
+        """
+        Create a router over the compact form of the projected graph,
+        with a routing engine and a cache of routes configured by the ROUTING config section
+
+        Returns:
+            Router: Router of a network
+        """
+        return Router(
+            self.graph_arrays,
+            get_routing_engine_class(self.routing_config),
+            cache_size=self.routing_config.get("CACHE_SIZE"),
+            precompute=self.routing_config.get("PRECOMPUTE", False),
+        )
+
     def run(self):
         # pylint: disable=missing-function-docstring
+        # reuse a network built by one of previous runs
+        if self.network_cache is None or not self.load_from_cache():
+            self.build()
+
+        self.create_indexes()
+
+    def create_indexes(self) -> None:
+        """
+        Create spatial indexes of locations, a router and a projection context of a built network
+        """
+        self.hw_locations = Locations(self.gdf_hw)
+        self.event_locations = Locations(self.gdf_event)
+        self.router = self.create_router()
+        self.projection = ProjectionContext(self.graph_crs)
+
+    def build(self):
+        """
+        Build graph's features and locations from the network's source and store them in instance attributes
+        """
         # prepare graph and enrich instance attributes
         self.prepare_graph(self.place_name, self.network_type)
+        self.graph_arrays = graph_to_arrays(self.graph_proj)
         # create location for anchor points
         gdf_locations = self.create_locations(
             self.place_name,
@@ -136,3 +414,6 @@ class Network:
         )
 
         del gdf_locations
+
+        if self.network_cache is not None:
+            self.save_to_cache()
@@ -0,0 +1,335 @@
+"""
+Offline construction of a graph and OSM features from a local OSM extract (.osm/.xml, optionally .bz2 compressed, or .osm.pbf).
+
+Files are stream-parsed element by element and only the needed elements are kept in memory:
+the file is read in several passes (relations, then ways, then nodes), each pass only collects
+elements referenced by the previous ones. Reading .osm.pbf files requires the optional `osmium` package (pyosmium>=3.7).
+
+The street network is filtered with the same OSM filters osmnx uses for Overpass queries of a network type
+and the graph is created by osmnx as well, so it has the same structure as the one built by `ox.graph_from_place`.
+Both are private osmnx helpers (`_overpass._get_osm_filter`, `graph._create_graph`), which is why osmnx is pinned
+to an exact version in pyproject.toml: check this module before upgrading it.
+"""
+
+import bz2
+import re
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+import geopandas as gpd
+import osmnx as ox
+import pandas as pd
+from networkx import MultiDiGraph
+from osmnx._overpass import _get_osm_filter
+from shapely.geometry import LineString, MultiLineString, Point, Polygon
+from shapely.ops import polygonize
+
+OSM_FILTER_PATTERN = re.compile(r'\["([^"]+)"(?:(=|!=|~|!~)"([^"]*)")?\]')
+
+
+def parse_osm_filter(osm_filter: str) -> List[Tuple[str, str, str]]:
+    """
+    Parse an Overpass QL tag filter (e.g. '["highway"]["area"!~"yes"]') into a list of conditions
+
+    Args:
+        osm_filter (str): Overpass QL tag filter
+
+    Returns:
+        List[Tuple[str, str, str]]: List of (key, operator, value) conditions, operator is empty if a key should just exist
+    """
+    return [
+        (key, operator or "", value or "")
+        for key, operator, value in OSM_FILTER_PATTERN.findall(osm_filter)
+    ]
+
+
+def tags_match_filter(
+    tags: Dict[str, str], conditions: List[Tuple[str, str, str]]
+) -> bool:
+    """
+    Check if tags of an OSM element satisfy all conditions of a filter, the same way Overpass does
+
+    Args:
+        tags (Dict[str, str]): Tags of an OSM element
+        conditions (List[Tuple[str, str, str]]): Conditions created by parse_osm_filter
+
+    Returns:
+        bool: True if all conditions are satisfied
+    """
+    for key, operator, value in conditions:
+        tag_value = tags.get(key)
+        if operator == "":
+            matched = tag_value is not None
+        elif operator == "=":
+            matched = tag_value == value
+        elif operator == "!=":
+            matched = tag_value != value
+        elif operator == "~":
+            matched = tag_value is not None and re.search(value, tag_value) is not None
+        else:
+            matched = tag_value is None or re.search(value, tag_value) is None
+        if not matched:
+            return False
+
+    return True
+
+
+def iter_xml_elements(filepath: str, element_type: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream OSM elements of one type from an OSM XML file, elements are cleared right after they are parsed
+
+    Args:
+        filepath (str): Path to .osm/.xml file, possibly .bz2 compressed
+        element_type (str): One of node, way, relation
+
+    Yields:
+        Dict[str, Any]: Element in the form of Overpass JSON response
+    """
+    open_file = bz2.open if filepath.endswith(".bz2") else open
+    with open_file(filepath, "rb") as f_in:
+        root = None
+        for event, elem in ET.iterparse(f_in, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == element_type:
+                element = {
+                    "type": element_type,
+                    "id": int(elem.get("id")),
+                    "tags": {tag.get("k"): tag.get("v") for tag in elem.iter("tag")},
+                }
+                if element_type == "node":
+                    element["lat"] = float(elem.get("lat"))
+                    element["lon"] = float(elem.get("lon"))
+                elif element_type == "way":
+                    element["nodes"] = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                else:
+                    element["members"] = [
+                        {
+                            "type": member.get("type"),
+                            "ref": int(member.get("ref")),
+                            "role": member.get("role"),
+                        }
+                        for member in elem.iter("member")
+                    ]
+                yield element
+            if elem.tag in ("node", "way", "relation"):
+                # the root keeps a reference to every parsed element, drop the processed ones
+                root.clear()
+
+
+def iter_pbf_elements(filepath: str, element_type: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream OSM elements of one type from an OSM PBF file with pyosmium
+
+    Args:
+        filepath (str): Path to .osm.pbf file
+        element_type (str): One of node, way, relation
+
+    Yields:
+        Dict[str, Any]: Element in the form of Overpass JSON response
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        import osmium
+    except ImportError as e:
+        raise ImportError(
+            "Reading .osm.pbf files requires the osmium package: pip install 'osmium>=3.7'"
+        ) from e
+
+    entities = {
+        "node": osmium.osm.NODE,
+        "way": osmium.osm.WAY,
+        "relation": osmium.osm.RELATION,
+    }[element_type]
+
+    for obj in osmium.FileProcessor(filepath, entities):
+        element = {
+            "type": element_type,
+            "id": obj.id,
+            "tags": {tag.k: tag.v for tag in obj.tags},
+        }
+        if element_type == "node":
+            element["lat"] = obj.location.lat
+            element["lon"] = obj.location.lon
+        elif element_type == "way":
+            element["nodes"] = [node.ref for node in obj.nodes]
+        else:
+            element["members"] = [
+                {
+                    "type": {"n": "node", "w": "way", "r": "relation"}[member.type],
+                    "ref": member.ref,
+                    "role": member.role,
+                }
+                for member in obj.members
+            ]
+        yield element
+
+
+def iter_osm_elements(filepath: str, element_type: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream OSM elements of one type from a local OSM file, the format is derived from the file extension
+
+    Args:
+        filepath (str): Path to .osm.pbf or .osm/.xml (possibly .bz2 compressed) file
+        element_type (str): One of node, way, relation
+
+    Yields:
+        Dict[str, Any]: Element in the form of Overpass JSON response
+    """
+    if filepath.endswith(".pbf"):
+        return iter_pbf_elements(filepath, element_type)
+
+    return iter_xml_elements(filepath, element_type)
+
+
+def get_nodes_coords(filepath: str, node_ids: Set[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Collect nodes with specified ids from a local OSM file
+
+    Args:
+        filepath (str): Path to a local OSM file
+        node_ids (Set[int]): Ids of nodes to collect
+
+    Returns:
+        Dict[int, Dict[str, Any]]: Nodes by their ids
+    """
+    return {
+        element["id"]: element
+        for element in iter_osm_elements(filepath, "node")
+        if element["id"] in node_ids
+    }
+
+
+def graph_from_osm_file(filepath: str, network_type: str) -> MultiDiGraph:
+    """
+    Create a (not projected) graph of a street network from a local OSM file,
+    analogue of `ox.graph_from_place` for the whole area of a file
+
+    Args:
+        filepath (str): Path to a local OSM file
+        network_type (str): What type of street network to get
+
+    Returns:
+        MultiDiGraph: Simplified graph of the largest weakly connected component
+    """
+    conditions = parse_osm_filter(_get_osm_filter(network_type))
+
+    paths = [
+        element
+        for element in iter_osm_elements(filepath, "way")
+        if tags_match_filter(element["tags"], conditions)
+    ]
+    node_ids = {node_id for path in paths for node_id in path["nodes"]}
+    nodes = get_nodes_coords(filepath, node_ids)
+    # drop references to nodes which are not in the extract
+    for path in paths:
+        path["nodes"] = [node_id for node_id in path["nodes"] if node_id in nodes]
+
+    response_json = {
+        "elements": list(nodes.values())
+        + [path for path in paths if len(path["nodes"]) > 1]
+    }
+    # pylint: disable=protected-access
+    graph = ox.graph._create_graph(
+        [response_json],
+        bidirectional=network_type in ox.settings.bidirectional_network_types,
+    )
+
+    return ox.simplify_graph(graph)
+
+
+def features_from_osm_file(filepath: str, tags: List[str]) -> gpd.GeoDataFrame:
+    """
+    Create a GeoDataFrame of OSM features having any of specified tags from a local OSM file,
+    analogue of `ox.features_from_place` for the whole area of a file
+
+    Args:
+        filepath (str): Path to a local OSM file
+        tags (List[str]): OSM tags (keys), features having any of them are collected
+
+    Returns:
+        gpd.GeoDataFrame: Features indexed by element_type and osmid, with name, tags' and geometry columns (EPSG:4326)
+    """
+    columns = ["name"] + [tag for tag in tags if tag != "name"]
+
+    def has_tags(element):
+        return any(tag in element["tags"] for tag in tags)
+
+    relations = [
+        element
+        for element in iter_osm_elements(filepath, "relation")
+        if element["tags"].get("type") == "multipolygon" and has_tags(element)
+    ]
+    member_way_ids = {
+        member["ref"]
+        for relation in relations
+        for member in relation["members"]
+        if member["type"] == "way"
+    }
+
+    ways = {}
+    feature_way_ids = []
+    for element in iter_osm_elements(filepath, "way"):
+        if has_tags(element):
+            feature_way_ids.append(element["id"])
+        elif element["id"] not in member_way_ids:
+            continue
+        ways[element["id"]] = element
+
+    node_ids = {node_id for way in ways.values() for node_id in way["nodes"]}
+    feature_nodes = []
+    nodes_coords = {}
+    for element in iter_osm_elements(filepath, "node"):
+        if element["id"] in node_ids:
+            nodes_coords[element["id"]] = (element["lon"], element["lat"])
+        if has_tags(element):
+            feature_nodes.append(element)
+
+    def way_coords(way):
+        return [
+            nodes_coords[node_id] for node_id in way["nodes"] if node_id in nodes_coords
+        ]
+
+    records = []
+    for element in feature_nodes:
+        records.append(("node", element, Point(element["lon"], element["lat"])))
+
+    for way_id in feature_way_ids:
+        coords = way_coords(ways[way_id])
+        if len(coords) >= 4 and coords[0] == coords[-1]:
+            records.append(("way", ways[way_id], Polygon(coords)))
+        elif len(coords) >= 2:
+            records.append(("way", ways[way_id], LineString(coords)))
+
+    for relation in relations:
+        lines = [
+            LineString(coords)
+            for member in relation["members"]
+            if member["type"] == "way" and member["ref"] in ways
+            for coords in [way_coords(ways[member["ref"]])]
+            if len(coords) >= 2
+        ]
+        if not lines:
+            continue
+        polygons = list(polygonize(lines))
+        geometry = (
+            gpd.GeoSeries(polygons).unary_union if polygons else MultiLineString(lines)
+        )
+        records.append(("relation", relation, geometry))
+
+    index = pd.MultiIndex.from_tuples(
+        [(element_type, element["id"]) for element_type, element, _ in records],
+        names=["element_type", "osmid"],
+    )
+
+    return gpd.GeoDataFrame(
+        {
+            column: [element["tags"].get(column) for _, element, _ in records]
+            for column in columns
+        },
+        geometry=[geometry for _, _, geometry in records],
+        index=index,
+        crs="EPSG:4326",
+    )
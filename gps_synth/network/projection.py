@@ -0,0 +1,70 @@
+"""
+Projection context of a network: coordinate conversions between a projected CRS of a network and WGS 84.
+
+A Transformer and a Geod are created once per network (Network.projection) and reused by all users,
+their methods take and return arrays, so a stay or a trip is converted with one call.
+"""
+
+from typing import Any, Tuple, Union
+
+import numpy as np
+from pyproj import CRS, Geod, Transformer
+
+from gps_synth.common.metrics import timed
+
+crs_4326 = CRS.from_epsg(4326)
+
+ArrayLike = Union[float, np.ndarray]
+
+
+class ProjectionContext:
+    def __init__(self, crs: Any):
+        self.crs = CRS.from_user_input(crs)
+        # from a projected CRS of a network to WGS 84, (x, y) -> (lon, lat)
+        self.transformer_to_wgs84 = Transformer.from_crs(
+            self.crs, crs_4326, always_xy=True
+        )
+        self.geod = Geod(ellps="WGS84")
+
+    @timed("projection")
+    def to_wgs84(self, x: ArrayLike, y: ArrayLike) -> Tuple[ArrayLike, ArrayLike]:
+        """
+        Convert projected coordinates to WGS 84
+
+        Args:
+            x (ArrayLike): X coordinates in a projected CRS of a network
+            y (ArrayLike): Y coordinates in a projected CRS of a network
+
+        Returns:
+            Tuple[ArrayLike, ArrayLike]: Longitudes and latitudes (scalars for scalar input)
+        """
+        return self.transformer_to_wgs84.transform(x, y)
+
+    @timed("projection")
+    def forward(
+        self,
+        lon: float,
+        lat: float,
+        azimuth: np.ndarray,
+        distance: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find points at given azimuths and distances from one point on the WGS 84 ellipsoid
+
+        Args:
+            lon (float): Longitude of a start point
+            lat (float): Latitude of a start point
+            azimuth (np.ndarray): Forward azimuths in degrees
+            distance (np.ndarray): Distances in meters
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Longitudes and latitudes of end points
+        """
+        end_lon, end_lat, _ = self.geod.fwd(
+            np.full(len(azimuth), lon),
+            np.full(len(azimuth), lat),
+            azimuth,
+            distance,
+        )
+
+        return end_lon, end_lat
@@ -0,0 +1,524 @@
+"""
+Routing on a projected graph of a network with a cache of computed routes.
+
+A graph is routed in a compact form: node ids and coordinates, and CSR adjacency with edge lengths
+(see `gps_synth.network.cache.graph_to_arrays`). Shortest paths are found by a pluggable routing engine:
+
+- `dijkstra` - Dijkstra in pure Python which stops as soon as all targets of a source are settled
+- `scipy` - Dijkstra of `scipy.sparse.csgraph`, a search from each source is bounded
+  by a multiple of the straight-line distance to its farthest target (SEARCH_LIMIT_FACTOR), targets beyond the bound
+  are searched again over the whole graph
+- `astar` - A* in pure Python guided by the straight-line distance to a target
+
+Users commute between the same anchors (home, work, regular events) day after day, so routes are cached by
+(start node, end node) with least recently used eviction. Routes between anchors of a user can be precomputed
+at once: one search from each anchor settles all other anchors.
+
+Misses and precomputation use the same engine, and a path found by an engine does not depend on other targets
+(or on the bound) of a search, so a route does not depend on whether it was precomputed, computed on demand
+or taken from the cache.
+"""
+
+import heapq
+import math
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple, Type
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from gps_synth.common.functions import class_getter
+from gps_synth.common.metrics import get_metrics, timed
+
+# a scipy search is bounded by this multiple of the straight-line distance from a source to its farthest target,
+# road routes are rarely much longer than a straight line
+SEARCH_LIMIT_FACTOR = 2.0
+
+
+class RoutingEngine(ABC):
+    """
+    Shortest paths on a graph in CSR form, nodes are referred to by their positions in node arrays
+    """
+
+    def __init__(self, graph_arrays: Dict[str, np.ndarray]):
+        self.indptr = np.asarray(graph_arrays["indptr"])
+        self.indices = np.asarray(graph_arrays["indices"])
+        self.lengths = np.asarray(graph_arrays["lengths"])
+        self.node_x = np.asarray(graph_arrays["node_x"])
+        self.node_y = np.asarray(graph_arrays["node_y"])
+
+    @abstractmethod
+    def get_shortest_paths(
+        self, sources: List[int], targets: List[int]
+    ) -> Dict[Tuple[int, int], List[int]]:
+        """
+        Find shortest paths (by edge length) from every source to every other target
+
+        Args:
+            sources (List[int]): Positions of start nodes
+            targets (List[int]): Positions of end nodes
+
+        Returns:
+            Dict[Tuple[int, int], List[int]]: Positions of path's nodes for each reachable (source, target) pair
+        """
+
+
+def reconstruct_path(predecessors: Dict[int, int], node: int) -> List[int]:
+    """
+    Follow predecessors from a node back to a source (which has -1 as a predecessor)
+
+    Args:
+        predecessors (Dict[int, int]): Predecessor of each reached node
+        node (int): Position of an end node
+
+    Returns:
+        List[int]: Positions of path's nodes from a source to a node
+    """
+    path = [node]
+    while predecessors[path[-1]] != -1:
+        path.append(predecessors[path[-1]])
+
+    return path[::-1]
+
+
+class DijkstraEngine(RoutingEngine):
+    def __init__(self, graph_arrays: Dict[str, np.ndarray]):
+        super().__init__(graph_arrays)
+        # python lists are much faster to index in a python loop than numpy arrays
+        self.indptr_list = self.indptr.tolist()
+        self.indices_list = self.indices.tolist()
+        self.lengths_list = self.lengths.tolist()
+
+    def get_paths_from_source(
+        self, source: int, targets: List[int]
+    ) -> Dict[int, List[int]]:
+        """
+        Dijkstra from one source which stops as soon as all targets are settled
+
+        Args:
+            source (int): Position of a start node
+            targets (List[int]): Positions of end nodes
+
+        Returns:
+            Dict[int, List[int]]: Positions of path's nodes for each reachable target
+        """
+        indptr, indices, lengths = (
+            self.indptr_list,
+            self.indices_list,
+            self.lengths_list,
+        )
+        remaining = set(targets)
+        distances = {source: 0.0}
+        predecessors = {source: -1}
+        settled = set()
+        # a counter breaks ties between equal distances in the order nodes were reached
+        heap = [(0.0, 0, source)]
+        counter = 1
+        paths = {}
+
+        while heap and remaining:
+            distance, _, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+
+            if node in remaining:
+                remaining.discard(node)
+                paths[node] = reconstruct_path(predecessors, node)
+
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                new_distance = distance + lengths[edge]
+                if neighbour not in settled and new_distance < distances.get(
+                    neighbour, math.inf
+                ):
+                    distances[neighbour] = new_distance
+                    predecessors[neighbour] = node
+                    heapq.heappush(heap, (new_distance, counter, neighbour))
+                    counter += 1
+
+        return paths
+
+    def get_shortest_paths(
+        self, sources: List[int], targets: List[int]
+    ) -> Dict[Tuple[int, int], List[int]]:
+        # pylint: disable=missing-function-docstring
+        return {
+            (source, target): path
+            for source in sources
+            for target, path in self.get_paths_from_source(
+                source, [target for target in targets if target != source]
+            ).items()
+        }
+
+
+class ScipyEngine(RoutingEngine):
+    def __init__(self, graph_arrays: Dict[str, np.ndarray]):
+        super().__init__(graph_arrays)
+        number_of_nodes = len(self.node_x)
+        # csgraph does not treat explicitly stored zeros as edges, zero length edges get a negligible length
+        self.csgraph = csr_matrix(
+            (np.maximum(self.lengths, 1e-9), self.indices, self.indptr),
+            shape=(number_of_nodes, number_of_nodes),
+        )
+        # predecessors of each node with lengths of edges from them, to walk paths back from targets
+        reverse_csgraph = self.csgraph.transpose().tocsr()
+        self.reverse_indptr = reverse_csgraph.indptr.tolist()
+        self.reverse_indices = reverse_csgraph.indices.tolist()
+        self.reverse_lengths = reverse_csgraph.data.tolist()
+
+    def get_distances(self, sources: List[int], targets: List[int]) -> np.ndarray:
+        """
+        Dijkstra from each source bounded by SEARCH_LIMIT_FACTOR times the straight-line distance to its own farthest
+        target (one search per source, as a bound of a search is shared by all its sources), sources which did not reach
+        some target within their bound are searched again without it
+
+        Args:
+            sources (List[int]): Positions of distinct start nodes
+            targets (List[int]): Positions of end nodes
+
+        Returns:
+            np.ndarray: Distances from each source to every node, inf if a node is not reached
+        """
+        straight_distances = np.hypot(
+            self.node_x[targets][np.newaxis, :] - self.node_x[sources][:, np.newaxis],
+            self.node_y[targets][np.newaxis, :] - self.node_y[sources][:, np.newaxis],
+        )
+        distances = np.vstack(
+            [
+                dijkstra(self.csgraph, directed=True, indices=source, limit=limit)
+                for source, limit in zip(
+                    sources,
+                    (SEARCH_LIMIT_FACTOR * straight_distances.max(axis=1)).tolist(),
+                )
+            ]
+        )
+
+        is_unreached = np.isinf(distances[:, targets]).any(axis=1)
+        if is_unreached.any():
+            distances[is_unreached] = dijkstra(
+                self.csgraph,
+                directed=True,
+                indices=np.asarray(sources)[is_unreached],
+            )
+
+        return distances
+
+    def get_path(self, distances: List[float], source: int, target: int) -> List[int]:
+        """
+        Walk a shortest path back from a target: the next node is the predecessor with the smallest position among
+        the ones a shortest path can come from, so a path depends only on distances, which are exact
+        for all nodes closer than a target whatever the bound of a search
+
+        Args:
+            distances (List[float]): Distances from a source to every node
+            source (int): Position of a start node
+            target (int): Position of a reachable end node
+
+        Returns:
+            List[int]: Positions of path's nodes
+        """
+        indptr, indices, lengths = (
+            self.reverse_indptr,
+            self.reverse_indices,
+            self.reverse_lengths,
+        )
+        path = [target]
+        node = target
+        while node != source:
+            distance = distances[node]
+            previous = -1
+            for edge in range(indptr[node], indptr[node + 1]):
+                predecessor = indices[edge]
+                predecessor_distance = distances[predecessor]
+                # a shortest path comes through an edge which is exactly the difference of distances
+                if predecessor_distance < distance == (
+                    predecessor_distance + lengths[edge]
+                ) and (previous == -1 or predecessor < previous):
+                    previous = predecessor
+            node = previous
+            path.append(node)
+
+        return path[::-1]
+
+    def get_shortest_paths(
+        self, sources: List[int], targets: List[int]
+    ) -> Dict[Tuple[int, int], List[int]]:
+        # pylint: disable=missing-function-docstring
+        unique_sources = list(dict.fromkeys(sources))
+        distances = self.get_distances(unique_sources, targets)
+
+        paths = {}
+        for row, source in enumerate(unique_sources):
+            source_distances = distances[row].tolist()
+            for target in targets:
+                if target == source or math.isinf(source_distances[target]):
+                    continue
+                paths[(source, target)] = self.get_path(
+                    source_distances, source, target
+                )
+
+        return paths
+
+
+class AStarEngine(DijkstraEngine):
+    # straight-line distance in a projected CRS may slightly exceed an edge length measured on the ellipsoid,
+    # a scaled down heuristic stays admissible, so found routes are still the shortest
+    heuristic_scale = 0.99
+
+    def __init__(self, graph_arrays: Dict[str, np.ndarray]):
+        super().__init__(graph_arrays)
+        self.node_x_list = self.node_x.tolist()
+        self.node_y_list = self.node_y.tolist()
+
+    def get_path(self, source: int, target: int) -> Optional[List[int]]:
+        """
+        A* from a source to a target with straight-line distance heuristic
+
+        Args:
+            source (int): Position of a start node
+            target (int): Position of an end node
+
+        Returns:
+            Optional[List[int]]: Positions of path's nodes or None if a target is unreachable
+        """
+        indptr, indices, lengths = (
+            self.indptr_list,
+            self.indices_list,
+            self.lengths_list,
+        )
+        node_x, node_y = self.node_x_list, self.node_y_list
+        target_x, target_y = node_x[target], node_y[target]
+        scale = self.heuristic_scale
+
+        distances = {source: 0.0}
+        predecessors = {source: -1}
+        settled = set()
+        heap = [(0.0, 0, source)]
+        counter = 1
+
+        while heap:
+            _, _, node = heapq.heappop(heap)
+            if node == target:
+                return reconstruct_path(predecessors, node)
+            if node in settled:
+                continue
+            settled.add(node)
+
+            distance = distances[node]
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                new_distance = distance + lengths[edge]
+                if neighbour not in settled and new_distance < distances.get(
+                    neighbour, math.inf
+                ):
+                    distances[neighbour] = new_distance
+                    predecessors[neighbour] = node
+                    estimate = new_distance + scale * math.hypot(
+                        node_x[neighbour] - target_x, node_y[neighbour] - target_y
+                    )
+                    heapq.heappush(heap, (estimate, counter, neighbour))
+                    counter += 1
+
+        return None
+
+    def get_shortest_paths(
+        self, sources: List[int], targets: List[int]
+    ) -> Dict[Tuple[int, int], List[int]]:
+        # pylint: disable=missing-function-docstring
+        paths = {}
+        for source in sources:
+            for target in targets:
+                if target == source:
+                    continue
+                path = self.get_path(source, target)
+                if path is not None:
+                    paths[(source, target)] = path
+
+        return paths
+
+
+ROUTING_ENGINES = {
+    "dijkstra": DijkstraEngine,
+    "scipy": ScipyEngine,
+    "astar": AStarEngine,
+}
+
+
+def get_routing_engine_class(routing_config: Dict[str, Any]) -> Type[RoutingEngine]:
+    """
+    Get a routing engine class: a custom one if ENGINE_MODULE_PATH and ENGINE_CLASS are specified,
+    otherwise one of ROUTING_ENGINES by ENGINE name (scipy by default)
+
+    Args:
+        routing_config (Dict[str, Any]): ROUTING config section
+
+    Returns:
+        Type[RoutingEngine]: A routing engine class
+    """
+    if "ENGINE_CLASS" in routing_config:
+        return class_getter(
+            routing_config["ENGINE_MODULE_PATH"], routing_config["ENGINE_CLASS"]
+        )
+
+    engine_name = routing_config.get("ENGINE", "scipy")
+    if engine_name not in ROUTING_ENGINES:
+        raise ValueError(
+            f"ROUTING.ENGINE should be one of {list(ROUTING_ENGINES)}, got {engine_name}"
+        )
+
+    return ROUTING_ENGINES[engine_name]
+
+
+class RouteCache:
+    """
+    Least recently used cache of routes keyed by (start node, end node) with hit and miss counters
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size
+        self.routes: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return key in self.routes
+
+    def get(self, key: Tuple[int, int]) -> Optional[np.ndarray]:
+        """
+        Get a cached route and count a hit or a miss
+
+        Args:
+            key (Tuple[int, int]): Start and end nodes of a route
+
+        Returns:
+            Optional[np.ndarray]: Coordinates of route's nodes or None if a route is not cached
+        """
+        route_coords = self.routes.get(key)
+        if route_coords is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.routes.move_to_end(key)
+
+        return route_coords
+
+    def put(self, key: Tuple[int, int], route_coords: np.ndarray) -> None:
+        """
+        Cache a route, evict the least recently used routes above max_size
+
+        Args:
+            key (Tuple[int, int]): Start and end nodes of a route
+            route_coords (np.ndarray): Coordinates of route's nodes
+        """
+        self.routes[key] = route_coords
+        self.routes.move_to_end(key)
+        if self.max_size is not None:
+            while len(self.routes) > self.max_size:
+                self.routes.popitem(last=False)
+
+
+class Router:
+    def __init__(
+        self,
+        graph_arrays: Dict[str, np.ndarray],
+        engine_class: Type[RoutingEngine] = ScipyEngine,
+        cache_size: Optional[int] = None,
+        precompute: bool = False,
+    ):
+        self.engine = engine_class(graph_arrays)
+        self.node_position = {
+            node: position
+            for position, node in enumerate(
+                np.asarray(graph_arrays["node_id"]).tolist()
+            )
+        }
+        self.node_coords = np.column_stack(
+            (graph_arrays["node_x"], graph_arrays["node_y"])
+        )
+
+        self.route_cache = RouteCache(cache_size)
+        # whether routes between anchors of a user are computed right after they are chosen
+        self.precompute = precompute
+
+    def get_path_coords(self, path: List[int]) -> np.ndarray:
+        """
+        Get projected coordinates of path's nodes
+
+        Args:
+            path (List[int]): Positions of path's nodes
+
+        Returns:
+            np.ndarray: Array of shape (number of nodes, 2) with x and y of each node
+        """
+        return self.node_coords[np.array(path, dtype=np.int64)].reshape(-1, 2)
+
+    def get_route_coords(self, start_node: Hashable, end_node: Hashable) -> np.ndarray:
+        """
+        Get coordinates of nodes of the shortest route between two nodes, from the cache if it is there
+
+        Args:
+            start_node (Hashable): Id of a start node
+            end_node (Hashable): Id of an end node
+
+        Returns:
+            np.ndarray: Array of shape (number of nodes, 2) with x and y of each node of a route,
+            empty if an end node is unreachable (a trip then goes straight between locations)
+        """
+        key = (start_node, end_node)
+        route_coords = self.route_cache.get(key)
+        if route_coords is None:
+            source = self.node_position[start_node]
+            target = self.node_position[end_node]
+            if source == target:
+                path = [source]
+            else:
+                with get_metrics().timer("routing"):
+                    path = self.engine.get_shortest_paths([source], [target]).get(
+                        (source, target), []
+                    )
+                get_metrics().count("routes_computed")
+            route_coords = self.get_path_coords(path)
+            self.route_cache.put(key, route_coords)
+
+        return route_coords
+
+    @timed("precompute_routes")
+    def precompute_routes(self, anchor_nodes: Iterable[Hashable]) -> None:
+        """
+        Compute and cache routes between every pair of anchor nodes which are not cached yet,
+        all sources are searched by one call of the routing engine
+
+        Args:
+            anchor_nodes (Iterable[Hashable]): Ids of nearest nodes of a user's anchor locations
+        """
+        anchor_nodes = list(dict.fromkeys(anchor_nodes))
+        missing = [
+            (source, target)
+            for source in anchor_nodes
+            for target in anchor_nodes
+            if source != target and (source, target) not in self.route_cache
+        ]
+        if not missing:
+            return
+
+        with get_metrics().timer("routing"):
+            paths = self.engine.get_shortest_paths(
+                list(
+                    dict.fromkeys(self.node_position[source] for source, _ in missing)
+                ),
+                list(
+                    dict.fromkeys(self.node_position[target] for _, target in missing)
+                ),
+            )
+        get_metrics().count("routes_computed", len(missing))
+        for source, target in missing:
+            path = paths.get((self.node_position[source], self.node_position[target]))
+            if path is not None:
+                self.route_cache.put((source, target), self.get_path_coords(path))
@@ -1,18 +1,23 @@
-import random
 from datetime import timedelta
-from typing import List, Union
+from typing import List, Optional, Union
 
-from geopandas import GeoDataFrame
-from networkx import MultiDiGraph
+import numpy as np
 from pandas import Timestamp
-from pyproj import Transformer
 
 from gps_synth.common.abs_user import User
+from gps_synth.network.locations import Locations
+from gps_synth.network.projection import ProjectionContext
+from gps_synth.network.routing import Router
 
 
 class User_employed_walk(User):
-    def __init__(self, user_id: int, profile_user_config):
-        super().__init__(user_id, profile_user_config)
+    def __init__(
+        self,
+        user_id: int,
+        profile_user_config,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        super().__init__(user_id, profile_user_config, rng)
         self.child_class_name = "User_walk"
 
     def random_plot_of_day(
@@ -21,9 +26,8 @@ class User_employed_walk(User):
         beggining_of_day: Timestamp,
         day_of_week: int,
         list_of_locations: List[List[Union[int, float]]],
-        network_graph_proj,
-        network_nodes,
-        transformer_to_WGS,
+        network_router,
+        projection,
     ) -> Timestamp:
         """
         Create GPS data for a day following to some extend a random plot (there are some rules, e.g. on weekends
@@ -52,11 +56,11 @@ class User_employed_walk(User):
             stay_activity_time = super().get_static_points(
                 self.user_id,
                 self.data_array,
-                transformer_to_WGS,
+                projection,
                 list_of_locations[i][1],
                 list_of_locations[i][2],
                 time_start,
-                beggining_of_day + timedelta(hours=random.randint(10, 14)),
+                beggining_of_day + timedelta(hours=int(self.rng.integers(10, 15))),
             )
         # if it is a weekday
         elif day_of_week < 6:
@@ -64,19 +68,18 @@ class User_employed_walk(User):
             stay_activity_time = super().get_static_points(
                 self.user_id,
                 self.data_array,
-                transformer_to_WGS,
+                projection,
                 list_of_locations[i][1],
                 list_of_locations[i][2],
                 time_start,
-                beggining_of_day + timedelta(hours=random.randint(7, 9)),
+                beggining_of_day + timedelta(hours=int(self.rng.integers(7, 10))),
             )
             # go to work
             moving_activity_time = super().get_moving_points(
                 self.user_id,
                 self.data_array,
-                network_graph_proj,
-                network_nodes,
-                transformer_to_WGS,
+                network_router,
+                projection,
                 list_of_locations[i][0],
                 list_of_locations[i + 1][0],
                 (list_of_locations[i][1], list_of_locations[i][2]),
@@ -89,11 +92,11 @@ class User_employed_walk(User):
             stay_activity_time = super().get_static_points(
                 self.user_id,
                 self.data_array,
-                transformer_to_WGS,
+                projection,
                 list_of_locations[i + 1][1],
                 list_of_locations[i + 1][2],
                 moving_activity_time,
-                beggining_of_day + timedelta(hours=random.randint(17, 19)),
+                beggining_of_day + timedelta(hours=int(self.rng.integers(17, 20))),
             )
 
             i += 1
@@ -104,11 +107,11 @@ class User_employed_walk(User):
             stay_activity_time = super().get_static_points(
                 self.user_id,
                 self.data_array,
-                transformer_to_WGS,
+                projection,
                 list_of_locations[i][1],
                 list_of_locations[i][2],
                 time_start,
-                beggining_of_day + timedelta(hours=random.randint(22, 26)),
+                beggining_of_day + timedelta(hours=int(self.rng.integers(22, 27))),
             )
 
             # day is finished
@@ -120,9 +123,8 @@ class User_employed_walk(User):
             moving_activity_time = super().get_moving_points(
                 self.user_id,
                 self.data_array,
-                network_graph_proj,
-                network_nodes,
-                transformer_to_WGS,
+                network_router,
+                projection,
                 list_of_locations[i][0],
                 list_of_locations[i + 1][0],
                 (list_of_locations[i][1], list_of_locations[i][2]),
@@ -135,11 +137,11 @@ class User_employed_walk(User):
             stay_activity_time = super().get_static_points(
                 self.user_id,
                 self.data_array,
-                transformer_to_WGS,
+                projection,
                 list_of_locations[i + 1][1],
                 list_of_locations[i + 1][2],
                 moving_activity_time,
-                moving_activity_time + timedelta(hours=random.randint(1, 3)),
+                moving_activity_time + timedelta(hours=int(self.rng.integers(1, 4))),
             )
             # repeat the process till the last event location
             i += 1
@@ -152,9 +154,8 @@ class User_employed_walk(User):
             moving_activity_time = super().get_moving_points(
                 self.user_id,
                 self.data_array,
-                network_graph_proj,
-                network_nodes,
-                transformer_to_WGS,
+                network_router,
+                projection,
                 list_of_locations[i][0],
                 list_of_locations[0][0],
                 (list_of_locations[i][1], list_of_locations[i][2]),
@@ -171,11 +172,10 @@ class User_employed_walk(User):
     # kind of run method but with understandable naming
     def generate_gps(
         self,
-        network_gdf_hw: GeoDataFrame,
-        network_gdf_event: GeoDataFrame,
-        network_graph_proj: MultiDiGraph,
-        network_nodes: GeoDataFrame,
-        transformer_to_WGS: Transformer,
+        network_hw_locations: Locations,
+        network_event_locations: Locations,
+        network_router: Router,
+        projection: ProjectionContext,
     ):
         # start time of generating GPS data for whole date range of a user
         time_start = self.date_range[0]
@@ -185,8 +185,8 @@ class User_employed_walk(User):
             day_of_week = day.isoweekday()
 
             list_of_locations = super().create_list_of_locations(
-                network_gdf_hw,
-                network_gdf_event,
+                network_hw_locations,
+                network_event_locations,
                 self.home_id,
                 self.work_id,
                 self.regular_loc_array,
@@ -198,7 +198,6 @@ class User_employed_walk(User):
                 day,
                 day_of_week,
                 list_of_locations,
-                network_graph_proj,
-                network_nodes,
-                transformer_to_WGS,
+                network_router,
+                projection,
             )